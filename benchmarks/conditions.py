@@ -0,0 +1,87 @@
+"""
+Measure the instructions run by the conditions of loops and branches.
+
+For each condition, a loop incrementing a counter is run twice, for a different
+number of iterations, to get the instructions run per iteration. A comparison
+should cost one instruction and one conditional jump, whatever its operator,
+and `and`, `or` and `not` no extra instruction besides the jumps of their
+operands. Loops whose condition can jump back on zero are tested at their
+bottom, saving the jump back to their top. The benchmark fails if a condition
+costs more than its budget, the loop itself included.
+"""
+
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+import contextlib
+import io
+import os
+import sys
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY)
+
+from svlang.compiler import compile
+from svlang.optimizer import CompilerOptions
+from svlang.vm import Machine
+
+WHILE = "while {condition} {{\n    $i = $i + 1\n}}"
+IF = "while $i < $n {{\n    $i = $i + 1\n    if {condition} {{\n        $i = $n\n    }}\n}}"
+
+CASES = [
+    # (loop, condition, budget in instructions per iteration)
+    # Loops against a constant are tested at their bottom, without jumping back.
+    (WHILE, "$i < {n}", 3),
+    (WHILE, "{n} > $i", 3),
+    (WHILE, "$i < $n", 4),
+    (WHILE, "$n > $i", 4),
+    (WHILE, "$i <= $n", 3),
+    (WHILE, "$n >= $i", 3),
+    (WHILE, "$i != $n", 4),
+    (WHILE, "not $i == $n", 4),
+    (WHILE, "$go and $i < $n", 5),
+    (WHILE, "$stop or $i < $n", 5),
+    # The comparison is skipped, as $stop is False.
+    (IF, "$stop and $i == $n", 4),
+    (IF, "not $go or $i == $n", 5),
+]
+
+
+def _instructions(loop: str, condition: str, iterations: int) -> int:
+    """Run a loop over a condition, returning the instructions it ran."""
+    source = "\n".join(
+        [
+            f"$n: UINT = {iterations}",
+            "$go: BOOL = True",
+            "$stop: BOOL = False",
+            "$i: UINT = 0",
+            loop.format(condition=condition.format(n=iterations)),
+            "ASM Print $i $i 0",
+        ]
+    )
+    # The loops against a constant would be unrolled, hiding their condition.
+    with contextlib.redirect_stdout(io.StringIO()):
+        binary = compile(source, options=CompilerOptions(unroll=False))
+    machine = Machine(binary)
+    machine.run_frame()
+    return machine.instructions
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Measure the instructions run by the conditions of loops and branches.",
+        formatter_class=ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+
+    failed = False
+    for loop, condition, budget in CASES:
+        statement = "while" if loop == WHILE else "if"
+        cost = (
+            _instructions(loop, condition, 2 * args.iterations)
+            - _instructions(loop, condition, args.iterations)
+        ) / args.iterations
+        print(f"{statement:5} {condition:20} {cost:.1f} instructions per iteration (budget {budget})")
+        failed = failed or cost > budget
+
+    if failed:
+        sys.exit("Some conditions cost more instructions than their budget")
@@ -0,0 +1,142 @@
+"""
+Measure the effect of sharing identical expressions on repetitive programs.
+
+A program repeating the same few expressions is parsed and type checked with
+and without its expressions shared in an `ExpressionPool` while parsing. The
+benchmark reports the memory retained by the tree and the peak memory while
+parsing, and the parse and type check times, in both cases. It fails if
+sharing doesn't lower the peak memory and the type check time by the required
+factors, or if the type check messages differ. Sharing costs time while
+parsing, the end-to-end speed is reported but not required.
+"""
+
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY)
+
+from svlang.ast import Statement
+from svlang.grammar import parse
+from svlang.interning import ExpressionPool, shared_expressions
+from svlang.typecheck import (
+    TypeCheckMessage,
+    encountered_type_check_messages,
+    type_check,
+)
+
+
+def generate_program(blocks: int) -> str:
+    """Generate a program repeating the same expressions in every block."""
+    lines = [
+        "$x: UINT = 0",
+        "$y: UINT = 0",
+        "$keycodes: UINT = 0",
+        "$pressed: BOOL = False",
+        "def index($column: UINT, $row: UINT) -> UINT {",
+        "    return $row * 256 + $column",
+        "}",
+    ]
+    for _ in range(blocks):
+        lines += [
+            "$x = $y * 256 + $x",
+            "$pressed = $keycodes & 0b00000100 > 0",
+            "if not $pressed and $x > $y * 256 + $x {",
+            "    $y = index($y * 256 + $x, $x + 1) - 1",
+            "}",
+        ]
+    return "\n".join(lines)
+
+
+def _parse(source: str, pool: ExpressionPool | None) -> tuple[list[Statement], float, int, int]:
+    """
+    Parse a program, sharing its expressions in `pool` if set. Return the
+    statements, the parse time, and the memory retained by the tree and the
+    peak memory while parsing.
+    """
+    gc.collect()
+    tracemalloc.start()
+    start_memory, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    statements = parse(source, pool=pool)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    end_memory, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statements, elapsed, end_memory - start_memory, peak_memory - start_memory
+
+
+def _parse_time(source: str, pool: ExpressionPool | None) -> float:
+    """Time a parse alone, as tracing memory slows it down."""
+    start = time.perf_counter()
+    parse(source, pool=pool)
+    return time.perf_counter() - start
+
+
+def _type_check(
+    statements: list[Statement], pool: ExpressionPool | None
+) -> tuple[float, list[TypeCheckMessage]]:
+    messages: list[TypeCheckMessage] = []
+    encountered_type_check_messages.set(messages)
+    shared_expressions.set(pool)
+    start = time.perf_counter()
+    type_check(statements)
+    return time.perf_counter() - start, messages
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Measure the effect of sharing identical expressions on repetitive programs.",
+        formatter_class=ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--blocks", type=int, default=5_000)
+    parser.add_argument(
+        "--min-memory-saving",
+        type=float,
+        default=2,
+        help="Minimum ratio between the peak memory of parsing without and with sharing",
+    )
+    parser.add_argument(
+        "--min-speedup",
+        type=float,
+        default=1.5,
+        help="Minimum ratio between the type check times without and with sharing",
+    )
+    args = parser.parse_args()
+
+    source = generate_program(args.blocks)
+    tree_statements, _, tree_memory, tree_peak = _parse(source, None)
+    tree_parse_time = _parse_time(source, None)
+    tree_check_time, tree_messages = _type_check(tree_statements, None)
+    pool = ExpressionPool()
+    shared_statements, _, shared_memory, shared_peak = _parse(source, pool)
+    pool = ExpressionPool()
+    shared_parse_time = _parse_time(source, pool)
+    shared_statements = parse(source, pool=pool)
+    shared_check_time, shared_messages = _type_check(shared_statements, pool)
+
+    check_speedup = tree_check_time / shared_check_time
+    end_to_end = (tree_parse_time + tree_check_time) / (shared_parse_time + shared_check_time)
+    print(f"{len(tree_statements)} statements, {len(pool)} distinct expressions")
+    for name, memory, peak, parse_time, check_time in (
+        ("tree:  ", tree_memory, tree_peak, tree_parse_time, tree_check_time),
+        ("shared:", shared_memory, shared_peak, shared_parse_time, shared_check_time),
+    ):
+        print(
+            f"{name} {memory / 2**20:6.1f} MiB retained, {peak / 2**20:6.1f} MiB peak,"
+            f" parsed in {parse_time:.3f} s, type checked in {check_time:.3f} s"
+        )
+    print(f"peak memory:         {tree_peak / shared_peak:.1f}x lower")
+    print(f"type check speedup:  {check_speedup:.2f}x")
+    print(f"parse + type check:  {end_to_end:.2f}x as fast")
+
+    if list(map(str, tree_messages)) != list(map(str, shared_messages)):
+        sys.exit("Sharing expressions changed the type check messages")
+    if tree_peak / shared_peak < args.min_memory_saving:
+        sys.exit("Sharing expressions doesn't lower the peak memory enough")
+    if check_speedup < args.min_speedup:
+        sys.exit("Sharing expressions doesn't make type checking fast enough")
@@ -0,0 +1,179 @@
+"""
+Compare the closure-compiling interpreter against a naive tree walk.
+
+Both run the first frame of `test.svl`, which draws the 256x256 gradient. The
+naive interpreter walks the AST with `match` statements and keeps variables in
+dictionaries. The benchmark fails if the closure-compiling interpreter isn't
+faster by the required factor, or if both don't draw the same screen.
+"""
+
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+import os
+import sys
+import time
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY)
+
+from svlang.ast import *
+from svlang.grammar import parse
+from svlang.interpreter import Interpreter
+from svlang.prelude import with_prelude
+
+
+class _Signal(Exception): ...
+
+
+class _Break(_Signal): ...
+
+
+class _Return(_Signal):
+    def __init__(self, value):
+        self.value = value
+
+
+class _Stop(Exception): ...
+
+
+class NaiveInterpreter:
+    def __init__(self, statements: list[Statement]):
+        self.statements = statements
+        self.screen = [0] * 0x10000
+        self.globals: dict[str, int] = {}
+        self.functions: dict[str, FunctionDeclaration] = {}
+
+    def run(self) -> None:
+        try:
+            self.block(self.statements, self.globals)
+        except _Stop:
+            pass
+
+    def lookup(self, identifier: str, scope: dict) -> dict:
+        return scope if identifier in scope else self.globals
+
+    def block(self, statements: list[Statement], scope: dict) -> None:
+        for statement in statements:
+            self.statement(statement, scope)
+
+    def statement(self, statement: Statement, scope: dict) -> None:
+        match statement:
+            case Declaration(_, identifier, _, value):
+                scope[identifier] = self.expression(value, scope)
+            case Assignment(_, identifier, value):
+                self.lookup(identifier, scope)[identifier] = self.expression(value, scope)
+            case While(_, expression, statements):
+                try:
+                    while self.expression(expression, scope):
+                        self.block(statements, scope)
+                except _Break:
+                    pass
+            case If(_, expression, statements, else_statements):
+                if self.expression(expression, scope):
+                    self.block(statements, scope)
+                elif else_statements:
+                    self.block(else_statements, scope)
+            case Break():
+                raise _Break()
+            case Return(_, expression):
+                raise _Return(None if expression is None else self.expression(expression, scope))
+            case FunctionDeclaration(_, identifier):
+                self.functions[identifier] = statement
+            case ASMInstruction(_, op, arg1, arg2, arg3):
+                match op:
+                    case ASMOps.Add:
+                        self.lookup(arg3.identifier, scope)[arg3.identifier] = (
+                            self.expression(arg1, scope) + self.expression(arg2, scope)
+                        ) & 0xFFFF
+                    case ASMOps.Print:
+                        self.screen[self.expression(arg2, scope)] = self.expression(arg1, scope)
+                    case ASMOps.Sync:
+                        raise _Stop()
+            case Expression():
+                self.expression(statement, scope)
+
+    def expression(self, expression: Expression, scope: dict):
+        match expression:
+            case VariableReference(_, identifier):
+                return self.lookup(identifier, scope)[identifier]
+            case NumericValue(_, value) | Color(_, value):
+                return value
+            case BooleanValue(_, value):
+                return value
+            case NumericExpression(_, left, operator, right):
+                left_value = self.expression(left, scope)
+                right_value = self.expression(right, scope)
+                match operator:
+                    case NumericOperator.ADD:
+                        return (left_value + right_value) & 0xFFFF
+                    case NumericOperator.SUB:
+                        return (left_value - right_value) & 0xFFFF
+                    case NumericOperator.MUL:
+                        return (left_value * right_value) & 0xFFFF
+                    case NumericOperator.DIV:
+                        return left_value // right_value
+            case NumericComparison(_, left, comparator, right):
+                left_value = self.expression(left, scope)
+                right_value = self.expression(right, scope)
+                match comparator:
+                    case NumericComparator.LT:
+                        return left_value < right_value
+                    case NumericComparator.LEQ:
+                        return left_value <= right_value
+                    case NumericComparator.EQ:
+                        return left_value == right_value
+                    case NumericComparator.NEQ:
+                        return left_value != right_value
+                    case NumericComparator.GEQ:
+                        return left_value >= right_value
+                    case NumericComparator.GT:
+                        return left_value > right_value
+            case BinaryExpression(_, left, operator, right):
+                left_value = self.expression(left, scope)
+                right_value = self.expression(right, scope)
+                if operator == BinaryOP.AND:
+                    return left_value & right_value
+                return left_value ^ right_value
+            case FunctionCall(_, identifier, arguments):
+                function = self.functions[identifier]
+                callee_scope = {
+                    argument.identifier: self.expression(value, scope)
+                    for argument, value in zip(function.arguments, arguments)
+                }
+                try:
+                    self.block(function.statements, callee_scope)
+                except _Return as returned:
+                    return returned.value
+                return None
+        raise NotImplementedError(expression)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Compare the closure-compiling interpreter against a naive tree walk.",
+        formatter_class=ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--min-speedup", type=float, default=10)
+    args = parser.parse_args()
+
+    with open(os.path.join(REPOSITORY, "test.svl"), "r") as source_file:
+        statements = with_prelude(parse(source_file.read()))
+
+    naive = NaiveInterpreter(statements)
+    start = time.perf_counter()
+    naive.run()
+    naive_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    interpreter = Interpreter(statements)
+    interpreter.run(1)
+    interpreter_time = time.perf_counter() - start
+
+    speedup = naive_time / interpreter_time
+    print(f"naive tree walk:   {naive_time:.3f} s")
+    print(f"closure compiling: {interpreter_time:.3f} s (including the compilation)")
+    print(f"speedup:           {speedup:.1f}x")
+
+    if naive.screen != interpreter.screen:
+        sys.exit("The interpreters drew different screens")
+    if speedup < args.min_speedup:
+        sys.exit("The closure-compiling interpreter isn't fast enough")
@@ -0,0 +1,95 @@
+"""
+Measure the instructions saved by testing the conditions of loops at their bottom.
+
+The sample programs, the gradient programs of `test.svl` and of the README,
+are compiled with and without loop rotation, and run with a scripted input that
+toggles the left mouse button every few frames. The benchmark reports the
+instructions run per frame and the size of the binaries in both cases, and
+fails if rotation doesn't save the required share of instructions on each
+program, or if the binaries draw different screens.
+"""
+
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+import contextlib
+import io
+import os
+import sys
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY)
+
+from svlang.compiler import compile
+from svlang.optimizer import CompilerOptions
+from svlang.vm import Machine, ScriptedInput
+
+README_GRADIENT = """
+while True {
+    $x: UINT = 0
+    while $x < 256 {
+        $x = $x + 1
+        $y: UINT = 0
+        while $y < 256 {
+            $y = $y + 1
+            $blue: UINT = 0
+            if $MOUSE_LMB {
+                $blue = 255
+            }
+            setPixel($x, $y, Color($x, $y, $blue))
+        }
+    }
+    sync()
+}
+"""
+
+
+def _run(source: str, rotate_loops: bool, frames: int) -> tuple[int, int, bytes]:
+    """
+    Compile and run a program, returning its instructions per frame, the size
+    of its binary and its screen.
+    """
+    # Unrolled loops test their condition less often, leaving less to save.
+    options = CompilerOptions(unroll=False, rotate_loops=rotate_loops)
+    with contextlib.redirect_stdout(io.StringIO()):
+        binary = compile(source, options=options)
+    input_source = ScriptedInput(
+        [(frame % 256, 1 if frame % 10 < 5 else 0) for frame in range(frames)]
+    )
+    machine = Machine(binary, input_source)
+    machine.run(frames)
+    return machine.instructions // machine.frames, len(binary), machine.screen.tobytes()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Measure the instructions saved by testing the conditions of loops at their bottom.",
+        formatter_class=ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--frames", type=int, default=3)
+    parser.add_argument(
+        "--min-saving",
+        type=float,
+        default=5,
+        help="Minimum share of the instructions saved on each program, in percent",
+    )
+    args = parser.parse_args()
+
+    with open(os.path.join(REPOSITORY, "test.svl"), "r") as source_file:
+        programs = {"test.svl": source_file.read(), "README gradient": README_GRADIENT}
+
+    failed = False
+    for name, source in programs.items():
+        top, top_size, top_screen = _run(source, False, args.frames)
+        bottom, bottom_size, bottom_screen = _run(source, True, args.frames)
+        saving = 100 * (top - bottom) / top
+        print(f"{name}:")
+        print(f"    tested at the top:    {top} instructions per frame, {top_size} bytes")
+        print(
+            f"    tested at the bottom: {bottom} instructions per frame, {bottom_size} bytes"
+            f" ({saving:.1f}% fewer instructions)"
+        )
+        if top_screen != bottom_screen:
+            sys.exit(f"Rotating loops changed the screen of {name}")
+        failed = failed or saving < args.min_saving
+
+    if failed:
+        sys.exit("Rotating loops doesn't save enough instructions")
@@ -0,0 +1,137 @@
+"""
+Measure the memory used by the AST of a large program, before and after
+slotting its nodes.
+
+A program is generated like in the parser benchmark and parsed twice in a
+fresh process: once to measure the peak resident set size of the process, and
+once under `tracemalloc` to measure the memory retained by the tree, which is
+divided by the number of nodes. This is done with the AST nodes of the
+package, and with a baseline: the same nodes as plain dataclasses, each with a
+`__dict__`, holding identifiers that aren't interned, as they were before. The
+benchmark fails if a node of the package takes more bytes than the given
+budget, including its share of the lists, strings and numbers it holds.
+"""
+
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from dataclasses import field, fields, is_dataclass, make_dataclass
+from enum import Enum
+import gc
+import multiprocessing
+import os
+import resource
+import sys
+import tracemalloc
+from types import SimpleNamespace
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY)
+
+from svlang import ast, grammar, tokens
+from svlang.ast import ArgumentDeclaration, Statement, walk
+from svlang.grammar import parse
+
+from parser import generate_program
+
+
+def _peak_rss() -> int:
+    """Return the peak resident set size of the process, in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kibibytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _plain_node_classes() -> dict[str, type]:
+    """Copies of the AST node classes as plain dataclasses, without slots."""
+    plain: dict[type, type] = {}
+
+    def _plain(node_class: type) -> type:
+        if node_class not in plain:
+            bases = tuple(_plain(base) for base in node_class.__bases__ if base is not object)
+            inherited = {
+                node_field.name for base in node_class.__bases__ if is_dataclass(base)
+                for node_field in fields(base)
+            }
+            plain[node_class] = make_dataclass(
+                node_class.__name__,
+                [
+                    (
+                        node_field.name,
+                        node_field.type,
+                        field(default=node_field.default, default_factory=node_field.default_factory),
+                    )
+                    for node_field in fields(node_class)
+                    if node_field.name not in inherited
+                ],
+                bases=bases,
+            )
+        return plain[node_class]
+
+    return {
+        name: _plain(value)
+        for name, value in vars(ast).items()
+        if isinstance(value, type)
+        and not issubclass(value, Enum)
+        and (issubclass(value, Statement) or value is ArgumentDeclaration)
+    }
+
+
+def _measure(source: str, slotted: bool) -> tuple[int, int, int, int]:
+    """
+    Parse a program in a fresh process, with the nodes of the package or with
+    the baseline. Return the number of nodes, the memory retained by the tree,
+    and the peak RSS before and after parsing.
+    """
+    if not slotted:
+        # The grammar rules look the node classes up in the module globals.
+        vars(grammar).update(_plain_node_classes())
+        tokens.sys = SimpleNamespace(intern=str)
+    # Warm up, building the parser.
+    parse(generate_program(100))
+
+    rss_before = _peak_rss()
+    statements = parse(source)
+    rss_after = _peak_rss()
+    nodes = sum(
+        isinstance(node, (grammar.Statement, grammar.ArgumentDeclaration))
+        for node in walk(statements)
+    )
+    del statements
+    gc.collect()
+
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    statements = parse(source)
+    end, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return nodes, end - start, rss_before, rss_after
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Measure the memory used by the AST of a large program.",
+        formatter_class=ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--size", type=int, default=100_000, help="Number of statements")
+    parser.add_argument("--max-bytes-per-node", type=float, default=150)
+    args = parser.parse_args()
+
+    source = generate_program(args.size)
+    results = {}
+    # Each variant runs in its own process, for its own peak RSS.
+    context = multiprocessing.get_context("fork")
+    for name, slotted in (("plain", False), ("slotted", True)):
+        with context.Pool(1) as pool:
+            results[name] = pool.apply(_measure, (source, slotted))
+
+    print(f"{args.size} statements, {results['slotted'][0]} nodes")
+    for name, (nodes, retained, rss_before, rss_after) in results.items():
+        print(
+            f"{name + ':':9} {retained / 2**20:.1f} MiB retained ({retained / nodes:.1f} bytes per node),"
+            f" peak RSS {rss_after / 2**20:.1f} MiB (+{(rss_after - rss_before) / 2**20:.1f} MiB parsing)"
+        )
+
+    nodes, retained, _, _ = results["slotted"]
+    if results["plain"][0] != nodes:
+        sys.exit("The baseline parsed a different tree")
+    if retained / nodes > args.max_bytes_per_node:
+        sys.exit("The AST takes too much memory")
@@ -0,0 +1,76 @@
+"""
+Check that parsing time grows linearly with the number of statements.
+
+Large programs are generated the way tools generate level tables and unrolled
+sprite data: long runs of declarations, assignments, calls and ASM. Each size is
+parsed, and the benchmark fails if the time per statement of the largest
+program goes over the given ratio of the time per statement of the smallest.
+"""
+
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+import os
+import sys
+import time
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY)
+
+from svlang.grammar import parse
+
+
+def generate_program(statements: int) -> str:
+    """Generate a program with the given number of top level statements."""
+    lines = [
+        "$index: UINT = 0",
+        "$color: COLOR = #0000",
+        "def plot($x: UINT, $y: UINT, $c: COLOR) {",
+        "    $i: UINT = $y * 256 + $x",
+        "    ASM Print $c $i 0",
+        "}",
+    ]
+    for number in range(statements - 3):
+        match number % 4:
+            case 0:
+                lines.append(f"$tile_{number}: UINT = {number % 997} * 3 + $index")
+            case 1:
+                lines.append(f"$index = $index + {number % 251}")
+            case 2:
+                lines.append(f"plot({number % 256}, {number // 256 % 256}, #{number % 0xFFFF:04x})")
+            case 3:
+                lines.append("ASM Print $color $index 0")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Check that parsing time grows linearly with the number of statements.",
+        formatter_class=ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument(
+        "--max-ratio",
+        type=float,
+        default=1.5,
+        help="Maximum ratio between the time per statement of the largest and smallest programs",
+    )
+    args = parser.parse_args()
+
+    # Warm up, building the parser.
+    parse(generate_program(100))
+
+    per_statement = []
+    for size in args.sizes:
+        source = generate_program(size)
+        start = time.perf_counter()
+        statements = parse(source)
+        elapsed = time.perf_counter() - start
+        per_statement.append(elapsed / size)
+        print(
+            f"{size:>8} statements: {elapsed:.3f} s ({elapsed / size * 1e6:.1f} µs per statement)"
+        )
+        assert len(statements) == size
+
+    ratio = per_statement[-1] / per_statement[0]
+    print(f"ratio: {ratio:.2f}")
+    if ratio > args.max_ratio:
+        sys.exit("Parsing doesn't scale linearly")
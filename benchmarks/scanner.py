@@ -0,0 +1,235 @@
+"""
+Compare the single-regex scanner against the PLY lexer it replaced.
+
+A large program using every kind of token is split into tokens by both, with
+the garbage collector paused as it is while parsing. The PLY lexer is built
+from the original token rules, one function per token. The benchmark fails if
+the scanner isn't faster by the required factor, or if both don't produce the
+same tokens, for that program and for short sources ending in blanks or
+comments.
+"""
+
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+import gc
+import os
+import re
+import sys
+import time
+from typing import Callable
+
+import ply.lex as lex
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY)
+
+from svlang.tokens import literals, tokenize, tokens
+
+
+class PlyTokenRules:
+    tokens = tokens
+    literals = literals
+
+    t_NUMERIC_OPERATOR = r"[+\-*/]"
+    t_NUMERIC_COMPARATOR = r"<|>|<=|>=|==|!="
+
+    def t_ignore_COMMENT(self, t):
+        r"//.*"
+        pass
+
+    def t_ASM(self, t):
+        r"ASM"
+        return t
+
+    def t_ASM_OP(self, t):
+        r"Set|GoTo|Skip|Add|Sub|Mul|Div|Cmp|Deref|Ref|Inst|Print|Read|Band|Xor|Sync"
+        return t
+
+    def t_DEF(self, t):
+        r"def"
+        return t
+
+    def t_ARROW(self, t):
+        r"->"
+        return t
+
+    def t_RETURN(self, t):
+        r"return"
+        return t
+
+    def t_WHILE(self, t):
+        r"while"
+        return t
+
+    def t_BREAK(self, t):
+        r"break"
+        return t
+
+    def t_IF(self, t):
+        r"if"
+        return t
+
+    def t_ELSE(self, t):
+        r"else"
+        return t
+
+    def t_NUMBER(self, t):
+        r"0b[01_]+|0x[a-fA-F\d_]+|[\d_]+"
+        group_pattern = r"(?:0b(?P<binary>[01_]+))|(?:0x(?P<hexadecimal>[a-fA-F\d_]+))|(?P<decimal>[\d_]+)"
+        match = re.match(group_pattern, t.value)
+        assert match is not None
+        groupdicts = match.groupdict()
+        if groupdicts["binary"]:
+            t.value = int(t.value, 2)
+        elif groupdicts["hexadecimal"]:
+            t.value = int(t.value, 16)
+        elif groupdicts["decimal"]:
+            t.value = int(t.value)
+        else:
+            raise RuntimeError("matched unknown group")
+        return t
+
+    def t_TYPE(self, t):
+        r"BOOL|UINT|COLOR"
+        return t
+
+    def t_BOOLEAN(self, t):
+        r"True|False"
+        t.value = t.value == "True"
+        return t
+
+    def t_BOOLEAN_OPERATOR(self, t):
+        r"and|or"
+        return t
+
+    def t_BOOLEAN_NEGATION(self, t):
+        r"not"
+        return t
+
+    def t_BINARY_OPERATOR(self, t):
+        r"\^|&"
+        return t
+
+    def t_BINARY_NEGATION(self, t):
+        r"!"
+        return t
+
+    def t_COLOR(self, t):
+        r"[#][0-9a-fA-F]{4}"
+        t.value = int(t.value[1:], 16)
+        return t
+
+    def t_FUNCTION_IDENTIFIER(self, t):
+        r"\w(\w|[0-9_])*"
+        return t
+
+    def t_VARIABLE_IDENTIFIER(self, t):
+        r"\$\w(\w|[0-9_])*"
+        t.value = t.value[1:]
+        return t
+
+    def t_newline(self, t):
+        r"\n+"
+        t.lexer.lineno += len(t.value)
+
+    t_ignore = " \t\r"
+
+    def t_error(self, t):
+        raise SyntaxError(f"Illegal character {t.value[0]!r}")
+
+
+def generate_source(blocks: int) -> str:
+    """Generate a program using every kind of token, with identifiers both lexers agree on."""
+    lines = []
+    for number in range(blocks):
+        lines += [
+            f"// block {number}",
+            f"def draw_{number}($x: UINT, $y: UINT) -> BOOL {{",
+            f"    $c: COLOR = #{number % 0xFFFF:04x}",
+            f"    $mask: UINT = 0b1010_{number % 2} ^ 0x{number % 0xFFF:03X} & !$x",
+            f"    while $x < {number} and not $y == 0 or True {{",
+            f"        $x = $x + {number} * 2 - $y / 3",
+            "        ASM Print $c $x 0",
+            "        break",
+            "    }",
+            f"    if $y > {number % 256} {{",
+            "        return False",
+            "    } else {",
+            f"        draw_{number}($y, $x)",
+            "    }",
+            "    return $mask > 0",
+            "}",
+        ]
+    return "\n".join(lines)
+
+
+EDGE_SOURCES = [
+    "sync()  ",
+    "sync()   \n",
+    "sync()\t\n\n",
+    "sync()\n// the end",
+    "sync()\n// the end\n",
+    "sync() // the end  \n  ",
+    "// only a comment",
+    "",
+]
+"""Sources ending in blanks or comments, where nothing follows the last token."""
+
+
+def _signature(token) -> tuple:
+    return (token.type, token.value, token.lineno, token.lexpos)
+
+
+def _ply_tokenize(lexer: lex.Lexer, source: str) -> list:
+    lexer.input(source)
+    lexer.lineno = 1
+    return list(iter(lexer.token, None))
+
+
+def _best_time(function: Callable[[], list], repeat: int) -> tuple[float, list]:
+    """Return the shortest run time and the result of a function."""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.disable()
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        gc.enable()
+        best = min(best, elapsed)
+        del result
+    return best, function()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Compare the single-regex scanner against the PLY lexer it replaced.",
+        formatter_class=ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--blocks", type=int, default=10_000, help="Size of the generated program")
+    parser.add_argument("--repeat", type=int, default=3, help="Keep the best of this many runs")
+    parser.add_argument("--min-speedup", type=float, default=1.5)
+    args = parser.parse_args()
+
+    source = generate_source(args.blocks)
+    ply_lexer = lex.lex(object=PlyTokenRules())
+
+    ply_time, ply_tokens = _best_time(lambda: _ply_tokenize(ply_lexer, source), args.repeat)
+    scanner_time, scanner_tokens = _best_time(lambda: list(tokenize(source)), args.repeat)
+
+    count = len(scanner_tokens)
+    speedup = ply_time / scanner_time
+    print(f"{count} tokens, {len(source)} characters")
+    print(f"PLY lexer: {ply_time:.3f} s ({count / ply_time / 1e6:.2f}M tokens/s)")
+    print(f"scanner:   {scanner_time:.3f} s ({count / scanner_time / 1e6:.2f}M tokens/s)")
+    print(f"speedup:   {speedup:.1f}x")
+
+    if list(map(_signature, ply_tokens)) != list(map(_signature, scanner_tokens)):
+        sys.exit("The lexers produced different tokens")
+    for edge_source in EDGE_SOURCES:
+        try:
+            edge_tokens = list(map(_signature, tokenize(edge_source)))
+        except SyntaxError as error:
+            sys.exit(f"The scanner failed on {edge_source!r}: {error}")
+        if list(map(_signature, _ply_tokenize(ply_lexer, edge_source))) != edge_tokens:
+            sys.exit(f"The lexers produced different tokens for {edge_source!r}")
+    if speedup < args.min_speedup:
+        sys.exit("The scanner isn't fast enough")
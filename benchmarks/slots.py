@@ -0,0 +1,92 @@
+"""
+Measure the data words saved by allocating them by liveness.
+
+A program calling many functions one after the other is generated, each
+function computing a few local variables and calling a shared helper. It's
+compiled with and without slot allocation, without inlining so the functions
+are kept. The benchmark reports the data words used in both cases, and fails
+if allocation doesn't divide them by the required factor, or if the two
+binaries draw different screens.
+"""
+
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+import contextlib
+import io
+import os
+import re
+import sys
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY)
+
+from svlang.compiler import compile
+from svlang.optimizer import CompilerOptions, encountered_optimization_reports
+from svlang.vm import Machine
+
+
+def generate_program(functions: int) -> str:
+    """Generate a program calling the given number of functions in turn."""
+    lines = [
+        "$total: UINT = 0",
+        "def helper($value: UINT, $scale: UINT) -> UINT {",
+        "    $scaled: UINT = $value * $scale",
+        "    return $scaled + $value / 2",
+        "}",
+    ]
+    for number in range(functions):
+        lines += [
+            f"def f_{number}($a: UINT) -> UINT {{",
+            f"    $x: UINT = $a * 3 + {number}",
+            "    $y: UINT = helper($x, $a) - $a",
+            "    $z: UINT = $y * $x + helper($y, 2)",
+            "    return $z + $x",
+            "}",
+            f"$total = $total + f_{number}({number})",
+        ]
+    lines += ["$position: UINT = 0", "ASM Print $total $position 0"]
+    return "\n".join(lines)
+
+
+def _compile(source: str, allocate_slots: bool) -> tuple[bytes, int]:
+    """Compile a program, returning its binary and the data words it uses."""
+    options = CompilerOptions(inline=False, allocate_slots=allocate_slots)
+    with contextlib.redirect_stdout(io.StringIO()):
+        binary = compile(source, options=options)
+    for report in encountered_optimization_reports.get():
+        if report.optimization == "slot allocation":
+            match = re.match(r"\d+", report.message)
+            assert match is not None
+            return binary, int(match.group())
+    raise RuntimeError("The compiler didn't report the data words used")
+
+
+def _screen(binary: bytes) -> bytes:
+    """Run a binary until its first frame, and return the screen it draws."""
+    machine = Machine(binary)
+    while not machine.step():
+        pass
+    return machine.screen.tobytes()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Measure the data words saved by allocating them by liveness.",
+        formatter_class=ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--functions", type=int, default=200)
+    parser.add_argument("--min-ratio", type=float, default=5)
+    args = parser.parse_args()
+
+    source = generate_program(args.functions)
+    plain_binary, plain_words = _compile(source, False)
+    allocated_binary, allocated_words = _compile(source, True)
+
+    ratio = plain_words / allocated_words
+    print(f"{args.functions} functions")
+    print(f"one word per value: {plain_words} data words")
+    print(f"allocated slots:    {allocated_words} data words ({ratio:.1f}x fewer)")
+
+    if _screen(plain_binary) != _screen(allocated_binary):
+        sys.exit("Allocating slots changed the screen")
+    if ratio < args.min_ratio:
+        sys.exit("Allocating slots doesn't save enough data words")
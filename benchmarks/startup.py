@@ -0,0 +1,61 @@
+"""
+Measure the cold-start time of the compiler.
+
+Each sample runs `svlang.compiler.compile` on an empty program in a fresh
+interpreter, from an empty working directory. The benchmark fails if the median
+time goes over the budget, or if anything was written to the working directory.
+
+Like after any installation, the bytecode of the package is cached by a first
+run, which isn't measured.
+"""
+
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+import os
+from statistics import median
+import subprocess
+import sys
+from tempfile import TemporaryDirectory
+import time
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMPILE_EMPTY_PROGRAM = "from svlang.compiler import compile; compile('')"
+
+
+def _sample(code: str, cwd: str) -> float:
+    environment = dict(os.environ, PYTHONPATH=REPOSITORY)
+    environment.pop("PYTHONDONTWRITEBYTECODE", None)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=cwd, env=environment, check=True)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Measure the cold-start time of the compiler.",
+        formatter_class=ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--samples", type=int, default=10)
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=0.150,
+        help="Maximum median time in seconds spent on top of a bare interpreter start",
+    )
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as cwd:
+        interpreter = median(_sample("pass", cwd) for _ in range(args.samples))
+        _sample(COMPILE_EMPTY_PROGRAM, cwd)
+        compiler = median(_sample(COMPILE_EMPTY_PROGRAM, cwd) for _ in range(args.samples))
+        written_files = os.listdir(cwd)
+
+    overhead = compiler - interpreter
+    print(f"interpreter startup: {interpreter * 1000:.1f} ms")
+    print(f"compile(''):         {compiler * 1000:.1f} ms")
+    print(f"overhead:            {overhead * 1000:.1f} ms (budget {args.budget * 1000:.0f} ms)")
+
+    if written_files:
+        sys.exit(f"Files were written to the working directory: {written_files}")
+    if overhead > args.budget:
+        sys.exit("Cold-start budget exceeded")
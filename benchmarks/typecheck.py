@@ -0,0 +1,91 @@
+"""
+Check that type checking time grows linearly with the number of functions.
+
+Programs declaring as many global variables as functions are generated, each
+function using a global and calling the previous function. Each size is type
+checked, and the benchmark fails if the time per function of the largest
+program goes over the given ratio of the time per function of the smallest.
+
+With `--jobs`, the largest program is also type checked with the function
+bodies spread over that many processes, and the benchmark fails if the
+messages differ from a serial run.
+"""
+
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+import os
+import sys
+import time
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY)
+
+from svlang.grammar import parse
+from svlang.typecheck import TypeCheckMessage, encountered_type_check_messages, type_check
+
+
+def _type_check(statements: list, jobs: int) -> tuple[float, list[TypeCheckMessage]]:
+    messages: list[TypeCheckMessage] = []
+    encountered_type_check_messages.set(messages)
+    start = time.perf_counter()
+    type_check(statements, jobs=jobs)
+    return time.perf_counter() - start, messages
+
+
+def generate_program(functions: int) -> str:
+    """Generate a program with the given number of functions and global variables."""
+    lines = ["def f_0($a_0: UINT) -> UINT {", "    return $a_0", "}"]
+    for number in range(1, functions):
+        lines += [
+            f"$g_{number}: UINT = {number}",
+            f"def f_{number}($a_{number}: UINT) -> UINT {{",
+            f"    $l_{number}: UINT = $a_{number} + $g_{number}",
+            f"    return f_{number - 1}($l_{number})",
+            "}",
+        ]
+    lines.append(f"$g_0: UINT = f_{functions - 1}(0)")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Check that type checking time grows linearly with the number of functions.",
+        formatter_class=ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 5_000])
+    parser.add_argument(
+        "--max-ratio",
+        type=float,
+        default=1.5,
+        help="Maximum ratio between the time per function of the largest and smallest programs",
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=1, help="Also type check the largest program in this many processes"
+    )
+    args = parser.parse_args()
+
+    per_function = []
+    for size in args.sizes:
+        statements = parse(generate_program(size))
+        elapsed, messages = _type_check(statements, 1)
+        per_function.append(elapsed / size)
+        print(
+            f"{size:>6} functions and globals: {elapsed:.3f} s ({elapsed / size * 1e6:.1f} µs per function)"
+        )
+        if messages:
+            sys.exit(f"Unexpected type check message: {messages[0]}")
+
+    ratio = per_function[-1] / per_function[0]
+    print(f"ratio: {ratio:.2f}")
+    if args.jobs > 1:
+        # Undefined references in every body, to compare the messages.
+        statements = parse(generate_program(args.sizes[-1]).replace("+ $g_", "+ $h_"))
+        serial_time, serial_messages = _type_check(statements, 1)
+        parallel_time, parallel_messages = _type_check(statements, args.jobs)
+        print(
+            f"{len(serial_messages)} messages, serial: {serial_time:.3f} s,"
+            f" {args.jobs} jobs: {parallel_time:.3f} s ({os.cpu_count()} CPUs)"
+        )
+        if list(map(str, serial_messages)) != list(map(str, parallel_messages)):
+            sys.exit("Type checking in parallel changed the messages")
+    if ratio > args.max_ratio:
+        sys.exit("Type checking doesn't scale linearly")
@@ -0,0 +1,124 @@
+"""
+Measure the instructions saved by unrolling loops with a constant trip count.
+
+The sample programs, the gradient program of the README and a program drawing
+8x8 tiles, are compiled with and without unrolling, and run with a scripted
+input that toggles the left mouse button every few frames. The benchmark
+reports the instructions run per frame and the size of the binaries in both
+cases, and fails if unrolling doesn't save the required share of instructions
+on each program, or if the binaries draw different screens.
+"""
+
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+import contextlib
+import io
+import os
+import sys
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY)
+
+from svlang.compiler import compile
+from svlang.optimizer import CompilerOptions
+from svlang.vm import Machine, ScriptedInput
+
+README_GRADIENT = """
+while True {
+    $x: UINT = 0
+    while $x < 256 {
+        $x = $x + 1
+        $y: UINT = 0
+        while $y < 256 {
+            $y = $y + 1
+            $blue: UINT = 0
+            if $MOUSE_LMB {
+                $blue = 255
+            }
+            setPixel($x, $y, Color($x, $y, $blue))
+        }
+    }
+    sync()
+}
+"""
+
+TILES = """
+while True {
+    $top: UINT = 0
+    while $top < 128 {
+        $left: UINT = 0
+        while $left < 128 {
+            $row: UINT = 0
+            while $row < 8 {
+                $column: UINT = 0
+                while $column < 8 {
+                    $shade: UINT = $row * 2 + $column * 2
+                    if $MOUSE_LMB {
+                        $shade = 31 - $shade
+                    }
+                    setPixel($left + $column, $top + $row, Color($shade, $left, $top))
+                    $column = $column + 1
+                }
+                $row = $row + 1
+            }
+            $left = $left + 8
+        }
+        $top = $top + 8
+    }
+    sync()
+}
+"""
+
+
+def _run(source: str, options: CompilerOptions, frames: int) -> tuple[int, int, bytes]:
+    """
+    Compile and run a program, returning its instructions per frame, the size
+    of its binary and its screen.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        binary = compile(source, options=options)
+    input_source = ScriptedInput(
+        [(frame % 256, 1 if frame % 10 < 5 else 0) for frame in range(frames)]
+    )
+    machine = Machine(binary, input_source)
+    machine.run(frames)
+    return machine.instructions // machine.frames, len(binary), machine.screen.tobytes()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Measure the instructions saved by unrolling loops with a constant trip count.",
+        formatter_class=ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--frames", type=int, default=3)
+    parser.add_argument("--budget", type=int, default=CompilerOptions.unroll_budget)
+    parser.add_argument("--factor", type=int, default=CompilerOptions.unroll_factor)
+    parser.add_argument(
+        "--min-saving",
+        type=float,
+        default=5,
+        help="Minimum share of the instructions saved on each program, in percent",
+    )
+    args = parser.parse_args()
+
+    programs = {"README gradient": README_GRADIENT, "tiles": TILES}
+    unrolled_options = CompilerOptions(unroll_budget=args.budget, unroll_factor=args.factor)
+
+    failed = False
+    for name, source in programs.items():
+        rolled, rolled_size, rolled_screen = _run(
+            source, CompilerOptions(unroll=False), args.frames
+        )
+        unrolled, unrolled_size, unrolled_screen = _run(source, unrolled_options, args.frames)
+        saving = 100 * (rolled - unrolled) / rolled
+        print(f"{name}:")
+        print(f"    rolled:   {rolled} instructions per frame, {rolled_size} bytes")
+        print(
+            f"    unrolled: {unrolled} instructions per frame, {unrolled_size} bytes"
+            f" ({saving:.1f}% fewer instructions)"
+        )
+        if rolled_screen != unrolled_screen:
+            sys.exit(f"Unrolling loops changed the screen of {name}")
+        failed = failed or saving < args.min_saving
+
+    if failed:
+        sys.exit("Unrolling loops doesn't save enough instructions")
@@ -0,0 +1,54 @@
+"""
+Measure the speed of the SVC16 emulator on the gradient program.
+
+The program is compiled from `test.svl`, and run with a scripted input that
+toggles the left mouse button every few frames. The benchmark fails if the
+emulator runs fewer instructions per second than required.
+"""
+
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+import hashlib
+import os
+import sys
+import time
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY)
+
+from svlang.compiler import compile
+from svlang.vm import Machine, ScriptedInput
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Measure the speed of the SVC16 emulator on the gradient program.",
+        formatter_class=ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument(
+        "--min-speed",
+        type=float,
+        default=5_000_000,
+        help="Minimum number of instructions per second",
+    )
+    args = parser.parse_args()
+
+    with open(os.path.join(REPOSITORY, "test.svl"), "r") as source_file:
+        binary = compile(source_file.read())
+    input_source = ScriptedInput(
+        [(frame % 256, 1 if frame % 10 < 5 else 0) for frame in range(args.frames)]
+    )
+
+    machine = Machine(binary, input_source)
+    start = time.perf_counter()
+    machine.run(args.frames)
+    elapsed = time.perf_counter() - start
+    speed = machine.instructions / elapsed
+
+    print(f"frames:       {machine.frames}")
+    print(f"instructions: {machine.instructions} ({machine.instructions // machine.frames} per frame)")
+    print(f"time:         {elapsed:.3f} s ({machine.frames / elapsed:.1f} frames/s)")
+    print(f"speed:        {speed:,.0f} instructions/s")
+    print(f"screen:       {hashlib.sha256(machine.screen.tobytes()).hexdigest()}")
+
+    if speed < args.min_speed:
+        sys.exit("The emulator is too slow")
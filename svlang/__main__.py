@@ -1,9 +1,28 @@
-from .compiler import compile
+import mmap
+import os
+import sys
+
+from .compiler import compile, lower
+from .ir import dump
+from .optimizer import CompilerOptions
+
+MMAP_THRESHOLD = 1 << 20
+"""The size from which source files are memory-mapped instead of read."""
+
+
+def read_source(path: str) -> str:
+    """Read a source file in one go, '-' meaning stdin."""
+    if path == "-":
+        return sys.stdin.buffer.read().decode("utf-8")
+    with open(path, "rb") as source_file:
+        if os.fstat(source_file.fileno()).st_size < MMAP_THRESHOLD:
+            return source_file.read().decode("utf-8")
+        with mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return str(mapped, "utf-8")
+
 
 if __name__ == "__main__":
-    from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
-    from io import StringIO
-    import sys
+    from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter, BooleanOptionalAction
 
     parser = ArgumentParser(
         description="Compile SVLang programs into SVC16 binaries.",
@@ -13,26 +32,156 @@ if __name__ == "__main__":
         "source", default="-", nargs="?", help="The source file ('-' for stdin)"
     )
     parser.add_argument("output", help="The output file ('-' for stdout)")
+    parser.add_argument(
+        "--cache-dir",
+        help="A directory to cache compilation results in, to speed up rebuilds",
+    )
+    parser.add_argument(
+        "--fold-constants",
+        action=BooleanOptionalAction,
+        default=CompilerOptions.fold_constants,
+        help="Fold constant expressions",
+    )
+    parser.add_argument(
+        "--eliminate-dead-code",
+        action=BooleanOptionalAction,
+        default=CompilerOptions.eliminate_dead_code,
+        help="Remove unreachable code",
+    )
+    parser.add_argument(
+        "--inline",
+        action=BooleanOptionalAction,
+        default=CompilerOptions.inline,
+        help="Inline small functions",
+    )
+    parser.add_argument(
+        "--inline-budget",
+        type=int,
+        default=CompilerOptions.inline_budget,
+        help="The size of the largest functions inlined, in statements and expressions",
+    )
+    parser.add_argument(
+        "--unroll",
+        action=BooleanOptionalAction,
+        default=CompilerOptions.unroll,
+        help="Unroll loops with a constant trip count",
+    )
+    parser.add_argument(
+        "--unroll-budget",
+        type=int,
+        default=CompilerOptions.unroll_budget,
+        help="The size of the largest loops unrolled fully, in statements and expressions",
+    )
+    parser.add_argument(
+        "--unroll-factor",
+        type=int,
+        default=CompilerOptions.unroll_factor,
+        help="The number of copies of the body of the loops unrolled partially",
+    )
+    parser.add_argument(
+        "--hoist-invariants",
+        action=BooleanOptionalAction,
+        default=CompilerOptions.hoist_invariants,
+        help="Move loop-invariant expressions out of loops",
+    )
+    parser.add_argument(
+        "--reduce-strength",
+        action=BooleanOptionalAction,
+        default=CompilerOptions.reduce_strength,
+        help="Replace the products of induction variables by running sums",
+    )
+    parser.add_argument(
+        "--tree-shake",
+        dest="shake_tree",
+        action=BooleanOptionalAction,
+        default=CompilerOptions.shake_tree,
+        help="Remove unused functions and global variables",
+    )
+    parser.add_argument(
+        "--keep",
+        action="append",
+        default=[],
+        metavar="FUNCTION",
+        help="Keep a function even if it looks unused, for functions only referenced from ASM",
+    )
+    parser.add_argument(
+        "--allocate-slots",
+        action=BooleanOptionalAction,
+        default=CompilerOptions.allocate_slots,
+        help="Share data words between the variables and temporaries whose lifetimes don't overlap",
+    )
+    parser.add_argument(
+        "--rotate-loops",
+        action=BooleanOptionalAction,
+        default=CompilerOptions.rotate_loops,
+        help="Test the conditions of loops at their bottom when possible",
+    )
+    parser.add_argument(
+        "--eliminate-common-subexpressions",
+        action=BooleanOptionalAction,
+        default=CompilerOptions.eliminate_common_subexpressions,
+        help="Reuse the values computed earlier in a basic block",
+    )
+    parser.add_argument(
+        "--report",
+        action="store_true",
+        help="Print what the optimizations did to stderr",
+    )
+    parser.add_argument(
+        "--intern-expressions",
+        action="store_true",
+        help="Share identical expressions, to save memory and type checks on repetitive programs",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="The number of processes type checking the function bodies, without --cache-dir",
+    )
+    parser.add_argument(
+        "--emit-ir",
+        action="store_true",
+        help="Write the intermediate representation of the program instead of the binary",
+    )
     args = parser.parse_args()
+    if args.jobs > 1 and args.cache_dir is not None:
+        # The cache already skips the unchanged functions, one at a time.
+        parser.error("--jobs can't be combined with --cache-dir")
 
-    # Read input data from stdin or a file.
-    input_data: str
-    if args.source == "-":
-        buffer = StringIO()
-        try:
-            while True:
-                buffer.write(input("> "))
-        except EOFError:
-            pass
-        input_data = buffer.getvalue()
-    else:
-        with open(args.source, "r") as input_file:
-            input_data = input_file.read()
+    input_data = read_source(args.source)
 
-    binary = compile(input_data)
+    options = CompilerOptions(
+        fold_constants=args.fold_constants,
+        eliminate_dead_code=args.eliminate_dead_code,
+        inline=args.inline,
+        inline_budget=args.inline_budget,
+        unroll=args.unroll,
+        unroll_budget=args.unroll_budget,
+        unroll_factor=args.unroll_factor,
+        hoist_invariants=args.hoist_invariants,
+        reduce_strength=args.reduce_strength,
+        shake_tree=args.shake_tree,
+        keep=tuple(args.keep),
+        report=args.report,
+        intern_expressions=args.intern_expressions,
+        type_check_jobs=args.jobs,
+        allocate_slots=args.allocate_slots,
+        rotate_loops=args.rotate_loops,
+        eliminate_common_subexpressions=args.eliminate_common_subexpressions,
+    )
+    binary: bytes | memoryview
+    if args.emit_ir:
+        binary = dump(lower(input_data, options=options)).encode()
+    else:
+        binary = compile(input_data, cache_dir=args.cache_dir, options=options)
 
+    # The binary is written straight from the memory image it was linked in,
+    # the buffered writers writing all of it, even if it takes several calls.
     if args.output == "-":
+        sys.stdout.flush()
         sys.stdout.buffer.write(binary)
+        sys.stdout.buffer.flush()
     else:
         with open(args.output, "wb") as binary_output_file:
             binary_output_file.write(binary)
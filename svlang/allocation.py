@@ -0,0 +1,205 @@
+"""
+Liveness-based allocation of the data words of variables and temporaries.
+
+Without it, each variable and temporary of a function has a data word of its
+own. The liveness of values is computed over the IR instead, and values that
+are never live at the same time share a word. A value copied into another one
+gets the same word when possible, which removes the copy.
+
+Some variables keep a word of their own, as their value must outlive the code
+of their function: those read before being written, whose value persists
+between calls, and those referenced by the functions declared inside theirs or
+by ASM instructions.
+
+The other words of a function, its arguments, return address and value
+included, are only used while it's active: they make up its frame. The linker
+overlaps the frames of functions that can't be active at the same time.
+"""
+
+from dataclasses import dataclass, field
+
+from .ir import *
+
+Value = Variable | Temporary
+
+
+@dataclass
+class Allocation:
+    """The words of the variables and temporaries of a function."""
+
+    symbols: dict[Value, str] = field(default_factory=dict)
+    statics: list[str] = field(default_factory=list)
+    """The words kept from one call to the next."""
+    slots: list[str] = field(default_factory=list)
+    """The words shared by the other values."""
+
+
+def _definition(instruction: Instruction) -> Destination | None:
+    if isinstance(instruction, Asm):
+        return None
+    return instruction.destination
+
+
+def live_values(function: Function, tracked: set[Value]) -> dict[int, set[Value]]:
+    """The tracked values live at the start of each block of a function."""
+    uses: dict[int, set[Value]] = {}
+    definitions: dict[int, set[Value]] = {}
+    for block in function.blocks:
+        block_uses: set[Value] = set()
+        block_definitions: set[Value] = set()
+        for instruction in [*block.instructions, block.terminator]:
+            for operand in instruction.uses():
+                if operand in tracked and operand not in block_definitions:
+                    block_uses.add(operand)  # type: ignore
+            if not isinstance(instruction, (Jump, Branch, Exit)):
+                destination = _definition(instruction)
+                if destination in tracked:
+                    block_definitions.add(destination)  # type: ignore
+        uses[block.label] = block_uses
+        definitions[block.label] = block_definitions
+
+    live_in: dict[int, set[Value]] = {block.label: set() for block in function.blocks}
+    changed = True
+    while changed:
+        changed = False
+        for block in reversed(function.blocks):
+            live_out = set().union(
+                *(live_in[label] for label in block.terminator.successors())
+            )
+            block_live_in = uses[block.label] | (live_out - definitions[block.label])
+            if block_live_in != live_in[block.label]:
+                live_in[block.label] = block_live_in
+                changed = True
+    return live_in
+
+
+def allocate(
+    function: Function, captured: set[str], homes: dict[Temporary, str]
+) -> Allocation:
+    """
+    Allocate the words of the variables and temporaries of a function.
+
+    `captured` lists the symbols of the variables referenced by the functions
+    declared inside this one, and `homes` the temporaries already stored in
+    other words.
+    """
+    allocation = Allocation()
+    arguments = set(function.arguments)
+    for argument in function.arguments:
+        allocation.symbols[argument] = argument.symbol
+
+    pinned: set[Variable] = set()
+    if function.name == MAIN_UNIT:
+        # The variables of the main scope are the globals.
+        pinned.update(function.variables)
+    for variable in function.variables:
+        if variable.symbol in captured:
+            pinned.add(variable)
+    for instruction in function.instructions():
+        if isinstance(instruction, Asm):
+            pinned.update(
+                argument for argument in instruction.arguments if isinstance(argument, Variable)
+            )
+
+    tracked: set[Value] = {
+        variable for variable in function.variables if variable not in pinned
+    }
+    for instruction in function.instructions():
+        destination = _definition(instruction)
+        if isinstance(destination, Temporary) and destination not in homes:
+            tracked.add(destination)
+
+    live_in = live_values(function, tracked)
+    # Variables read before being written keep their value between calls.
+    pinned.update(
+        value
+        for value in live_in[function.blocks[0].label]
+        if isinstance(value, Variable) and value not in arguments
+    )
+    tracked -= pinned
+    for variable in function.variables:
+        if variable in pinned and variable not in arguments:
+            allocation.symbols[variable] = variable.symbol
+            allocation.statics.append(variable.symbol)
+
+    # Build the interference graph, and note the copies between values.
+    interferences: dict[Value, set[Value]] = {value: set() for value in tracked}
+    copies: dict[Value, set[Value]] = {value: set() for value in tracked}
+    order: dict[Value, int] = {}
+    for block in function.blocks:
+        for instruction in block.instructions:
+            destination = _definition(instruction)
+            if destination in tracked:
+                order.setdefault(destination, len(order))  # type: ignore
+    for argument in function.arguments:
+        if argument in tracked:
+            order.setdefault(argument, -1)
+
+    for block in function.blocks:
+        live = set().union(*(live_in[label] for label in block.terminator.successors()))
+        live.update(operand for operand in block.terminator.uses() if operand in tracked)  # type: ignore
+        for instruction in reversed(block.instructions):
+            destination = _definition(instruction)
+            if destination in tracked:
+                source = instruction.source if isinstance(instruction, Copy) else None
+                for value in live:
+                    if value != destination and value != source:
+                        interferences[destination].add(value)  # type: ignore
+                        interferences[value].add(destination)  # type: ignore
+                live.discard(destination)  # type: ignore
+                if source in tracked:
+                    copies[destination].add(source)  # type: ignore
+                    copies[source].add(destination)  # type: ignore
+            live.update(operand for operand in instruction.uses() if operand in tracked)  # type: ignore
+    entry = live_in[function.blocks[0].label]
+    for value in entry:
+        interferences[value].update(other for other in entry if other != value)
+
+    # Color the graph greedily, the arguments first as their words are fixed.
+    palette = [argument.symbol for argument in function.arguments if argument in tracked]
+    for value in sorted(tracked, key=lambda value: order.get(value, len(order))):
+        if value in arguments:
+            continue
+        taken = {
+            allocation.symbols[other]
+            for other in interferences[value]
+            if other in allocation.symbols
+        }
+        preferred = [
+            allocation.symbols[other] for other in copies[value] if other in allocation.symbols
+        ]
+        for symbol in [*preferred, *palette]:
+            if symbol not in taken:
+                break
+        else:
+            symbol = f"{function.name}%s{len(allocation.slots)}"
+            allocation.slots.append(symbol)
+            palette.append(symbol)
+        allocation.symbols[value] = symbol
+    return allocation
+
+
+def captured_variables(functions: list[Function]) -> dict[str, set[str]]:
+    """
+    For each function of a group lowered together, the symbols of its variables
+    referenced by the other functions of the group.
+    """
+    owners = {
+        variable.symbol: function.name
+        for function in functions
+        for variable in function.variables
+    }
+    captured: dict[str, set[str]] = {function.name: set() for function in functions}
+    for function in functions:
+        for block in function.blocks:
+            for instruction in [*block.instructions, block.terminator]:
+                operands: list = list(instruction.uses())
+                if isinstance(instruction, (Copy, BinaryOperation, Call)):
+                    operands.append(instruction.destination)
+                for operand in operands:
+                    if not isinstance(operand, Variable):
+                        continue
+                    owner = owners.get(operand.symbol)
+                    if owner is not None and owner != function.name:
+                        captured[owner].add(operand.symbol)
+    return captured
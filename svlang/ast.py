@@ -1,10 +1,13 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields, is_dataclass
 from enum import Enum, auto
 
-from typing import Any, Literal
+from typing import Any, Iterable, Iterator, Literal
 
 
-@dataclass
+# The nodes are slotted, as generated programs have hundreds of thousands of
+# them. Statements aren't frozen, frozen dataclasses are noticeably slower to
+# build, but passes don't modify nodes: they build new ones with `replace`.
+@dataclass(slots=True)
 class Statement:
     lineno: int
 
@@ -17,10 +20,11 @@ class Statement:
         return []
 
 
-class Expression(Statement): ...
+class Expression(Statement):
+    __slots__ = ()
 
 
-@dataclass
+@dataclass(slots=True)
 class FunctionCall(Expression):
     identifier: str
     arguments: list[Expression]
@@ -39,7 +43,7 @@ class NumericOperator(Enum):
         return self.value
 
 
-@dataclass
+@dataclass(slots=True)
 class NumericExpression(Expression):
     left: Expression
     operator: NumericOperator
@@ -61,7 +65,7 @@ class NumericComparator(Enum):
         return self.value
 
 
-@dataclass
+@dataclass(slots=True)
 class NumericComparison(Expression):
     left: Expression
     operator: NumericComparator
@@ -79,7 +83,7 @@ class BooleanOperator(Enum):
         return self.value
 
 
-@dataclass
+@dataclass(slots=True)
 class BooleanExpression(Expression):
     left: Expression
     operator: BooleanOperator
@@ -89,7 +93,7 @@ class BooleanExpression(Expression):
         return f"{self.left} {self.operator} {self.right}"
 
 
-@dataclass
+@dataclass(slots=True)
 class BooleanNegation(Expression):
     expression: Expression
 
@@ -97,7 +101,7 @@ class BooleanNegation(Expression):
         return f"!{self.expression}"
 
 
-@dataclass
+@dataclass(slots=True)
 class VariableReference(Expression):
     identifier: str
 
@@ -105,7 +109,7 @@ class VariableReference(Expression):
         return f"${self.identifier}"
 
 
-@dataclass
+@dataclass(slots=True)
 class BooleanValue(Expression):
     value: bool
 
@@ -113,7 +117,7 @@ class BooleanValue(Expression):
         return str(self.value)
 
 
-@dataclass
+@dataclass(slots=True)
 class NumericValue(Expression):
     value: int
 
@@ -121,7 +125,7 @@ class NumericValue(Expression):
         return str(self.value)
 
 
-@dataclass
+@dataclass(slots=True)
 class Color(Expression):
     color: int
 
@@ -137,7 +141,7 @@ class BinaryOP(Enum):
         return self.value
 
 
-@dataclass
+@dataclass(slots=True)
 class BinaryExpression(Expression):
     left: NumericValue | VariableReference
     operator: BinaryOP
@@ -147,7 +151,7 @@ class BinaryExpression(Expression):
         return f"{self.left} {self.operator} {self.right}"
 
 
-@dataclass
+@dataclass(slots=True)
 class BinaryNegation(Expression):
     operand: NumericValue | VariableReference
 
@@ -164,7 +168,7 @@ class ValueType(Enum):
         return self.value
 
 
-@dataclass
+@dataclass(slots=True)
 class Declaration(Statement):
     identifier: str
     type: ValueType
@@ -177,7 +181,7 @@ class Declaration(Statement):
         return [self.identifier]
 
 
-@dataclass
+@dataclass(slots=True)
 class Assignment(Statement):
     identifier: str
     value: Expression
@@ -186,7 +190,7 @@ class Assignment(Statement):
         return f"${self.identifier} = {self.value}"
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ArgumentDeclaration:
     identifier: str
     type: ValueType
@@ -195,12 +199,14 @@ class ArgumentDeclaration:
         return f"${self.identifier}: {self.type}"
 
 
-@dataclass
+@dataclass(slots=True)
 class FunctionDeclaration(Statement):
     identifier: str
     arguments: list[ArgumentDeclaration]
     return_type: ValueType | None
     statements: list[Statement]
+    source_span: tuple[int, int] | None = None
+    """The start and end positions of the declaration in the source code."""
 
     def __str__(self):
         arguments = ", ".join(str(arg) for arg in self.arguments)
@@ -211,7 +217,7 @@ class FunctionDeclaration(Statement):
             return f"def {self.identifier}({arguments}) {{{statements}}}"
 
 
-@dataclass
+@dataclass(slots=True)
 class Return(Statement):
     expression: Expression | None
 
@@ -219,7 +225,7 @@ class Return(Statement):
         return f"return {self.expression}" if self.expression else "return"
 
 
-@dataclass
+@dataclass(slots=True)
 class While(Statement):
     expression: Expression
     statements: list[Statement]
@@ -236,14 +242,14 @@ class While(Statement):
         return output
 
 
-@dataclass
+@dataclass(slots=True)
 class Break(Statement):
 
     def __str__(self):
         return "break"
 
 
-@dataclass
+@dataclass(slots=True)
 class If(Statement):
     expression: Expression
     statements: list[Statement]
@@ -309,7 +315,7 @@ class ASMOps(ASMOp, Enum):
 # fmt: on
 
 
-@dataclass
+@dataclass(slots=True)
 class ASMInstruction(Statement):
     op: ASMOp
     arg1: VariableReference | NumericValue
@@ -320,6 +326,35 @@ class ASMInstruction(Statement):
         return f"ASM {self.op} {self.arg1} {self.arg2} {self.arg3}"
 
 
+_child_fields: dict[type, tuple[str, ...]] = {}
+"""The names of the fields of each node class, empty for leaves."""
+
+
+def _fields_of(cls: type) -> tuple[str, ...]:
+    names = _child_fields.get(cls)
+    if names is None:
+        names = ()
+        if is_dataclass(cls) and not issubclass(cls, Enum):
+            names = tuple(node_field.name for node_field in fields(cls))
+        _child_fields[cls] = names
+    return names
+
+
+def walk(node: Any) -> Iterator[Any]:
+    """Recursively iterate over a node and all its children."""
+    yield node
+    if isinstance(node, list):
+        children: Iterable[Any] = node
+    else:
+        children = (getattr(node, name) for name in _fields_of(type(node)))
+    for child in children:
+        # Leaves are yielded directly, sparing a generator per leaf.
+        if isinstance(child, list) or _fields_of(type(child)):
+            yield from walk(child)
+        else:
+            yield child
+
+
 def pprint(statement: Statement, *, indent_level=0, indent="    "):
     """Pretty print a statement."""
     match statement:
@@ -0,0 +1,121 @@
+from dataclasses import fields, is_dataclass
+from enum import Enum
+from functools import cache
+import hashlib
+import json
+import os
+from tempfile import NamedTemporaryFile
+from typing import Any
+
+from .ast import *
+from .optimizer import CompilerOptions
+from .typecheck import Symbols
+
+
+@cache
+def compiler_version() -> str:
+    """A hash of the sources of the compiler, any change invalidates the cache."""
+    package = os.path.dirname(__file__)
+    digest = hashlib.sha256()
+    for filename in sorted(os.listdir(package)):
+        if filename.endswith(".py"):
+            with open(os.path.join(package, filename), "rb") as source_file:
+                digest.update(filename.encode())
+                digest.update(source_file.read())
+    return digest.hexdigest()
+
+
+def _hash(*parts: str) -> str:
+    digest = hashlib.sha256(compiler_version().encode())
+    for part in parts:
+        digest.update(f"{len(part)}:".encode())
+        digest.update(part.encode())
+    return digest.hexdigest()
+
+
+def fingerprint(node: Any) -> str:
+    """
+    A serialization of the structure of a node.
+
+    Line numbers and source positions are left out, so moving code around
+    doesn't change the fingerprint.
+    """
+    if isinstance(node, list):
+        return f"[{','.join(fingerprint(item) for item in node)}]"
+    if isinstance(node, Enum):
+        return f"{type(node).__name__}.{node.name}"
+    if is_dataclass(node):
+        values = ",".join(
+            fingerprint(getattr(node, node_field.name))
+            for node_field in fields(node)
+            if node_field.name not in ("lineno", "source_span")
+        )
+        return f"{type(node).__name__}({values})"
+    return repr(node)
+
+
+class CompilationCache:
+    """
+    An on-disk cache of compilation results, as JSON files.
+
+    Entries are grouped by kind, and keyed by a hash of everything that
+    determines their content, including the version of the compiler. Entries
+    are never invalidated, only superseded by entries with a different key.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, kind: str, key: str) -> str:
+        return os.path.join(self.directory, kind, f"{key}.json")
+
+    def get(self, kind: str, key: str) -> Any | None:
+        try:
+            with open(self._path(kind, key), "r") as entry_file:
+                return json.load(entry_file)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, kind: str, key: str, value: Any) -> None:
+        path = self._path(kind, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so concurrent builds never read a partial entry.
+        with NamedTemporaryFile(
+            "w", dir=os.path.dirname(path), suffix=".tmp", delete=False
+        ) as entry_file:
+            json.dump(value, entry_file)
+        os.replace(entry_file.name, path)
+
+    def program_key(self, source: str, options: str) -> str:
+        return _hash("program", source, options)
+
+    def function_key(
+        self, declaration: FunctionDeclaration, source: str, symbols: Symbols
+    ) -> str:
+        """
+        The key of the type checking results of a function.
+
+        It covers the source of the function, and the definitions it can see
+        for the variables and functions it names.
+        """
+        assert declaration.source_span is not None
+        start, end = declaration.source_span
+        variables = set()
+        functions = set()
+        for node in walk(declaration):
+            match node:
+                case VariableReference(_, identifier) | Declaration(
+                    _, identifier
+                ) | Assignment(_, identifier) | ArgumentDeclaration(identifier):
+                    variables.add(identifier)
+                case FunctionCall(_, identifier) | FunctionDeclaration(_, identifier):
+                    functions.add(identifier)
+        environment = [
+            *(f"${name}: {symbols.variables.get(name)}" for name in sorted(variables)),
+            *(f"{name}: {symbols.functions.get(name)}" for name in sorted(functions)),
+        ]
+        return _hash("function", source[start:end], *environment)
+
+    def code_key(self, declaration: FunctionDeclaration, options: CompilerOptions) -> str:
+        """The key of the relocatable code of a function, with the options it's compiled with."""
+        return _hash("code", fingerprint(declaration), repr(options))
@@ -1,49 +1,683 @@
-from contextvars import ContextVar
-from dataclasses import dataclass
-from enum import Enum, auto
-from io import BytesIO, StringIO
+from array import array
+from dataclasses import dataclass, field
 import sys
-from typing import Literal, Self
+from typing import TYPE_CHECKING, Any, Self
 
 from .grammar import parse
 from .ast import *
-from .typecheck import type_check, encountered_type_check_messages, TypeCheckLevel
+from .deadcode import eliminate_dead_code
+from .allocation import allocate, captured_variables
+from .folding import fold_constants
+from .hoisting import hoist_invariants
+from .induction import reduce_strength
+from .inlining import inline_functions
+from .interning import ExpressionPool, shared_expressions
+from .ir import *
+from .numbering import number_values
+from .optimizer import (
+    CompilerOptions,
+    OptimizationReport,
+    encountered_optimization_reports,
+    optimization_report,
+)
+from .prelude import prelude_for
+from .treeshaking import shake_tree
+from .typecheck import (
+    Symbols as TypeCheckSymbols,
+    TypeCheckLevel,
+    TypeCheckMessage,
+    declare_functions,
+    encountered_type_check_messages,
+    type_check,
+    type_check_statement,
+)
+from .unrolling import unroll_loops
+
+if TYPE_CHECKING:
+    # Imported when compiling with a cache only, it's slow to import.
+    from .cache import CompilationCache
+
+MEMORY_SIZE = 0x10000
+
+
+@dataclass
+class CompiledUnit:
+    """
+    Relocatable code for the main scope or a function.
+
+    Each word listed in `relocations` holds an offset from a symbol, and the
+    address of that symbol is added to it when linking. Symbols are named:
+    - `@unit`: the first instruction of a unit (the entry point of functions)
+    - `$identifier`: a global variable
+    - `#value`: a constant word holding `value`
+    - `unit$identifier`, `unit%name`: data words owned by a unit (listed in
+      `data`), for its local variables, arguments and temporaries
+
+    The data words listed in `frame` are only used while the unit is active,
+    they may share addresses with the frames of other units.
+    """
+
+    name: str
+    code: array = field(default_factory=lambda: array("H"))
+    """The 16 bit words of the code."""
+    relocations: list[tuple[int, str]] = field(default_factory=list)
+    data: list[str] = field(default_factory=list)
+    frame: list[str] = field(default_factory=list)
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "code": self.code.tolist(),
+            "relocations": self.relocations,
+            "data": self.data,
+            "frame": self.frame,
+        }
+
+    @classmethod
+    def from_json(cls, value: dict[str, Any]) -> Self:
+        return cls(
+            value["name"],
+            array("H", value["code"]),
+            [(offset, symbol) for offset, symbol in value["relocations"]],
+            value["data"],
+            value["frame"],
+        )
+
+
+Word = int | str | tuple[str, int]
+"""A raw word, the address of a symbol, or an offset from the address of a symbol."""
+
+_OPS = {
+    Operation.ADD: ASMOps.Add,
+    Operation.SUB: ASMOps.Sub,
+    Operation.MUL: ASMOps.Mul,
+    Operation.DIV: ASMOps.Div,
+    Operation.AND: ASMOps.Band,
+    Operation.XOR: ASMOps.Xor,
+    Operation.LT: ASMOps.Cmp,
+}
+
+
+def _homes(function: Function) -> dict[Temporary, str]:
+    """
+    Find the temporaries that can be computed straight into the argument word
+    of the call they are passed to, or into the return value word.
+
+    A temporary can if it's used once, and no function is called between its
+    computation and its use, which could overwrite the word.
+    """
+    uses: dict[Temporary, int] = {}
+    for block in function.blocks:
+        for instruction in [*block.instructions, block.terminator]:
+            for operand in instruction.uses():
+                if isinstance(operand, Temporary):
+                    uses[operand] = uses.get(operand, 0) + 1
+
+    homes: dict[Temporary, str] = {}
+    for block in function.blocks:
+        computed: set[Temporary] = set()
+        for instruction in block.instructions:
+            if isinstance(instruction, Call):
+                for index, argument in enumerate(instruction.arguments):
+                    if argument in computed and uses[argument] == 1:
+                        homes[argument] = f"{instruction.function}%{index}"
+                computed.clear()
+            elif isinstance(instruction, Asm):
+                computed.clear()
+            destination = getattr(instruction, "destination", None)
+            if isinstance(destination, Temporary):
+                computed.add(destination)
+        value = block.terminator.uses() if isinstance(block.terminator, Exit) else []
+        if (
+            function.name != MAIN_UNIT
+            and value
+            and value[0] in computed
+            and uses[value[0]] == 1
+        ):
+            homes[value[0]] = f"{function.name}%value"
+    return homes
 
 
 @dataclass
-class Symbols:
+class _Context:
+    """The state of the code generation of a unit."""
+
+    unit: CompiledUnit
+    homes: dict[Temporary, str]
+    symbols: dict[Variable | Temporary, str] = field(default_factory=dict)
+    """The words allocated to the variables and temporaries, see `svlang.allocation`."""
+    jumps: list[tuple[int, int | None]] = field(default_factory=list)
+    """The words to patch with the address of a block, or of the end for None."""
+
+    def emit(self, op: ASMOp, arg1: Word, arg2: Word, arg3: Word) -> None:
+        self.unit.code.append(op.opcode)
+        for arg in (arg1, arg2, arg3):
+            match arg:
+                case int():
+                    self.unit.code.append(arg & 0xFFFF)
+                case str():
+                    self.unit.relocations.append((len(self.unit.code), arg))
+                    self.unit.code.append(0)
+                case (symbol, offset):
+                    self.unit.relocations.append((len(self.unit.code), symbol))
+                    self.unit.code.append(offset)
+
+    def here(self) -> tuple[str, int]:
+        return (f"@{self.unit.name}", len(self.unit.code))
+
+    def jump(self, label: int | None, condition: str = "#0") -> None:
+        """Emit a jump to a block, taken if `condition` is zero."""
+        self.emit(ASMOps.GoTo, "#0", self.here(), condition)
+        self.jumps.append((len(self.unit.code) - 2, label))
+
+    def symbol(self, operand: Operand) -> str:
+        match operand:
+            case Constant(value):
+                return f"#{value & 0xFFFF}"
+            case Variable(symbol):
+                return self.symbols.get(operand, symbol)
+            case Temporary(number):
+                home = self.homes.get(operand, self.symbols.get(operand))
+                if home is not None:
+                    return home
+                symbol = f"{self.unit.name}%t{number}"
+                if symbol not in self.unit.data:
+                    self.unit.data.append(symbol)
+                return symbol
+
+    def move(self, source: Operand, destination: str) -> None:
+        if isinstance(source, Constant):
+            self.emit(ASMOps.Set, destination, source.value, 0)
+        elif self.symbol(source) != destination:
+            self.emit(ASMOps.Add, self.symbol(source), "#0", destination)
+
+
+def _generate_instruction(instruction: Instruction, context: _Context) -> None:
+    match instruction:
+        case Copy(destination, source):
+            context.move(source, context.symbol(destination))
+
+        case BinaryOperation(destination, operation, left, right):
+            context.emit(
+                _OPS[operation],
+                context.symbol(left),
+                context.symbol(right),
+                context.symbol(destination),
+            )
+
+        case Call(destination, callee, arguments):
+            for index, argument in enumerate(arguments):
+                context.move(argument, f"{callee}%{index}")
+            symbol, offset = context.here()
+            context.emit(ASMOps.Set, f"{callee}%ret", (symbol, offset + 8), 0)
+            context.emit(ASMOps.GoTo, "#0", f"@{callee}", "#0")
+            # The return value must be copied before the callee is called again.
+            if destination is not None:
+                result = context.symbol(destination)
+                if result != f"{callee}%value":
+                    context.emit(ASMOps.Add, f"{callee}%value", "#0", result)
+
+        case Asm(op, arguments):
+            words = [
+                context.symbol(argument) if isinstance(argument, Variable) else argument
+                for argument in arguments
+            ]
+            context.emit(op, *words)
+
+
+def _generate_terminator(
+    terminator: Terminator, next_label: int | None, context: _Context
+) -> None:
+    """Generate a terminator, falling through to the next block when possible."""
+    name = context.unit.name
+    match terminator:
+        case Jump(target):
+            if target != next_label:
+                context.jump(target)
+
+        case Branch(condition, if_true, if_false) if if_false == next_label:
+            # Skip the jump when the condition is zero, falling through.
+            context.emit(ASMOps.Skip, 2, 0, context.symbol(condition))
+            context.jump(if_true)
+
+        case Branch(condition, if_true, if_false):
+            context.jump(if_false, context.symbol(condition))
+            if if_true != next_label:
+                context.jump(if_true)
+
+        case Exit(value) if name == MAIN_UNIT:
+            if next_label is not None:
+                context.jump(None)
+
+        case Exit(value):
+            if value is not None:
+                context.move(value, f"{name}%value")
+            context.emit(ASMOps.GoTo, f"{name}%ret", 0, "#0")
+
+
+def _generate_unit(
+    function: Function, captured: set[str], allocate_slots: bool
+) -> CompiledUnit:
     """
-    A mapping of variables/functions to their addresses.
+    Generate the relocatable code of a function, or of the main scope.
 
-    For functions, the address is the position of the first "real" instruction.
+    Functions aren't reentrant: their arguments, local variables and
+    temporaries live at fixed addresses. With `allocate_slots`, they share
+    words when their lifetimes don't overlap. When the main scope ends, the
+    program keeps synchronizing forever.
     """
+    name = function.name
+    homes = _homes(function)
+    if name == MAIN_UNIT:
+        unit = CompiledUnit(name, data=[f"{MAIN_UNIT}%sync"])
+    else:
+        frame = [f"{name}%ret", f"{name}%value"]
+        frame += [argument.symbol for argument in function.arguments]
+        unit = CompiledUnit(name, data=frame.copy())
+    if allocate_slots:
+        allocation = allocate(function, captured, homes)
+        unit.data += allocation.statics + allocation.slots
+        if name != MAIN_UNIT:
+            unit.frame = frame + allocation.slots
+        context = _Context(unit, homes, allocation.symbols)
+    else:
+        arguments = set(function.arguments)
+        unit.data += [
+            variable.symbol for variable in function.variables if variable not in arguments
+        ]
+        context = _Context(unit, homes)
+    addresses: dict[int | None, int] = {}
+    next_labels = [block.label for block in function.blocks[1:]] + [None]
+    for block, next_label in zip(function.blocks, next_labels):
+        addresses[block.label] = len(unit.code)
+        for instruction in block.instructions:
+            _generate_instruction(instruction, context)
+        _generate_terminator(block.terminator, next_label, context)
+    if name == MAIN_UNIT:
+        addresses[None] = len(unit.code)
+        end = context.here()
+        context.emit(ASMOps.Sync, f"{MAIN_UNIT}%sync", f"{MAIN_UNIT}%sync", 0)
+        context.emit(ASMOps.GoTo, "#0", end, "#0")
+    for word, label in context.jumps:
+        unit.code[word] = addresses[label]
+    return unit
 
-    variables: dict[str, int]
-    functions: dict[str, int]
 
-    def clone(self) -> Self:
-        return self.__class__(self.variables.copy(), self.functions.copy())
+def _strongly_connected_components(successors: list[list[int]]) -> list[list[int]]:
+    """
+    Find the strongly connected components of a graph, with Tarjan's algorithm.
 
+    A component is listed after all the components it leads to.
+    """
+    count = len(successors)
+    indices = [-1] * count
+    lowest = [0] * count
+    on_stack = [False] * count
+    stack: list[int] = []
+    components: list[list[int]] = []
+    counter = 0
+    for root in range(count):
+        if indices[root] != -1:
+            continue
+        indices[root] = lowest[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, 0)]
+        while work:
+            node, position = work[-1]
+            if position < len(successors[node]):
+                work[-1] = (node, position + 1)
+                successor = successors[node][position]
+                if indices[successor] == -1:
+                    indices[successor] = lowest[successor] = counter
+                    counter += 1
+                    stack.append(successor)
+                    on_stack[successor] = True
+                    work.append((successor, 0))
+                elif on_stack[successor]:
+                    lowest[node] = min(lowest[node], indices[successor])
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowest[parent] = min(lowest[parent], lowest[node])
+            if lowest[node] == indices[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(sorted(component))
+    return components
+
+
+def _place_frames(units: list[CompiledUnit]) -> tuple[dict[str, int], int]:
+    """
+    Place the frames of the units, starting with the main scope.
 
-def _compile_statement(statement: Statement, *, symbols: Symbols, offset: int) -> bytes:
-    # TODO group all declaration of variables at the start of the scope (main/function)
-    output = BytesIO()
-    match statement:
-        case ASMInstruction(_, op, arg1, arg2, arg3):
-            ...
-        case unhandled:
-            raise NotImplementedError(
-                f"Compilation of {type(unhandled)} {unhandled} is not yet implemented"
+    Functions aren't reentrant, so two units can only be active at the same
+    time if one calls the other, directly or not. The frame of a unit is placed
+    after the frames of the units that may call it, and overlaps the frames of
+    the others. Units calling each other are placed one after the other, and
+    the units that can't be reached from the main scope, maybe from ASM, after
+    all the others.
+
+    Recursive calls are rejected, as they would overwrite the frame, and the
+    return address, of the active call.
+
+    Return the offset of each frame word, and the size of the frames.
+    """
+    indices = {unit.name: index for index, unit in enumerate(units)}
+    callees = [
+        sorted(
+            {
+                indices[symbol[1:]]
+                for _, symbol in unit.relocations
+                if symbol.startswith("@") and symbol[1:] in indices
+            }
+            - {index}
+        )
+        for index, unit in enumerate(units)
+    ]
+    # Jumps inside a unit are relative to its entry point too, so a unit calls
+    # itself if it sets its own return address.
+    calls_itself = [
+        any(
+            symbol == f"{unit.name}%ret" and unit.code[word - 1] == ASMOps.Set.opcode
+            for word, symbol in unit.relocations
+        )
+        for unit in units
+    ]
+    components = _strongly_connected_components(callees)
+    component_of = {
+        member: number for number, component in enumerate(components) for member in component
+    }
+
+    reachable = {0}
+    pending = [0]
+    while pending:
+        for callee in callees[pending.pop()]:
+            if callee not in reachable:
+                reachable.add(callee)
+                pending.append(callee)
+
+    for component in components:
+        if component[0] in reachable and (
+            len(component) > 1 or calls_itself[component[0]]
+        ):
+            names = ", ".join(units[member].name for member in component)
+            calls = "calls itself" if len(component) == 1 else "call each other"
+            raise RuntimeError(
+                f"{names} {calls}, but functions aren't reentrant, so recursion isn't supported"
             )
-    raise NotImplementedError("TODO")
 
+    starts = [0] * len(components)
+    ends = [0] * len(components)
+    for number in reversed(range(len(components))):
+        component = components[number]
+        if component[0] not in reachable:
+            continue
+        ends[number] = starts[number] + sum(len(units[member].frame) for member in component)
+        for member in component:
+            for callee in callees[member]:
+                successor = component_of[callee]
+                starts[successor] = max(starts[successor], ends[number])
+    size = max(ends, default=0)
+    for number, component in enumerate(components):
+        if component[0] not in reachable:
+            starts[number] = size
+            size += sum(len(units[member].frame) for member in component)
+
+    offsets: dict[str, int] = {}
+    for number, component in enumerate(components):
+        offset = starts[number]
+        for member in component:
+            for symbol in units[member].frame:
+                offsets[symbol] = offset
+                offset += 1
+    return offsets, size
 
-def compile(source: str) -> bytes:
-    statements = parse(source)
 
-    type_check_messages = []
+def _link(units: list[CompiledUnit]) -> memoryview:
+    """
+    Lay out the units in a memory image, and patch their relocations.
+
+    The code of the units comes first, starting with the main scope, followed
+    by the constants. The other data words are zero initialized, so they are
+    placed at the end and left out of the binary: the words kept between calls
+    first, then the frames, see `_place_frames`.
+
+    Return the little endian words of the binary, a view of the image.
+    """
+    addresses: dict[str, int] = {}
+    offset = 0
+    for unit in units:
+        addresses[f"@{unit.name}"] = offset
+        offset += len(unit.code)
+    constants = sorted(
+        {
+            symbol
+            for unit in units
+            for _, symbol in unit.relocations
+            if symbol.startswith("#")
+        },
+        key=lambda symbol: int(symbol[1:]),
+    )
+    for symbol in constants:
+        addresses[symbol] = offset
+        offset += 1
+    binary_size = offset
+    for unit in units:
+        frame = set(unit.frame)
+        for symbol in unit.data:
+            if symbol not in frame:
+                addresses[symbol] = offset
+                offset += 1
+    statics = offset - binary_size
+    frames, frames_size = _place_frames(units)
+    for symbol, frame_offset in frames.items():
+        addresses[symbol] = offset + frame_offset
+    offset += frames_size
+    if offset > MEMORY_SIZE:
+        raise RuntimeError(
+            f"The program needs {offset} words, but only {MEMORY_SIZE} are available"
+        )
+    unshared = statics + sum(len(unit.frame) for unit in units)
+    optimization_report(
+        "slot allocation",
+        f"{offset - binary_size} data words, {unshared} without overlapping frames",
+    )
+
+    image = array("H", bytes(MEMORY_SIZE * 2))
+    for unit in units:
+        start = addresses[f"@{unit.name}"]
+        image[start : start + len(unit.code)] = unit.code
+    for symbol in constants:
+        image[addresses[symbol]] = int(symbol[1:])
+    # A single pass patches the relocations, now that every symbol is placed.
+    for unit in units:
+        start = addresses[f"@{unit.name}"]
+        for word, symbol in unit.relocations:
+            if symbol not in addresses:
+                raise RuntimeError(f"Undefined symbol {symbol} in {unit.name}")
+            image[start + word] = (image[start + word] + addresses[symbol]) & 0xFFFF
+    if sys.byteorder == "big":
+        image.byteswap()
+    return memoryview(image).cast("B")[: binary_size * 2]
+
+
+def _type_check_program(
+    prelude: list[Statement],
+    statements: list[Statement],
+    source: str,
+    cache: "CompilationCache | None",
+    jobs: int = 1,
+) -> None:
+    """
+    Type check the program, reusing the cached results for unchanged functions.
+
+    The prelude is always type checked, as cache keys refer to the source of
+    the program. Without a cache, the function bodies are checked in `jobs`
+    processes.
+    """
+    if cache is None:
+        type_check([*prelude, *statements], jobs=jobs)
+        return
+
+    messages = encountered_type_check_messages.get()
+    symbols = TypeCheckSymbols()
+    declare_functions([*prelude, *statements], symbols)
+    for statement in prelude:
+        type_check_statement(statement, symbols)
+    for statement in statements:
+        if not isinstance(statement, FunctionDeclaration):
+            type_check_statement(statement, symbols)
+            continue
+        key = cache.function_key(statement, source, symbols)
+        cached = cache.get("typecheck", key)
+        if cached is None:
+            first_message = len(messages)
+            type_check_statement(statement, symbols)
+            cache.put(
+                "typecheck",
+                key,
+                [
+                    [message.level.name, message.message, message.line - statement.lineno]
+                    for message in messages[first_message:]
+                ],
+            )
+        else:
+            for level, message, line in cached:
+                messages.append(
+                    TypeCheckMessage(
+                        TypeCheckLevel[level], message, statement.lineno + line
+                    )
+                )
+
+
+def _number_values(functions: list[Function], options: CompilerOptions) -> int:
+    """
+    Remove the operations computing known values from lowered functions, if
+    enabled. Return the number of instructions removed.
+    """
+    if not options.eliminate_common_subexpressions:
+        return 0
+    removed = 0
+    for function in functions:
+        function_removed = number_values(function)
+        if function_removed:
+            optimization_report(
+                "common subexpression elimination",
+                f"removed {function_removed} instructions from {function.name}",
+            )
+        removed += function_removed
+    return removed
+
+
+def _lower_program(statements: list[Statement], options: CompilerOptions) -> list[Function]:
+    """Lower the main scope and every function of a program into the IR."""
+    environment = Environment.of_program(statements)
+    rotate_loops = options.rotate_loops
+    functions = lower_main(statements, environment, rotate_loops=rotate_loops)
+    for statement in statements:
+        if isinstance(statement, FunctionDeclaration):
+            functions.extend(
+                lower_function(statement, environment, rotate_loops=rotate_loops)
+            )
+    _number_values(functions, options)
+    return functions
+
+
+def _generate_units(functions: list[Function], allocate_slots: bool) -> list[CompiledUnit]:
+    """Generate a group of functions lowered together, nested functions included."""
+    captured = captured_variables(functions)
+    return [
+        _generate_unit(function, captured[function.name], allocate_slots)
+        for function in functions
+    ]
+
+
+def _compile_program(
+    statements: list[Statement],
+    cache: "CompilationCache | None",
+    options: CompilerOptions,
+) -> list[CompiledUnit]:
+    """Compile the program, reusing the cached code for unchanged functions."""
+    environment = Environment.of_program(statements)
+    main = lower_main(statements, environment, rotate_loops=options.rotate_loops)
+    removed = _number_values(main, options)
+    units = _generate_units(main, options.allocate_slots)
+    for statement in statements:
+        if not isinstance(statement, FunctionDeclaration):
+            continue
+        key = cache.code_key(statement, options) if cache is not None else None
+        cached = cache.get("code", key) if cache is not None and key else None
+        if cached is not None:
+            units.extend(CompiledUnit.from_json(unit) for unit in cached)
+            continue
+        functions = lower_function(statement, environment, rotate_loops=options.rotate_loops)
+        removed += _number_values(functions, options)
+        function_units = _generate_units(functions, options.allocate_slots)
+        if cache is not None and key:
+            cache.put("code", key, [unit.to_json() for unit in function_units])
+        units.extend(function_units)
+    if options.eliminate_common_subexpressions:
+        optimization_report(
+            "common subexpression elimination",
+            f"removed {removed} instructions from the functions compiled",
+        )
+    return units
+
+
+def _optimize(statements: list[Statement], options: CompilerOptions) -> list[Statement]:
+    """Run the enabled optimizations over a type checked program."""
+    if options.fold_constants:
+        statements = fold_constants(statements)
+    if options.eliminate_dead_code:
+        statements = eliminate_dead_code(statements)
+    if options.inline:
+        statements = inline_functions(statements, options.inline_budget)
+        # Inlined functions called with constants can be simplified further.
+        if options.fold_constants:
+            statements = fold_constants(statements)
+    if options.unroll:
+        unrolled = unroll_loops(statements, options.unroll_budget, options.unroll_factor)
+        # The counters of the unrolled loops are replaced by constants.
+        if options.fold_constants and unrolled is not statements:
+            unrolled = fold_constants(unrolled)
+        statements = unrolled
+    if options.hoist_invariants:
+        statements = hoist_invariants(statements)
+    if options.reduce_strength:
+        statements = reduce_strength(statements)
+    if options.shake_tree:
+        statements = shake_tree(statements, options.keep)
+    return statements
+
+
+def _front_end(
+    source: str, cache: "CompilationCache | None", options: CompilerOptions
+) -> tuple[list[Statement], list[TypeCheckMessage], list[OptimizationReport]]:
+    """
+    Parse, type check and optimize a program, printing the messages.
+
+    Return the statements of the program, prelude included, with the messages
+    and the optimization reports.
+    """
+    pool = ExpressionPool() if options.intern_expressions else None
+    statements = parse(source, pool=pool)
+    prelude = prelude_for(statements)
+
+    type_check_messages: list[TypeCheckMessage] = []
     encountered_type_check_messages.set(type_check_messages)
-    type_check(statements)
+    pool_token = shared_expressions.set(pool)
+    try:
+        _type_check_program(prelude, statements, source, cache, options.type_check_jobs)
+    finally:
+        shared_expressions.reset(pool_token)
     errors_found = False
     for message in type_check_messages:
         if message.level == TypeCheckLevel.ERROR:
@@ -52,11 +686,88 @@ def compile(source: str) -> bytes:
     if errors_found:
         raise RuntimeError("Errors found while type checking, aborting compilation")
 
-    symbols = Symbols({}, {})
-    output = BytesIO()
-    offset = 0
-    for statement in statements:
-        statement_output = _compile_statement(statement, symbols=symbols, offset=offset)
-        offset += len(statement_output)
-        output.write(statement_output)
-    return output.getvalue()
+    # The optimizations warn about the code they remove, as type check messages.
+    first_optimization_message = len(type_check_messages)
+    optimization_reports: list[OptimizationReport] = []
+    encountered_optimization_reports.set(optimization_reports)
+    statements = _optimize([*prelude, *statements], options)
+    for message in type_check_messages[first_optimization_message:]:
+        print(message)
+    if options.report:
+        for report in optimization_reports:
+            print(report, file=sys.stderr)
+
+    return statements, type_check_messages, optimization_reports
+
+
+def lower(source: str, *, options: CompilerOptions | None = None) -> list[Function]:
+    """Compile an SVLang program into the IR its binary is generated from."""
+    if options is None:
+        options = CompilerOptions()
+    statements, _, _ = _front_end(source, None, options)
+    return _lower_program(statements, options)
+
+
+def compile(
+    source: str,
+    *,
+    cache_dir: str | None = None,
+    options: CompilerOptions | None = None,
+) -> memoryview:
+    """
+    Compile an SVLang program into an SVC16 binary.
+
+    If `cache_dir` is set, the results of the compilation are cached there. The
+    binary is reused as is if the source didn't change, otherwise only the
+    functions that changed are type checked and compiled again.
+
+    The binary is returned as a view of the memory image it was linked in,
+    to write it out without copying it. Function bodies can't be type checked
+    in several processes with a cache.
+    """
+    if options is None:
+        options = CompilerOptions()
+    if cache_dir is not None and options.type_check_jobs > 1:
+        raise ValueError("Type checking in several processes isn't supported with a cache")
+    cache = None
+    if cache_dir is not None:
+        from .cache import CompilationCache
+
+        cache = CompilationCache(cache_dir)
+    if cache is not None:
+        program_key = cache.program_key(source, repr(options))
+        cached = cache.get("program", program_key)
+        if cached is not None:
+            for level, message, line in cached["messages"]:
+                print(TypeCheckMessage(TypeCheckLevel[level], message, line))
+            if options.report:
+                for optimization, message, line in cached["reports"]:
+                    print(OptimizationReport(optimization, message, line), file=sys.stderr)
+            return memoryview(bytes.fromhex(cached["binary"]))
+
+    statements, type_check_messages, optimization_reports = _front_end(
+        source, cache, options
+    )
+    first_link_report = len(optimization_reports)
+    binary = _link(_compile_program(statements, cache, options))
+    if options.report:
+        for report in optimization_reports[first_link_report:]:
+            print(report, file=sys.stderr)
+
+    if cache is not None:
+        cache.put(
+            "program",
+            program_key,
+            {
+                "messages": [
+                    [message.level.name, message.message, message.line]
+                    for message in type_check_messages
+                ],
+                "reports": [
+                    [report.optimization, report.message, report.line]
+                    for report in optimization_reports
+                ],
+                "binary": binary.hex(),
+            },
+        )
+    return binary
@@ -0,0 +1,133 @@
+"""
+Dead code and unreachable branch elimination.
+
+Statements following a `return`, a `break`, or a loop that never ends are
+removed, and branches and loops whose condition is a constant are collapsed.
+This runs after constant folding, which turns conditions like `$x < 0` into
+constants.
+"""
+
+from dataclasses import replace
+
+from .ast import *
+from .optimizer import count_nodes, is_pure, optimization_report
+from .typecheck import TypeCheckLevel, type_check_message
+
+
+def _breaks(statements: list[Statement]) -> bool:
+    """Whether a `break` in these statements exits the enclosing loop."""
+    for statement in statements:
+        match statement:
+            case Break():
+                return True
+            case If(_, _, body, else_body):
+                if _breaks(body) or _breaks(else_body or []):
+                    return True
+    return False
+
+
+def falls_through(statements: list[Statement]) -> bool:
+    """Whether the execution can continue after these statements."""
+    for statement in statements:
+        match statement:
+            case Return() | Break():
+                return False
+            case If(_, _, body, else_body) if else_body:
+                if not falls_through(body) and not falls_through(else_body):
+                    return False
+            case While(_, BooleanValue(_, True), body):
+                if not _breaks(body):
+                    return False
+    return True
+
+
+def _captured_variables(statements: list[Statement]) -> set[str]:
+    """The variables referenced by the functions declared in these statements."""
+    return {
+        node.identifier
+        for statement in statements
+        for declaration in walk(statement)
+        if isinstance(declaration, FunctionDeclaration)
+        for node in walk(declaration.statements)
+        if isinstance(node, (VariableReference, Assignment))
+    }
+
+
+def _eliminate(statements: list[Statement], captured: set[str]) -> list[Statement]:
+    output: list[Statement] = []
+    reachable = True
+    for index, statement in enumerate(statements):
+        if not reachable:
+            # Declarations are kept, as they reserve the storage of variables,
+            # which nested functions might use.
+            match statement:
+                case FunctionDeclaration():
+                    output.append(_eliminate_function(statement))
+                case Declaration(_, identifier) if identifier in captured:
+                    output.append(statement)
+            continue
+
+        kept: list[Statement]
+        match statement:
+            case If(lineno, BooleanValue(_, value), body, else_body):
+                type_check_message(
+                    TypeCheckLevel.WARN, f"Condition is always {value}", lineno
+                )
+                kept = _eliminate(body if value else else_body or [], captured)
+
+            case If(_, expression, body, else_body):
+                body = _eliminate(body, captured)
+                else_body = _eliminate(else_body or [], captured)
+                kept = []
+                if body or else_body or not is_pure(expression):
+                    kept.append(
+                        replace(
+                            statement,
+                            statements=body,
+                            else_statements=else_body or None,
+                        )
+                    )
+
+            case While(lineno, BooleanValue(_, False)):
+                type_check_message(
+                    TypeCheckLevel.WARN, "Loop condition is always False", lineno
+                )
+                kept = []
+
+            case While(_, _, body):
+                kept = [replace(statement, statements=_eliminate(body, captured))]
+
+            case FunctionDeclaration():
+                kept = [_eliminate_function(statement)]
+
+            case _:
+                kept = [statement]
+
+        output.extend(kept)
+        if not falls_through(kept):
+            reachable = False
+            unreachable = [
+                rest
+                for rest in statements[index + 1 :]
+                if not isinstance(rest, FunctionDeclaration)
+            ]
+            if unreachable:
+                type_check_message(
+                    TypeCheckLevel.WARN, "Unreachable code", unreachable[0].lineno
+                )
+    return output
+
+
+def _eliminate_function(declaration: FunctionDeclaration) -> FunctionDeclaration:
+    statements = declaration.statements
+    return replace(
+        declaration, statements=_eliminate(statements, _captured_variables(statements))
+    )
+
+
+def eliminate_dead_code(statements: list[Statement]) -> list[Statement]:
+    """Remove the unreachable statements of a program."""
+    eliminated = _eliminate(statements, _captured_variables(statements))
+    removed = count_nodes(statements) - count_nodes(eliminated)
+    optimization_report("dead code elimination", f"removed {removed} nodes")
+    return eliminated
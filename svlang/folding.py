@@ -0,0 +1,298 @@
+"""
+Constant folding and algebraic simplification.
+
+Arithmetic is folded the way the SVC16 computes it, on 16 bit words that wrap
+around. Divisions by zero are left as is, and simplifications that would drop
+an operand are only done when that operand has no side effects.
+"""
+
+from dataclasses import replace
+
+from .ast import *
+from .optimizer import count_nodes, is_pure, optimization_report
+
+_WORD_MASK = 0xFFFF
+
+_ASSOCIATIVE_OPERATORS = (NumericOperator.ADD, NumericOperator.MUL)
+
+_INVERTED_COMPARATORS = {
+    NumericComparator.LT: NumericComparator.GEQ,
+    NumericComparator.LEQ: NumericComparator.GT,
+    NumericComparator.EQ: NumericComparator.NEQ,
+    NumericComparator.NEQ: NumericComparator.EQ,
+    NumericComparator.GEQ: NumericComparator.LT,
+    NumericComparator.GT: NumericComparator.LEQ,
+}
+
+
+def _compute(left: int, operator: NumericOperator, right: int) -> int:
+    match operator:
+        case NumericOperator.ADD:
+            return (left + right) & _WORD_MASK
+        case NumericOperator.SUB:
+            return (left - right) & _WORD_MASK
+        case NumericOperator.MUL:
+            return (left * right) & _WORD_MASK
+        case NumericOperator.DIV:
+            return left // right
+
+
+def _compare(left: int, comparator: NumericComparator, right: int) -> bool:
+    match comparator:
+        case NumericComparator.LT:
+            return left < right
+        case NumericComparator.LEQ:
+            return left <= right
+        case NumericComparator.EQ:
+            return left == right
+        case NumericComparator.NEQ:
+            return left != right
+        case NumericComparator.GEQ:
+            return left >= right
+        case NumericComparator.GT:
+            return left > right
+
+
+def _same_variable(left: Expression, right: Expression) -> bool:
+    return (
+        isinstance(left, VariableReference)
+        and isinstance(right, VariableReference)
+        and left.identifier == right.identifier
+    )
+
+
+def _fold_numeric_expression(
+    lineno: int, left: Expression, operator: NumericOperator, right: Expression
+) -> Expression:
+    match left, operator, right:
+        case NumericValue(_, left_value), _, NumericValue(_, right_value):
+            if operator == NumericOperator.DIV and right_value == 0:
+                return NumericExpression(lineno, left, operator, right)
+            return NumericValue(lineno, _compute(left_value, operator, right_value))
+
+        case (
+            (_, NumericOperator.ADD, NumericValue(_, 0))
+            | (_, NumericOperator.SUB, NumericValue(_, 0))
+            | (_, NumericOperator.MUL, NumericValue(_, 1))
+            | (_, NumericOperator.DIV, NumericValue(_, 1))
+        ):
+            return left
+
+        case (NumericValue(_, 0), NumericOperator.ADD, _) | (
+            NumericValue(_, 1),
+            NumericOperator.MUL,
+            _,
+        ):
+            return right
+
+        case (_, NumericOperator.MUL, NumericValue(_, 0)) if is_pure(left):
+            return NumericValue(lineno, 0)
+
+        case (NumericValue(_, 0), NumericOperator.MUL, _) if is_pure(right):
+            return NumericValue(lineno, 0)
+
+        case (_, NumericOperator.SUB, _) if _same_variable(left, right):
+            return NumericValue(lineno, 0)
+
+    # Addition and multiplication are associative and commutative modulo 2^16,
+    # so constants can be gathered: `1 + (2 + $x)` becomes `3 + $x`.
+    if operator in _ASSOCIATIVE_OPERATORS:
+        match left, right:
+            case NumericValue(_, constant), NumericExpression(
+                _, NumericValue(_, nested_constant), nested_operator, rest
+            ) | NumericExpression(
+                _, rest, nested_operator, NumericValue(_, nested_constant)
+            ) if nested_operator == operator:
+                combined = NumericValue(
+                    lineno, _compute(constant, operator, nested_constant)
+                )
+                return _fold_numeric_expression(lineno, combined, operator, rest)
+            case NumericExpression(
+                _, NumericValue(_, nested_constant), nested_operator, rest
+            ) | NumericExpression(
+                _, rest, nested_operator, NumericValue(_, nested_constant)
+            ), NumericValue(_, constant) if nested_operator == operator:
+                combined = NumericValue(
+                    lineno, _compute(nested_constant, operator, constant)
+                )
+                return _fold_numeric_expression(lineno, rest, operator, combined)
+
+    return NumericExpression(lineno, left, operator, right)
+
+
+def _fold_numeric_comparison(
+    lineno: int, left: Expression, comparator: NumericComparator, right: Expression
+) -> Expression:
+    match left, comparator, right:
+        case NumericValue(_, left_value), _, NumericValue(_, right_value):
+            return BooleanValue(lineno, _compare(left_value, comparator, right_value))
+
+        # Words are unsigned, nothing is lower than 0.
+        case (_, NumericComparator.LT, NumericValue(_, 0)) | (
+            NumericValue(_, 0),
+            NumericComparator.GT,
+            _,
+        ) if is_pure(left) and is_pure(right):
+            return BooleanValue(lineno, False)
+
+        case (_, NumericComparator.GEQ, NumericValue(_, 0)) | (
+            NumericValue(_, 0),
+            NumericComparator.LEQ,
+            _,
+        ) if is_pure(left) and is_pure(right):
+            return BooleanValue(lineno, True)
+
+        case _ if _same_variable(left, right):
+            return BooleanValue(lineno, _compare(0, comparator, 0))
+
+    return NumericComparison(lineno, left, comparator, right)
+
+
+def _fold_boolean_expression(
+    lineno: int, left: Expression, operator: BooleanOperator, right: Expression
+) -> Expression:
+    # Both operands are always evaluated, so one can only be dropped if it has
+    # no side effects.
+    absorbing = operator == BooleanOperator.OR
+    match left, right:
+        case BooleanValue(_, left_value), BooleanValue(_, right_value):
+            if operator == BooleanOperator.AND:
+                return BooleanValue(lineno, left_value and right_value)
+            return BooleanValue(lineno, left_value or right_value)
+
+        case BooleanValue(_, value), _:
+            if value != absorbing:
+                return right
+            if is_pure(right):
+                return BooleanValue(lineno, absorbing)
+
+        case _, BooleanValue(_, value):
+            if value != absorbing:
+                return left
+            if is_pure(left):
+                return BooleanValue(lineno, absorbing)
+
+    return BooleanExpression(lineno, left, operator, right)
+
+
+def _fold_boolean_negation(lineno: int, expression: Expression) -> Expression:
+    match expression:
+        case BooleanValue(_, value):
+            return BooleanValue(lineno, not value)
+        case BooleanNegation(_, negated):
+            return negated
+        case NumericComparison(_, left, comparator, right):
+            return NumericComparison(
+                lineno, left, _INVERTED_COMPARATORS[comparator], right
+            )
+    return BooleanNegation(lineno, expression)
+
+
+def _fold_binary_expression(
+    lineno: int,
+    left: NumericValue | VariableReference,
+    operator: BinaryOP,
+    right: NumericValue | VariableReference,
+) -> Expression:
+    match left, operator, right:
+        case NumericValue(_, left_value), BinaryOP.AND, NumericValue(_, right_value):
+            return NumericValue(lineno, left_value & right_value)
+        case NumericValue(_, left_value), BinaryOP.XOR, NumericValue(_, right_value):
+            return NumericValue(lineno, left_value ^ right_value)
+
+        case (_, BinaryOP.AND, NumericValue(_, 0)) | (
+            NumericValue(_, 0),
+            BinaryOP.AND,
+            _,
+        ):
+            return NumericValue(lineno, 0)
+
+        case (_, BinaryOP.AND, NumericValue(_, 0xFFFF)) | (
+            _,
+            BinaryOP.XOR,
+            NumericValue(_, 0),
+        ):
+            return left
+        case (NumericValue(_, 0xFFFF), BinaryOP.AND, _) | (
+            NumericValue(_, 0),
+            BinaryOP.XOR,
+            _,
+        ):
+            return right
+
+        case _, BinaryOP.AND, _ if _same_variable(left, right):
+            return left
+        case _, BinaryOP.XOR, _ if _same_variable(left, right):
+            return NumericValue(lineno, 0)
+
+    return BinaryExpression(lineno, left, operator, right)
+
+
+def fold_expression(expression: Expression) -> Expression:
+    """Fold the constant parts of an expression, and simplify it."""
+    match expression:
+        case NumericExpression(lineno, left, operator, right):
+            return _fold_numeric_expression(
+                lineno, fold_expression(left), operator, fold_expression(right)
+            )
+        case NumericComparison(lineno, left, comparator, right):
+            return _fold_numeric_comparison(
+                lineno, fold_expression(left), comparator, fold_expression(right)
+            )
+        case BooleanExpression(lineno, left, operator, right):
+            return _fold_boolean_expression(
+                lineno, fold_expression(left), operator, fold_expression(right)
+            )
+        case BooleanNegation(lineno, negated):
+            return _fold_boolean_negation(lineno, fold_expression(negated))
+        case BinaryExpression(lineno, left, operator, right):
+            return _fold_binary_expression(lineno, left, operator, right)
+        case BinaryNegation(lineno, NumericValue(_, value)):
+            return NumericValue(lineno, ~value & _WORD_MASK)
+        case FunctionCall(lineno, identifier, arguments):
+            return FunctionCall(
+                lineno, identifier, [fold_expression(arg) for arg in arguments]
+            )
+    return expression
+
+
+def _fold_statements(statements: list[Statement]) -> list[Statement]:
+    return [_fold_statement(statement) for statement in statements]
+
+
+def _fold_statement(statement: Statement) -> Statement:
+    match statement:
+        case Declaration(value=value) | Assignment(value=value):
+            return replace(statement, value=fold_expression(value))
+        case While(_, expression, statements):
+            return replace(
+                statement,
+                expression=fold_expression(expression),
+                statements=_fold_statements(statements),
+            )
+        case If(_, expression, statements, else_statements):
+            return replace(
+                statement,
+                expression=fold_expression(expression),
+                statements=_fold_statements(statements),
+                else_statements=(
+                    None
+                    if else_statements is None
+                    else _fold_statements(else_statements)
+                ),
+            )
+        case Return(_, expression) if expression is not None:
+            return replace(statement, expression=fold_expression(expression))
+        case FunctionDeclaration(statements=statements):
+            return replace(statement, statements=_fold_statements(statements))
+        case Expression():
+            return fold_expression(statement)
+    return statement
+
+
+def fold_constants(statements: list[Statement]) -> list[Statement]:
+    """Fold constants and simplify the expressions of a program."""
+    folded = _fold_statements(statements)
+    removed = count_nodes(statements) - count_nodes(folded)
+    optimization_report("constant folding", f"removed {removed} nodes")
+    return folded
@@ -1,9 +1,29 @@
+import gc
+import os
+import sys
+
+from typing import TYPE_CHECKING
+
 import ply.yacc as yacc
 
 from .ast import *
-from .tokens import tokens
+from .tokens import tokens, Scanner
+
+if TYPE_CHECKING:
+    from .interning import ExpressionPool
+
+start = "program"
 
-start = "statements"
+_pool: "ExpressionPool | None" = None
+"""The pool the expressions of the program being parsed are shared in, if any."""
+
+
+def p_program(p):
+    """
+    program : statements
+            |
+    """
+    p[0] = p[1] if len(p) == 2 else []
 
 
 def p_type_reference(p):
@@ -42,19 +62,26 @@ def p_assignment(p):
 
 def p_function_arguments(p):
     """
-    function_arguments : expression ',' function_arguments
-                       | expression
+    function_arguments : function_argument_list
                        |
     """
-    if len(p) == 1:
-        p[0] = []
-    elif len(p) == 2:
+    p[0] = p[1] if len(p) == 2 else []
+
+
+def p_function_argument_list(p):
+    """
+    function_argument_list : function_argument_list ',' expression
+                           | expression
+    """
+    # Left recursive, so the list is built in place, in linear time.
+    if len(p) == 2:
         assert isinstance(p[1], Expression)
         p[0] = [p[1]]
     else:
-        assert isinstance(p[1], Expression)
-        assert isinstance(p[3], list)
-        p[0] = [p[1]] + p[3]
+        assert isinstance(p[1], list)
+        assert isinstance(p[3], Expression)
+        p[1].append(p[3])
+        p[0] = p[1]
 
 
 def p_function_call(p):
@@ -247,21 +274,27 @@ def p_if(p):
 
 def p_function_declare_arguments(p):
     """
-    function_declare_arguments : VARIABLE_IDENTIFIER ':' type_reference ',' function_declare_arguments
-                               | VARIABLE_IDENTIFIER ':' type_reference
+    function_declare_arguments : function_declare_argument_list
                                |
     """
-    if len(p) == 1:
-        p[0] = []
-    elif len(p) == 4:
+    p[0] = p[1] if len(p) == 2 else []
+
+
+def p_function_declare_argument_list(p):
+    """
+    function_declare_argument_list : function_declare_argument_list ',' VARIABLE_IDENTIFIER ':' type_reference
+                                   | VARIABLE_IDENTIFIER ':' type_reference
+    """
+    if len(p) == 4:
         assert isinstance(p[1], str)
         assert isinstance(p[3], ValueType)
         p[0] = [ArgumentDeclaration(p[1], p[3])]
-    elif len(p) == 6:
-        assert isinstance(p[1], str)
-        assert isinstance(p[3], ValueType)
-        assert isinstance(p[5], list)
-        p[0] = [ArgumentDeclaration(p[1], p[3]), *p[5]]
+    else:
+        assert isinstance(p[1], list)
+        assert isinstance(p[3], str)
+        assert isinstance(p[5], ValueType)
+        p[1].append(ArgumentDeclaration(p[3], p[5]))
+        p[0] = p[1]
 
 
 def p_function_declaration(p):
@@ -269,17 +302,18 @@ def p_function_declaration(p):
     function_declaration : DEF FUNCTION_IDENTIFIER '(' function_declare_arguments ')' ARROW type_reference '{' statements '}'
                          | DEF FUNCTION_IDENTIFIER '(' function_declare_arguments ')' '{' statements '}'
     """
+    source_span = (p.lexpos(1), p.lexpos(len(p) - 1) + 1)
     if len(p) == 11:
         assert isinstance(p[2], str)
         assert isinstance(p[4], list)
         assert isinstance(p[7], ValueType)
         assert isinstance(p[9], list)
-        p[0] = FunctionDeclaration(p.lineno(1), p[2], p[4], p[7], p[9])
+        p[0] = FunctionDeclaration(p.lineno(1), p[2], p[4], p[7], p[9], source_span)
     else:
         assert isinstance(p[2], str)
         assert isinstance(p[4], list)
         assert isinstance(p[7], list)
-        p[0] = FunctionDeclaration(p.lineno(1), p[2], p[4], None, p[7])
+        p[0] = FunctionDeclaration(p.lineno(1), p[2], p[4], None, p[7], source_span)
 
 
 def p_return(p):
@@ -334,18 +368,24 @@ def p_statement(p):
               | break
               | asm
     """
-    p[0] = p[1]
+    # Sharing expressions as their statement is reduced means the unshared
+    # copies never pile up into a whole tree.
+    p[0] = p[1] if _pool is None else _pool.intern_parsed_statement(p[1])
 
 
 def p_statements(p):
     """
-    statements : statement statements
+    statements : statements statement
                | statement
     """
+    # Left recursive, so the parser stack doesn't grow with the number of
+    # statements, and the list is built in place, in linear time.
     if len(p) == 2:
         p[0] = [p[1]]
     else:
-        p[0] = [p[1]] + p[2]
+        assert isinstance(p[1], list)
+        p[1].append(p[2])
+        p[0] = p[1]
 
 
 # Error rule for syntax errors
@@ -356,20 +396,85 @@ def p_error(p):
         raise SyntaxError("Unexpected end of file")
 
 
-# Build the parser
-parser = yacc.yacc()
+_parser: yacc.LRParser | None = None
+
+
+def get_parser() -> yacc.LRParser:
+    """
+    Return the parser, building it on first use.
+
+    The LALR tables are read from the pregenerated `parsetab` module shipped
+    with the package, without building them again. They are only used if they
+    were generated from the current tokens and grammar rules, compared through
+    the signature PLY computes from them. Nothing is written to disk: if the
+    tables are missing or stale they are generated in memory.
+    """
+    global _parser
+    if _parser is None:
+        grammar = yacc.ParserReflect(globals())
+        grammar.get_all()
+        try:
+            from . import parsetab
+        except ImportError:
+            parsetab = None
+        table = yacc.LRTable()
+        if parsetab is not None and table.read_table(parsetab) == grammar.signature():
+            table.bind_callables(globals())
+            _parser = yacc.LRParser(table, p_error)
+        else:
+            _parser = yacc.yacc(
+                module=sys.modules[__name__], debug=False, write_tables=False
+            )
+    return _parser
+
+
+def build_tables(outputdir: str = os.path.dirname(__file__)) -> None:
+    """Regenerate the `parsetab` module shipped with the package."""
+    yacc.yacc(
+        module=sys.modules[__name__],
+        debug=False,
+        write_tables=True,
+        outputdir=outputdir,
+    )
 
 
-def parse(source: str) -> list[Statement]:
-    return parser.parse(source, tracking=True)
+def parse(source: str, *, pool: "ExpressionPool | None" = None) -> list[Statement]:
+    """
+    Parse a program. If `pool` is set, its expressions are shared in it while
+    parsing, see `svlang.interning`.
+    """
+    global _pool
+    # The garbage collector would go through the whole tree again and again as
+    # it grows, making parsing quadratic. The tree holds no reference cycles.
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    parser = get_parser()
+    _pool = pool
+    try:
+        return parser.parse(source, lexer=Scanner(), tracking=True)
+    finally:
+        _pool = None
+        # The parser keeps its stacks, which hold the tree, until it's used
+        # again.
+        parser.restart()
+        if gc_enabled:
+            gc.enable()
 
 
 if __name__ == "__main__":
     from argparse import ArgumentParser
 
     p = ArgumentParser()
-    p.add_argument("source")
+    p.add_argument("source", nargs="?")
+    p.add_argument(
+        "--build-tables",
+        action="store_true",
+        help="Regenerate the parser tables shipped with the package",
+    )
     args = p.parse_args()
-    with open(args.source, "r") as source_file:
-        for statement in parse(source_file.read()):
-            pprint(statement)
+    if args.build_tables:
+        build_tables()
+    if args.source is not None:
+        with open(args.source, "r") as source_file:
+            for statement in parse(source_file.read()):
+                pprint(statement)
@@ -0,0 +1,191 @@
+"""
+Loop-invariant code motion.
+
+The expressions of a `while` loop whose value can't change while it runs are
+computed once, into a new variable declared before the loop. An expression is
+invariant if it calls no function, and none of the variables it reads are
+written in the loop: by its statements, its ASM instructions, or the functions
+it calls, directly or not.
+
+Hoisted expressions are evaluated even if the loop doesn't run, so only
+divisions by non-zero constants are hoisted, as they can't fault. Loops are
+processed from the outermost one, so expressions move as far out as they can.
+"""
+
+from dataclasses import replace
+
+from .ast import *
+from .interning import ExpressionPool
+from .optimizer import function_writes, is_invariant, loop_writes, optimization_report
+
+_OPERATIONS = (
+    NumericExpression,
+    NumericComparison,
+    BooleanExpression,
+    BooleanNegation,
+    BinaryExpression,
+    BinaryNegation,
+)
+
+
+def _operations(expression: Expression) -> int:
+    return sum(isinstance(node, _OPERATIONS) for node in walk(expression))
+
+
+def _type(expression: Expression) -> ValueType:
+    if isinstance(expression, (NumericExpression, BinaryExpression, BinaryNegation)):
+        return ValueType.UINT
+    return ValueType.BOOL
+
+
+class _Motion:
+    """Hoist the invariant expressions of a loop."""
+
+    def __init__(self, hoister: "_Hoister", loop: While, written: set[str]):
+        self.hoister = hoister
+        self.loop = loop
+        self.written = written
+        self.pool = ExpressionPool()
+        self.variables: dict[int, str] = {}
+        """The variable holding each hoisted expression, by shared node id."""
+        self.declarations: list[Declaration] = []
+
+    def expression(self, expression: Expression, *, stored: bool) -> Expression:
+        """
+        Hoist the invariant parts of an expression.
+
+        The value of a `stored` expression is copied somewhere, a copy of the
+        hoisted variable would cost as much as a single operation.
+        """
+        minimum = 2 if stored else 1
+        if _operations(expression) >= minimum and is_invariant(expression, self.written):
+            return self.hoist(expression)
+        match expression:
+            case FunctionCall(_, _, arguments):
+                return replace(
+                    expression,
+                    arguments=[self.expression(argument, stored=True) for argument in arguments],
+                )
+            case NumericExpression(_, left, _, right) | NumericComparison(
+                _, left, _, right
+            ) | BooleanExpression(_, left, _, right):
+                return replace(
+                    expression,
+                    left=self.expression(left, stored=False),
+                    right=self.expression(right, stored=False),
+                )
+            case BooleanNegation(_, negated):
+                return replace(expression, expression=self.expression(negated, stored=False))
+        return expression
+
+    def hoist(self, expression: Expression) -> VariableReference:
+        key = id(self.pool.intern(expression))
+        name = self.variables.get(key)
+        if name is None:
+            name = self.variables[key] = self.hoister.fresh_name()
+            self.declarations.append(
+                Declaration(self.loop.lineno, name, _type(expression), expression)
+            )
+        return VariableReference(expression.lineno, name)
+
+    def statements(self, statements: list[Statement]) -> list[Statement]:
+        return [self.statement(statement) for statement in statements]
+
+    def statement(self, statement: Statement) -> Statement:
+        match statement:
+            case Declaration(value=value) | Assignment(value=value):
+                return replace(statement, value=self.expression(value, stored=True))
+            case Return(_, expression) if expression is not None:
+                return replace(statement, expression=self.expression(expression, stored=True))
+            case While(_, expression, statements):
+                return replace(
+                    statement,
+                    expression=self.expression(expression, stored=False),
+                    statements=self.statements(statements),
+                )
+            case If(_, expression, statements, else_statements):
+                return replace(
+                    statement,
+                    expression=self.expression(expression, stored=False),
+                    statements=self.statements(statements),
+                    else_statements=(
+                        None if else_statements is None else self.statements(else_statements)
+                    ),
+                )
+            case Expression():
+                return self.expression(statement, stored=True)
+        return statement
+
+
+class _Hoister:
+    def __init__(self, statements: list[Statement]):
+        self.function_writes = function_writes(statements)
+        self.names: set[str] = set()
+        for node in walk(statements):
+            match node:
+                case VariableReference(_, identifier) | Declaration(
+                    _, identifier
+                ) | Assignment(_, identifier) | ArgumentDeclaration(identifier):
+                    self.names.add(identifier)
+        self.hoisted = 0
+        self.loops = 0
+
+    def fresh_name(self) -> str:
+        name = f"invariant_{self.hoisted}"
+        while name in self.names:
+            name = f"_{name}"
+        self.names.add(name)
+        self.hoisted += 1
+        return name
+
+    def statements(self, statements: list[Statement]) -> list[Statement]:
+        output: list[Statement] = []
+        for statement in statements:
+            match statement:
+                case While():
+                    output.extend(self.loop(statement))
+                case If(_, _, body, else_body):
+                    output.append(
+                        replace(
+                            statement,
+                            statements=self.statements(body),
+                            else_statements=(
+                                None if else_body is None else self.statements(else_body)
+                            ),
+                        )
+                    )
+                case FunctionDeclaration(statements=body):
+                    output.append(replace(statement, statements=self.statements(body)))
+                case _:
+                    output.append(statement)
+        return output
+
+    def loop(self, loop: While) -> list[Statement]:
+        declarations: list[Declaration] = []
+        writes = loop_writes(loop, self.function_writes)
+        if writes is not None:
+            motion = _Motion(self, loop, writes[0] | writes[1])
+            loop = motion.statement(loop)  # type: ignore
+            declarations = motion.declarations
+        if declarations:
+            self.loops += 1
+            optimization_report(
+                "loop-invariant code motion",
+                "moved "
+                + ", ".join(str(declaration.value) for declaration in declarations)
+                + " out of the loop",
+                loop.lineno,
+            )
+        # The nested loops may have invariants of their own.
+        return [*declarations, replace(loop, statements=self.statements(loop.statements))]
+
+
+def hoist_invariants(statements: list[Statement]) -> list[Statement]:
+    """Move the loop-invariant expressions of a program out of their loops."""
+    hoister = _Hoister(statements)
+    statements = hoister.statements(statements)
+    optimization_report(
+        "loop-invariant code motion",
+        f"moved {hoister.hoisted} expressions out of {hoister.loops} loops",
+    )
+    return statements
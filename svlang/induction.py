@@ -0,0 +1,407 @@
+"""
+Induction variable optimizations.
+
+A basic induction variable of a `while` loop is only written by increments by
+a constant, like `$i = $i + 1`. Its product by a loop-invariant value, like
+`$i * $width`, then changes by a constant step at each increment: it is kept in
+a new variable, computed before the loop and increased after each increment,
+instead of being multiplied wherever it's used.
+
+The SVC16 multiplies in a single instruction, like it adds, so this only saves
+instructions when a product is evaluated more often than the variable is
+incremented. Products that are stored as they are aren't replaced, as the copy
+of the running variable would cost as much. Multiplications and divisions by
+powers of two are single instructions too, there are no shifts to turn them
+into: replacing `$x * 2` by `$x + $x` costs the same instruction, and longer
+chains of additions for higher powers cost more, so they are left as they are.
+
+Declarations in a loop whose value doesn't change, the degenerate case of a
+variable with a step of zero, are moved before the loop along with their
+variable, saving their instruction on every iteration.
+"""
+
+from collections import Counter
+from dataclasses import dataclass, field, replace
+
+from .ast import *
+from .optimizer import (
+    function_writes,
+    increment_step,
+    is_invariant,
+    loop_writes,
+    optimization_report,
+)
+
+_WORD_MASK = 0xFFFF
+
+_Multiplier = tuple[str, int | str]
+"""A loop-invariant multiplier, `("value", 8)` or `("variable", "width")`."""
+
+
+def _writes_by_variable(node: Any) -> dict[str, list[Statement]]:
+    """The declarations and assignments of each variable in a node."""
+    writes: dict[str, list[Statement]] = {}
+    for child in walk(node):
+        if isinstance(child, (Declaration, Assignment)):
+            writes.setdefault(child.identifier, []).append(child)
+    return writes
+
+
+@dataclass
+class _Product:
+    variable: str
+    multiplier: _Multiplier
+    weight: float = 0
+    """How many times the product is evaluated per iteration, as an operand."""
+
+
+@dataclass
+class _Induction:
+    """The products of the basic induction variables of a loop."""
+
+    steps: dict[str, int]
+    written: set[str]
+    products: dict[tuple[str, _Multiplier], _Product] = field(default_factory=dict)
+
+    def product(self, expression: Expression) -> tuple[str, _Multiplier] | None:
+        """The key of an expression, if it's a product of an induction variable."""
+        match expression:
+            case NumericExpression(
+                _, VariableReference(_, variable), NumericOperator.MUL, other
+            ) | NumericExpression(
+                _, other, NumericOperator.MUL, VariableReference(_, variable)
+            ) if variable in self.steps:
+                match other:
+                    case NumericValue(_, value):
+                        return (variable, ("value", value))
+                    case VariableReference(_, identifier) if identifier not in self.written:
+                        return (variable, ("variable", identifier))
+        return None
+
+    def count(self, node: Any, weight: float, *, stored: bool = False) -> None:
+        """Count the products evaluated as operands in a node, per iteration."""
+        match node:
+            case list():
+                for item in node:
+                    self.count(item, weight)
+            case Declaration(value=value) | Assignment(value=value):
+                self.count(value, weight, stored=True)
+            case Return(_, expression) if expression is not None:
+                self.count(expression, weight, stored=True)
+            case While(_, expression, statements):
+                # Nested loops usually run more than once.
+                self.count(expression, weight * 2)
+                self.count(statements, weight * 2)
+            case If(_, expression, statements, else_statements):
+                self.count(expression, weight)
+                # The branches may not run.
+                self.count(statements, 0)
+                self.count(else_statements or [], 0)
+            case FunctionCall(_, _, arguments):
+                for argument in arguments:
+                    self.count(argument, weight, stored=True)
+            case Expression():
+                key = self.product(node)
+                if key is not None and not stored:
+                    product = self.products.setdefault(key, _Product(*key))
+                    product.weight += weight
+                    return
+                if key is not None:
+                    self.products.setdefault(key, _Product(*key))
+                if is_dataclass(node):
+                    for node_field in fields(node):
+                        if node_field.name != "lineno":
+                            self.count(getattr(node, node_field.name), weight)
+
+
+class _Reducer:
+    def __init__(self, statements: list[Statement]):
+        self.function_writes = function_writes(statements)
+        self.reads = Counter(
+            node.identifier for node in walk(statements) if isinstance(node, VariableReference)
+        )
+        self.names: set[str] = set()
+        for node in walk(statements):
+            match node:
+                case VariableReference(_, identifier) | Declaration(
+                    _, identifier
+                ) | Assignment(_, identifier) | ArgumentDeclaration(identifier):
+                    self.names.add(identifier)
+        self.moved = 0
+        self.reduced = 0
+
+    def fresh_name(self, name: str) -> str:
+        while name in self.names:
+            name = f"_{name}"
+        self.names.add(name)
+        return name
+
+    def statements(self, statements: list[Statement]) -> list[Statement]:
+        output: list[Statement] = []
+        for statement in statements:
+            match statement:
+                case While():
+                    output.extend(self.loop(statement))
+                case If(_, _, body, else_body):
+                    output.append(
+                        replace(
+                            statement,
+                            statements=self.statements(body),
+                            else_statements=(
+                                None if else_body is None else self.statements(else_body)
+                            ),
+                        )
+                    )
+                case FunctionDeclaration(statements=body):
+                    output.append(replace(statement, statements=self.statements(body)))
+                case _:
+                    output.append(statement)
+        return output
+
+    def loop(self, loop: While) -> list[Statement]:
+        prefix: list[Statement] = []
+        writes = loop_writes(loop, self.function_writes)
+        if writes is not None:
+            assigned, indirect = writes
+            loop, moved = self.move_invariant_declarations(loop, assigned | indirect, indirect)
+            prefix.extend(moved)
+            if moved:
+                self.moved += len(moved)
+                optimization_report(
+                    "induction variables",
+                    "moved the declarations of "
+                    + ", ".join(f"${declaration.identifier}" for declaration in moved)
+                    + " out of the loop",
+                    loop.lineno,
+                )
+            written = (assigned | indirect) - {declaration.identifier for declaration in moved}
+            loop = self.reduce_products(loop, written, indirect, prefix)
+        # The nested loops may have induction variables of their own.
+        return [*prefix, replace(loop, statements=self.statements(loop.statements))]
+
+    def move_invariant_declarations(
+        self, loop: While, written: set[str], indirect: set[str]
+    ) -> tuple[While, list[Declaration]]:
+        """
+        Move the declarations of the variables only written by their
+        declaration, and whose value is invariant, before the loop.
+
+        Loops don't have a scope of their own, so the variable must also only
+        be read in the loop: its value would differ if the loop doesn't run.
+        """
+        writes = _writes_by_variable(loop)
+        reads = Counter(
+            node.identifier for node in walk(loop) if isinstance(node, VariableReference)
+        )
+        moved: list[Declaration] = []
+        moved_ids: set[int] = set()
+        # Moving a declaration may make the ones reading its variable invariant.
+        changed = True
+        while changed:
+            changed = False
+            for identifier, statements in writes.items():
+                declaration = statements[0]
+                if (
+                    len(statements) == 1
+                    and isinstance(declaration, Declaration)
+                    and id(declaration) not in moved_ids
+                    and identifier not in indirect
+                    and reads[identifier] == self.reads[identifier]
+                    and is_invariant(declaration.value, written)
+                ):
+                    moved.append(replace(declaration, lineno=loop.lineno))
+                    moved_ids.add(id(declaration))
+                    written = written - {identifier}
+                    changed = True
+        if not moved:
+            return loop, moved
+
+        def remove(statements: list[Statement]) -> list[Statement]:
+            output = []
+            for statement in statements:
+                match statement:
+                    case Declaration() if id(statement) in moved_ids:
+                        continue
+                    case While(_, _, body):
+                        statement = replace(statement, statements=remove(body))
+                    case If(_, _, body, else_body):
+                        statement = replace(
+                            statement,
+                            statements=remove(body),
+                            else_statements=None if else_body is None else remove(else_body),
+                        )
+                output.append(statement)
+            return output
+
+        return replace(loop, statements=remove(loop.statements)), moved
+
+    def reduce_products(
+        self, loop: While, written: set[str], indirect: set[str], prefix: list[Statement]
+    ) -> While:
+        """Replace the products of induction variables by running variables."""
+        steps: dict[str, int] = {}
+        for identifier, statements in _writes_by_variable(loop).items():
+            found = [increment_step(statement, identifier) for statement in statements]
+            if identifier not in indirect and None not in found:
+                # Only the number of increments matters, not their steps.
+                steps[identifier] = len(found)
+        if not steps:
+            return loop
+
+        induction = _Induction(steps, written)
+        induction.count(loop.expression, 1)
+        induction.count(loop.statements, 1)
+        replaced: dict[tuple[str, _Multiplier], str] = {}
+        for key, product in induction.products.items():
+            if product.weight <= steps[product.variable]:
+                continue
+            variable, (kind, multiplier) = key
+            reference = (
+                NumericValue(loop.lineno, multiplier)
+                if kind == "value"
+                else VariableReference(loop.lineno, multiplier)
+            )
+            name = self.fresh_name(f"{variable}_times_{multiplier}")
+            prefix.append(
+                Declaration(
+                    loop.lineno,
+                    name,
+                    ValueType.UINT,
+                    NumericExpression(
+                        loop.lineno,
+                        VariableReference(loop.lineno, variable),
+                        NumericOperator.MUL,
+                        reference,
+                    ),
+                )
+            )
+            replaced[key] = name
+            self.reduced += 1
+            optimization_report(
+                "induction variables",
+                f"replaced ${variable} * {reference} by a running sum",
+                loop.lineno,
+            )
+        if not replaced:
+            return loop
+
+        strides: dict[tuple[str, _Multiplier, int], Expression] = {}
+
+        def stride(
+            key: tuple[str, _Multiplier], step: int, lineno: int
+        ) -> tuple[NumericOperator, Expression]:
+            """The operation keeping a running product up to date."""
+            _, (kind, multiplier) = key
+            if kind == "value":
+                return NumericOperator.ADD, NumericValue(lineno, (multiplier * step) & _WORD_MASK)
+            if step == 1:
+                return NumericOperator.ADD, VariableReference(lineno, multiplier)
+            if step == _WORD_MASK:
+                return NumericOperator.SUB, VariableReference(lineno, multiplier)
+            if (*key, step) not in strides:
+                name = self.fresh_name(f"{multiplier}_times_{step}")
+                prefix.append(
+                    Declaration(
+                        loop.lineno,
+                        name,
+                        ValueType.UINT,
+                        NumericExpression(
+                            loop.lineno,
+                            VariableReference(loop.lineno, multiplier),
+                            NumericOperator.MUL,
+                            NumericValue(loop.lineno, step),
+                        ),
+                    )
+                )
+                strides[(*key, step)] = VariableReference(loop.lineno, name)
+            return NumericOperator.ADD, strides[(*key, step)]
+
+        def expression(node: Expression, stored: bool) -> Expression:
+            key = induction.product(node)
+            if key in replaced and not stored:
+                return VariableReference(node.lineno, replaced[key])
+            match node:
+                case FunctionCall(_, _, arguments):
+                    return replace(
+                        node, arguments=[expression(argument, True) for argument in arguments]
+                    )
+                case NumericExpression(_, left, _, right) | NumericComparison(
+                    _, left, _, right
+                ) | BooleanExpression(_, left, _, right):
+                    return replace(
+                        node, left=expression(left, False), right=expression(right, False)
+                    )
+                case BooleanNegation(_, negated):
+                    return replace(node, expression=expression(negated, False))
+            return node
+
+        def statements(body: list[Statement]) -> list[Statement]:
+            output: list[Statement] = []
+            for statement in body:
+                match statement:
+                    case Declaration(value=value) | Assignment(value=value):
+                        output.append(replace(statement, value=expression(value, True)))
+                        for key, name in replaced.items():
+                            step = increment_step(statement, key[0])
+                            if step is None:
+                                continue
+                            operator, amount = stride(key, step, statement.lineno)
+                            output.append(
+                                Assignment(
+                                    statement.lineno,
+                                    name,
+                                    NumericExpression(
+                                        statement.lineno,
+                                        VariableReference(statement.lineno, name),
+                                        operator,
+                                        amount,
+                                    ),
+                                )
+                            )
+                    case Return(_, value) if value is not None:
+                        output.append(replace(statement, expression=expression(value, True)))
+                    case While(_, condition, body):
+                        output.append(
+                            replace(
+                                statement,
+                                expression=expression(condition, False),
+                                statements=statements(body),
+                            )
+                        )
+                    case If(_, condition, body, else_body):
+                        output.append(
+                            replace(
+                                statement,
+                                expression=expression(condition, False),
+                                statements=statements(body),
+                                else_statements=(
+                                    None if else_body is None else statements(else_body)
+                                ),
+                            )
+                        )
+                    case Expression():
+                        output.append(expression(statement, True))
+                    case _:
+                        output.append(statement)
+            return output
+
+        return replace(
+            loop,
+            expression=expression(loop.expression, False),
+            statements=statements(loop.statements),
+        )
+
+
+def reduce_strength(statements: list[Statement]) -> list[Statement]:
+    """
+    Move the invariant declarations of the loops of a program out of them, and
+    replace the products of their induction variables by running sums.
+    """
+    reducer = _Reducer(statements)
+    statements = reducer.statements(statements)
+    optimization_report(
+        "induction variables",
+        f"moved {reducer.moved} declarations out of loops, "
+        f"replaced {reducer.reduced} products by running sums",
+    )
+    return statements
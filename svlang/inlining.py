@@ -0,0 +1,390 @@
+"""
+Inlining of small functions.
+
+Calls to small functions are replaced by a copy of their body, where arguments
+and local variables are renamed so they don't clash with the variables of the
+caller. This saves the copies of the arguments, the store of the return address
+and the two jumps of a call, and lets the other optimizations see through it.
+
+Calls are hoisted out of the statement they appear in, so the inlined body runs
+before the statement, in place of the call. Calls in loop conditions are left
+alone, as they are evaluated on every iteration.
+"""
+
+from dataclasses import dataclass, field, replace
+
+from .ast import *
+from .optimizer import ASM_WRITES, count_nodes, is_pure, optimization_report
+
+# The ASM instructions that depend on the position of the code in memory.
+_POSITION_DEPENDENT_OPS = (ASMOps.GoTo.opcode, ASMOps.Skip.opcode, ASMOps.Inst.opcode)
+
+
+def _written_variables(node: Any) -> set[str] | None:
+    """The variables written in a node, or None if it calls functions."""
+    written = set()
+    for child in walk(node):
+        match child:
+            case FunctionCall():
+                return None
+            case Declaration(_, identifier) | Assignment(_, identifier):
+                written.add(identifier)
+            case ASMInstruction(_, op, arg1, arg2, arg3):
+                arguments = (arg1, arg2, arg3)
+                for index in ASM_WRITES.get(op.opcode, ()):
+                    if isinstance(arguments[index], VariableReference):
+                        written.add(arguments[index].identifier)
+    return written
+
+
+def _read_variables(node: Any) -> set[str]:
+    return {
+        child.identifier for child in walk(node) if isinstance(child, VariableReference)
+    }
+
+
+def _asm_variables(node: Any) -> set[str]:
+    """The variables used as arguments of ASM instructions."""
+    return {
+        argument.identifier
+        for child in walk(node)
+        if isinstance(child, ASMInstruction)
+        for argument in (child.arg1, child.arg2, child.arg3)
+        if isinstance(argument, VariableReference)
+    }
+
+
+def _local_variables(declaration: FunctionDeclaration) -> set[str]:
+    return {argument.identifier for argument in declaration.arguments} | {
+        child.identifier for child in walk(declaration.statements) if isinstance(child, Declaration)
+    }
+
+
+def _substitute(node: Any, renames: dict[str, Expression], lineno: int) -> Any:
+    """Copy a node, renaming variables and moving it to the given line."""
+    match node:
+        case list():
+            return [_substitute(item, renames, lineno) for item in node]
+        case VariableReference(_, identifier) if identifier in renames:
+            return replace(renames[identifier], lineno=lineno)
+        case Declaration(_, identifier, _, value) | Assignment(
+            _, identifier, value
+        ) if identifier in renames:
+            renamed = renames[identifier]
+            assert isinstance(renamed, VariableReference)
+            return replace(
+                node,
+                lineno=lineno,
+                identifier=renamed.identifier,
+                value=_substitute(value, renames, lineno),
+            )
+        case Statement():
+            return replace(
+                node,
+                lineno=lineno,
+                **{
+                    node_field.name: _substitute(
+                        getattr(node, node_field.name), renames, lineno
+                    )
+                    for node_field in fields(node)
+                    if node_field.name != "lineno"
+                },
+            )
+    return node
+
+
+@dataclass
+class _Inlinable:
+    declaration: FunctionDeclaration
+    body: list[Statement]
+    """The statements of the function, without the final return."""
+    result: Expression | None
+    locals: set[str]
+    written: set[str] | None
+    asm_variables: set[str]
+
+
+@dataclass
+class _Site:
+    """What was already evaluated in the statement being inlined into."""
+
+    prefix: list[Statement] = field(default_factory=list)
+    """The statements to run before the statement, the inlined bodies."""
+    reads: set[str] = field(default_factory=set)
+    calls: bool = False
+
+
+class _Inliner:
+    def __init__(self, statements: list[Statement], budget: int):
+        self.budget = budget
+        self.inlinable: dict[str, _Inlinable] = {}
+        self.names: set[str] = set()
+        for node in walk(statements):
+            match node:
+                case VariableReference(_, identifier) | Declaration(
+                    _, identifier
+                ) | Assignment(_, identifier) | ArgumentDeclaration(identifier):
+                    self.names.add(identifier)
+        self.sites = 0
+        self.caller = ""
+        self.caller_locals: set[str] = set()
+
+    def fresh_name(self, function: str, identifier: str) -> str:
+        name = f"{function}_{self.sites}_{identifier}"
+        while name in self.names:
+            name = f"_{name}"
+        self.names.add(name)
+        return name
+
+    def add_inlinable(self, declaration: FunctionDeclaration) -> None:
+        """Make a function inlinable, if it is small and simple enough."""
+        statements = declaration.statements
+        result = None
+        if statements and isinstance(statements[-1], Return):
+            result = statements[-1].expression
+            statements = statements[:-1]
+        for node in walk(statements):
+            match node:
+                case Return() | FunctionDeclaration():
+                    return
+                case ASMInstruction(_, op) if op.opcode in _POSITION_DEPENDENT_OPS:
+                    return
+        if count_nodes(declaration.statements) > self.budget:
+            return
+        self.inlinable[declaration.identifier] = _Inlinable(
+            declaration,
+            statements,
+            result,
+            _local_variables(declaration),
+            _written_variables(declaration.statements),
+            _asm_variables(statements),
+        )
+
+    def statements(self, statements: list[Statement]) -> list[Statement]:
+        output = []
+        for statement in statements:
+            output.extend(self.statement(statement))
+        return output
+
+    def statement(self, statement: Statement) -> list[Statement]:
+        site = _Site()
+        match statement:
+            case FunctionCall() as call:
+                value = self.expression(call, site, discard=True)
+                return [*site.prefix, *([] if value is None else [value])]
+            case Expression():
+                return [*site.prefix, self.expression(statement, site)]
+            case Declaration(value=value) | Assignment(value=value):
+                value = self.expression(value, site)
+                return [*site.prefix, replace(statement, value=value)]
+            case Return(_, expression) if expression is not None:
+                expression = self.expression(expression, site)
+                return [*site.prefix, replace(statement, expression=expression)]
+            case If(_, expression, statements, else_statements):
+                expression = self.expression(expression, site)
+                return [
+                    *site.prefix,
+                    replace(
+                        statement,
+                        expression=expression,
+                        statements=self.statements(statements),
+                        else_statements=(
+                            None
+                            if else_statements is None
+                            else self.statements(else_statements)
+                        ),
+                    ),
+                ]
+            case While(_, _, statements):
+                return [replace(statement, statements=self.statements(statements))]
+            case FunctionDeclaration():
+                return [self.function(statement)]
+        return [statement]
+
+    def function(self, declaration: FunctionDeclaration) -> FunctionDeclaration:
+        caller, caller_locals = self.caller, self.caller_locals
+        self.caller = declaration.identifier
+        self.caller_locals = caller_locals | _local_variables(declaration)
+        statements = self.statements(declaration.statements)
+        self.caller, self.caller_locals = caller, caller_locals
+        return replace(declaration, statements=statements)
+
+    def expression(
+        self, expression: Expression, site: _Site, *, discard: bool = False
+    ) -> Expression | None:
+        """
+        Inline the calls of an expression, in evaluation order.
+
+        If `discard` is set and the expression is an inlined call, its result is
+        only computed for its side effects, and None is returned.
+        """
+        match expression:
+            case FunctionCall(lineno, identifier, arguments):
+                arguments = [self.expression(argument, site) for argument in arguments]
+                call = FunctionCall(lineno, identifier, arguments)
+                inlinable = self.inlinable.get(identifier)
+                if inlinable is not None and self.can_inline(inlinable, site):
+                    return self.inline(call, inlinable, site, discard)
+                site.calls = True
+                return call
+            case VariableReference(_, identifier):
+                site.reads.add(identifier)
+                return expression
+            case BinaryExpression() | BinaryNegation():
+                site.reads |= _read_variables(expression)
+                return expression
+            case NumericExpression(_, left, _, right) | NumericComparison(
+                _, left, _, right
+            ) | BooleanExpression(_, left, _, right):
+                left = self.expression(left, site)
+                right = self.expression(right, site)
+                return replace(expression, left=left, right=right)
+            case BooleanNegation(_, negated):
+                return replace(expression, expression=self.expression(negated, site))
+        return expression
+
+    def can_inline(self, inlinable: _Inlinable, site: _Site) -> bool:
+        if inlinable.declaration.identifier == self.caller:
+            return False
+        # The inlined body runs before what was already evaluated in the
+        # statement, it can't change it.
+        if site.calls:
+            return False
+        if inlinable.written is None:
+            if site.reads:
+                return False
+        elif site.reads & inlinable.written:
+            return False
+        # The variables of the body that aren't renamed must keep referring to
+        # the same globals.
+        free_variables = _read_variables(inlinable.declaration.statements) - inlinable.locals
+        return not free_variables & self.caller_locals
+
+    def inline(
+        self, call: FunctionCall, inlinable: _Inlinable, site: _Site, discard: bool
+    ) -> Expression | None:
+        self.sites += 1
+        declaration = inlinable.declaration
+        renames: dict[str, Expression] = {}
+        copies = 0
+        for argument, value in zip(declaration.arguments, call.arguments):
+            # Arguments that are never written can be used as they are.
+            if argument.identifier not in (inlinable.written or ()) and (
+                isinstance(value, VariableReference)
+                and inlinable.written is not None
+                and value.identifier not in inlinable.written
+                or isinstance(value, (NumericValue, BooleanValue, Color))
+                and argument.identifier not in inlinable.asm_variables
+            ):
+                renames[argument.identifier] = value
+                continue
+            name = self.fresh_name(declaration.identifier, argument.identifier)
+            site.prefix.append(Declaration(call.lineno, name, argument.type, value))
+            renames[argument.identifier] = VariableReference(call.lineno, name)
+            copies += 1
+        fresh_locals = set()
+        for identifier in inlinable.locals - renames.keys():
+            name = self.fresh_name(declaration.identifier, identifier)
+            renames[identifier] = VariableReference(call.lineno, name)
+            fresh_locals.add(name)
+        site.prefix.extend(_substitute(inlinable.body, renames, call.lineno))
+
+        result = None
+        if inlinable.result is not None:
+            result = _substitute(inlinable.result, renames, call.lineno)
+            if discard:
+                if not is_pure(result):
+                    site.prefix.append(result)
+                result = None
+            # Nothing but the inlined body writes to its local variables, they
+            # can be used as the result as they are.
+            elif not isinstance(result, (NumericValue, BooleanValue, Color)) and not (
+                isinstance(result, VariableReference)
+                and result.identifier in fresh_locals
+            ):
+                name = self.fresh_name(declaration.identifier, "result")
+                assert declaration.return_type is not None
+                site.prefix.append(
+                    Declaration(call.lineno, name, declaration.return_type, result)
+                )
+                result = VariableReference(call.lineno, name)
+                copies += 1
+
+        # A call copies its arguments, stores its return address, jumps to the
+        # function and back, and copies its return value.
+        call_cost = len(call.arguments) + 3 + (declaration.return_type is not None)
+        optimization_report(
+            "inlining",
+            f"inlined {declaration.identifier} into {self.caller or 'the main scope'}, saving about {call_cost - copies} instructions per call",
+            call.lineno,
+        )
+        return result
+
+
+def _call_order(functions: dict[str, FunctionDeclaration]) -> list[str]:
+    """The functions, callees first, without the recursive ones."""
+    calls = {
+        name: {
+            node.identifier
+            for node in walk(declaration.statements)
+            if isinstance(node, FunctionCall) and node.identifier in functions
+        }
+        for name, declaration in functions.items()
+    }
+    order: list[str] = []
+    visiting: set[str] = set()
+    recursive: set[str] = set()
+
+    def visit(name: str) -> None:
+        if name in order:
+            return
+        if name in visiting:
+            recursive.update(visiting)
+            return
+        visiting.add(name)
+        for callee in sorted(calls[name]):
+            visit(callee)
+        visiting.remove(name)
+        order.append(name)
+
+    for name in functions:
+        visit(name)
+    return [name for name in order if name not in recursive]
+
+
+def inline_functions(statements: list[Statement], budget: int) -> list[Statement]:
+    """
+    Inline the calls to the functions with at most `budget` nodes.
+
+    Only the functions of the main scope are inlined. Recursive functions,
+    functions that return early, and functions that use ASM instructions that
+    depend on the position of the code are left alone.
+    """
+    inliner = _Inliner(statements, budget)
+    functions = {
+        statement.identifier: statement
+        for statement in statements
+        if isinstance(statement, FunctionDeclaration)
+    }
+    nested_functions = {
+        node.identifier
+        for declaration in functions.values()
+        for node in walk(declaration.statements)
+        if isinstance(node, FunctionDeclaration)
+    }
+
+    inlined: dict[str, FunctionDeclaration] = {}
+    for name in _call_order(functions):
+        inlined[name] = inliner.function(functions[name])
+        if name not in nested_functions:
+            inliner.add_inlinable(inlined[name])
+
+    output: list[Statement] = []
+    for statement in statements:
+        match statement:
+            case FunctionDeclaration(_, identifier):
+                output.append(inlined.get(identifier) or inliner.function(statement))
+            case _:
+                output.extend(inliner.statement(statement))
+    optimization_report("inlining", f"inlined {inliner.sites} call sites")
+    return output
@@ -0,0 +1,149 @@
+"""
+Hash-consing of expressions.
+
+Generated programs repeat the same subexpressions thousands of times. An
+`ExpressionPool` replaces structurally identical expressions by a single shared
+node, turning the expression trees into a DAG, and caches the type of the
+shared nodes so that the type checker only checks them once.
+
+Line numbers aren't part of the structure: a shared node keeps the line of its
+first occurrence. While expressions are shared, the type checker reports the
+errors found in expressions at the line of their statement instead.
+"""
+
+from contextvars import ContextVar
+from dataclasses import replace
+
+from .ast import *
+
+NOT_CACHED = object()
+"""Returned by `ExpressionPool.cached_type` when the type isn't known."""
+
+
+_FIELD_NAMES: dict[type, tuple[str, ...]] = {}
+
+
+def _field_names(node_type: type) -> tuple[str, ...]:
+    names = _FIELD_NAMES.get(node_type)
+    if names is None:
+        names = _FIELD_NAMES[node_type] = tuple(
+            node_field.name for node_field in fields(node_type)
+        )
+    return names
+
+
+class ExpressionPool:
+    def __init__(self):
+        self._nodes: dict[tuple, Expression] = {}
+        self._dependencies: dict[int, tuple[tuple[str, ...], tuple[str, ...]]] = {}
+        """The variables and functions each shared node refers to, by node id."""
+        self._types: dict[int, tuple[tuple, ValueType | None]] = {}
+        """The type of each shared node, with the environment it was computed in."""
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def intern(self, expression: Expression) -> Expression:
+        """Return the shared node structurally identical to an expression."""
+        key: list[Any] = [type(expression)]
+        children: dict[str, Any] = {}
+        for name in _field_names(type(expression)):
+            if name == "lineno":
+                continue
+            value = getattr(expression, name)
+            if isinstance(value, Expression):
+                value = children[name] = self.intern(value)
+                key.append(id(value))
+            elif isinstance(value, list):
+                value = children[name] = [self.intern(item) for item in value]
+                key.append(tuple(map(id, value)))
+            else:
+                key.append(value)
+
+        node = self._nodes.get(tuple(key))
+        if node is None:
+            node = self._nodes[tuple(key)] = replace(expression, **children)
+            self._dependencies[id(node)] = self._collect_dependencies(node, children)
+        return node
+
+    def _collect_dependencies(
+        self, node: Expression, children: dict[str, Any]
+    ) -> tuple[tuple[str, ...], tuple[str, ...]]:
+        variables: set[str] = set()
+        functions: set[str] = set()
+        match node:
+            case VariableReference(_, identifier):
+                variables.add(identifier)
+            case FunctionCall(_, identifier):
+                functions.add(identifier)
+        for child in children.values():
+            for item in child if isinstance(child, list) else [child]:
+                child_variables, child_functions = self._dependencies[id(item)]
+                variables.update(child_variables)
+                functions.update(child_functions)
+        return tuple(sorted(variables)), tuple(sorted(functions))
+
+    def intern_statements(self, statements: list[Statement]) -> list[Statement]:
+        """Share the expressions of statements, recursively."""
+        return [self._intern_statement(statement) for statement in statements]
+
+    def intern_parsed_statement(self, statement: Statement) -> Statement:
+        """
+        Share the expressions of a statement whose nested statements are shared
+        already, as the parser builds them from the innermost.
+        """
+        return self._intern_statement(statement, recursive=False)
+
+    def _intern_statement(self, statement: Statement, *, recursive: bool = True) -> Statement:
+        # The statements themselves aren't shared, not even function calls, as
+        # their line numbers are used in the type check messages.
+        children: dict[str, Any] = {}
+        for name in _field_names(type(statement)):
+            value = getattr(statement, name)
+            if isinstance(value, Expression):
+                children[name] = self.intern(value)
+            elif isinstance(value, list) and isinstance(statement, Expression):
+                children[name] = [self.intern(item) for item in value]
+            elif isinstance(value, list) and recursive:
+                children[name] = [
+                    self._intern_statement(item) if isinstance(item, Statement) else item
+                    for item in value
+                ]
+        return replace(statement, **children)
+
+    def _environment(self, expression: Expression, symbols: Any) -> tuple | None:
+        dependencies = self._dependencies.get(id(expression))
+        if dependencies is None:
+            return None
+        variables, functions = dependencies
+        return (
+            *(symbols.variables.get(identifier) for identifier in variables),
+            *(symbols.functions.get(identifier) for identifier in functions),
+        )
+
+    def cached_type(self, expression: Expression, symbols: Any) -> Any:
+        """
+        Return the type of a shared node if it was computed with the same
+        variable and function types, `NOT_CACHED` otherwise.
+        """
+        cached = self._types.get(id(expression))
+        if cached is None:
+            return NOT_CACHED
+        environment, expression_type = cached
+        if environment != self._environment(expression, symbols):
+            return NOT_CACHED
+        return expression_type
+
+    def cache_type(
+        self, expression: Expression, symbols: Any, expression_type: ValueType | None
+    ) -> None:
+        """Remember the type of a shared node, if it is one."""
+        environment = self._environment(expression, symbols)
+        if environment is not None:
+            self._types[id(expression)] = (environment, expression_type)
+
+
+shared_expressions: ContextVar[ExpressionPool | None] = ContextVar(
+    "shared_expressions", default=None
+)
+"""The pool the expressions being type checked are shared in, if any."""
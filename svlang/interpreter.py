@@ -0,0 +1,593 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from .ast import *
+from .vm import MEMORY_SIZE, InputSource, ScriptedInput
+
+Frame = list[Any]
+"""The variables of the main scope or of a function call, in fixed slots."""
+
+Evaluator = Callable[[Frame], Any]
+Executor = Callable[[Frame], object | None]
+"""Runs a statement, returns a control flow signal if it breaks or returns."""
+
+_BREAK = object()
+_RETURN = object()
+
+_RETURN_SLOT = 0
+"""The slot holding the return value in the frames of functions."""
+
+
+class _Stop(Exception):
+    """Raised to stop the program after the requested number of frames."""
+
+
+@dataclass
+class _Function:
+    """A function, whose body is filled in once compiled."""
+
+    arguments: int
+    size: int = 0
+    body: Executor | None = None
+
+
+@dataclass
+class _Scope:
+    """Where variables and functions are found while compiling a scope."""
+
+    slots: dict[str, int]
+    """The slots of the variables of the scope."""
+    global_slots: dict[str, int] | None
+    """The slots of the global variables, if the scope is a function."""
+    functions: dict[str, _Function] = field(default_factory=dict)
+
+
+def _may_signal(statement: Statement) -> bool:
+    """Whether a statement may break out of a loop or return."""
+    match statement:
+        case Break() | Return():
+            return True
+        case While(_, _, statements):
+            return any(_may_signal(st) for st in statements)
+        case If(_, _, statements, else_statements):
+            return any(_may_signal(st) for st in [*statements, *(else_statements or [])])
+    return False
+
+
+class Interpreter:
+    """
+    Run SVLang programs without compiling them into SVC16 binaries.
+
+    The statements are turned once into nested closures, which run the program.
+    Variables are resolved to fixed slots in flat lists: one for the main scope,
+    and one per function call. UINT values wrap around on 16 bits, like on the
+    SVC16. The ASM instructions that don't depend on the memory layout of
+    compiled programs are supported, including Print and Sync.
+    """
+
+    def __init__(
+        self, statements: list[Statement], input_source: InputSource | None = None
+    ):
+        self.screen = [0] * MEMORY_SIZE
+        self.utility = [0] * MEMORY_SIZE
+        self.input_source: InputSource = input_source or ScriptedInput()
+        self.frames = 0
+        """The number of Sync instructions executed so far."""
+        self._max_frames: int | None = None
+
+        slots: dict[str, int] = {}
+        for statement in statements:
+            for identifier in statement.list_variable_declarations():
+                slots.setdefault(identifier, len(slots))
+        self._globals: Frame = [0] * len(slots)
+        # The functions of the main scope can be called before their declaration.
+        functions = {
+            statement.identifier: _Function(len(statement.arguments))
+            for statement in statements
+            if isinstance(statement, FunctionDeclaration)
+        }
+        self._main = self._compile_block(statements, _Scope(slots, None, functions))
+
+    def run(self, frames: int | None = None) -> None:
+        """Run the program until it ends, or until `frames` more Syncs."""
+        self._max_frames = None if frames is None else self.frames + frames
+        if frames == 0:
+            return
+        try:
+            self._main(self._globals)
+        except _Stop:
+            pass
+        except ZeroDivisionError:
+            raise RuntimeError("Division by zero") from None
+
+    # Variables
+
+    def _getter(self, identifier: str, scope: _Scope) -> Evaluator:
+        if identifier in scope.slots:
+            slot = scope.slots[identifier]
+            return lambda frame: frame[slot]
+        global_slot = self._global_slot(identifier, scope)
+        global_frame = self._globals
+        return lambda frame: global_frame[global_slot]
+
+    def _setter(self, identifier: str, scope: _Scope) -> Callable[[Frame, Any], None]:
+        if identifier in scope.slots:
+            slot = scope.slots[identifier]
+
+            def set_local(frame: Frame, value: Any) -> None:
+                frame[slot] = value
+
+            return set_local
+
+        global_slot = self._global_slot(identifier, scope)
+        global_frame = self._globals
+
+        def set_global(frame: Frame, value: Any) -> None:
+            global_frame[global_slot] = value
+
+        return set_global
+
+    def _global_slot(self, identifier: str, scope: _Scope) -> int:
+        if scope.global_slots is None or identifier not in scope.global_slots:
+            raise RuntimeError(f"Undefined reference to variable ${identifier}")
+        return scope.global_slots[identifier]
+
+    # Expressions
+
+    def _compile_expression(self, expression: Expression, scope: _Scope) -> Evaluator:
+        match expression:
+            case VariableReference(_, identifier):
+                return self._getter(identifier, scope)
+
+            case NumericValue(_, value) | Color(_, value):
+                constant = value & 0xFFFF
+                return lambda frame: constant
+
+            case BooleanValue(_, value):
+                return (lambda frame: True) if value else (lambda frame: False)
+
+            case NumericExpression(_, left, operator, right):
+                return self._compile_numeric(left, operator, right, scope)
+
+            case NumericComparison(_, left, comparator, right):
+                return self._compile_comparison(left, comparator, right, scope)
+
+            case BooleanExpression(_, left, operator, right):
+                # Both operands are evaluated. Compiled conditions only skip the
+                # right one when it calls no function, with the same result.
+                left_value = self._compile_expression(left, scope)
+                right_value = self._compile_expression(right, scope)
+                if operator == BooleanOperator.AND:
+                    return lambda frame: left_value(frame) & right_value(frame)
+                return lambda frame: left_value(frame) | right_value(frame)
+
+            case BooleanNegation(_, operand):
+                value = self._compile_expression(operand, scope)
+                return lambda frame: not value(frame)
+
+            case BinaryExpression(_, left, operator, right):
+                left_value = self._compile_expression(left, scope)
+                right_value = self._compile_expression(right, scope)
+                if operator == BinaryOP.AND:
+                    return lambda frame: left_value(frame) & right_value(frame)
+                return lambda frame: left_value(frame) ^ right_value(frame)
+
+            case BinaryNegation(_, operand):
+                value = self._compile_expression(operand, scope)
+                return lambda frame: value(frame) ^ 0xFFFF
+
+            case FunctionCall() as call:
+                return self._compile_call(call, scope)
+
+            case unhandled:
+                raise NotImplementedError(
+                    f"Interpretation of {type(unhandled)} {unhandled} is not yet implemented"
+                )
+
+    def _compile_numeric(
+        self,
+        left: Expression,
+        operator: NumericOperator,
+        right: Expression,
+        scope: _Scope,
+    ) -> Evaluator:
+        # Operations between a local variable and a constant are the most
+        # common ones, they get dedicated closures.
+        if (
+            isinstance(left, VariableReference)
+            and left.identifier in scope.slots
+            and isinstance(right, NumericValue)
+        ):
+            slot = scope.slots[left.identifier]
+            constant = right.value & 0xFFFF
+            match operator:
+                case NumericOperator.ADD:
+                    return lambda frame: (frame[slot] + constant) & 0xFFFF
+                case NumericOperator.SUB:
+                    return lambda frame: (frame[slot] - constant) & 0xFFFF
+                case NumericOperator.MUL:
+                    return lambda frame: (frame[slot] * constant) & 0xFFFF
+                case NumericOperator.DIV:
+                    return lambda frame: frame[slot] // constant
+
+        if (
+            isinstance(left, VariableReference)
+            and left.identifier in scope.slots
+            and isinstance(right, VariableReference)
+            and right.identifier in scope.slots
+        ):
+            left_slot = scope.slots[left.identifier]
+            right_slot = scope.slots[right.identifier]
+            match operator:
+                case NumericOperator.ADD:
+                    return lambda frame: (frame[left_slot] + frame[right_slot]) & 0xFFFF
+                case NumericOperator.SUB:
+                    return lambda frame: (frame[left_slot] - frame[right_slot]) & 0xFFFF
+                case NumericOperator.MUL:
+                    return lambda frame: (frame[left_slot] * frame[right_slot]) & 0xFFFF
+                case NumericOperator.DIV:
+                    return lambda frame: frame[left_slot] // frame[right_slot]
+
+        left_value = self._compile_expression(left, scope)
+        if isinstance(right, NumericValue):
+            constant = right.value & 0xFFFF
+            match operator:
+                case NumericOperator.ADD:
+                    return lambda frame: (left_value(frame) + constant) & 0xFFFF
+                case NumericOperator.SUB:
+                    return lambda frame: (left_value(frame) - constant) & 0xFFFF
+                case NumericOperator.MUL:
+                    return lambda frame: (left_value(frame) * constant) & 0xFFFF
+                case NumericOperator.DIV:
+                    return lambda frame: left_value(frame) // constant
+
+        right_value = self._compile_expression(right, scope)
+        match operator:
+            case NumericOperator.ADD:
+                return lambda frame: (left_value(frame) + right_value(frame)) & 0xFFFF
+            case NumericOperator.SUB:
+                return lambda frame: (left_value(frame) - right_value(frame)) & 0xFFFF
+            case NumericOperator.MUL:
+                return lambda frame: (left_value(frame) * right_value(frame)) & 0xFFFF
+            case NumericOperator.DIV:
+                return lambda frame: left_value(frame) // right_value(frame)
+
+    def _compile_comparison(
+        self,
+        left: Expression,
+        comparator: NumericComparator,
+        right: Expression,
+        scope: _Scope,
+    ) -> Evaluator:
+        if (
+            isinstance(left, VariableReference)
+            and left.identifier in scope.slots
+            and isinstance(right, NumericValue)
+        ):
+            slot = scope.slots[left.identifier]
+            constant = right.value & 0xFFFF
+            match comparator:
+                case NumericComparator.LT:
+                    return lambda frame: frame[slot] < constant
+                case NumericComparator.LEQ:
+                    return lambda frame: frame[slot] <= constant
+                case NumericComparator.EQ:
+                    return lambda frame: frame[slot] == constant
+                case NumericComparator.NEQ:
+                    return lambda frame: frame[slot] != constant
+                case NumericComparator.GEQ:
+                    return lambda frame: frame[slot] >= constant
+                case NumericComparator.GT:
+                    return lambda frame: frame[slot] > constant
+
+        left_value = self._compile_expression(left, scope)
+        right_value = self._compile_expression(right, scope)
+        match comparator:
+            case NumericComparator.LT:
+                return lambda frame: left_value(frame) < right_value(frame)
+            case NumericComparator.LEQ:
+                return lambda frame: left_value(frame) <= right_value(frame)
+            case NumericComparator.EQ:
+                return lambda frame: left_value(frame) == right_value(frame)
+            case NumericComparator.NEQ:
+                return lambda frame: left_value(frame) != right_value(frame)
+            case NumericComparator.GEQ:
+                return lambda frame: left_value(frame) >= right_value(frame)
+            case NumericComparator.GT:
+                return lambda frame: left_value(frame) > right_value(frame)
+
+    def _compile_call(self, call: FunctionCall, scope: _Scope) -> Evaluator:
+        if call.identifier not in scope.functions:
+            raise RuntimeError(f"Undefined reference to function {call.identifier}")
+        function = scope.functions[call.identifier]
+        if len(call.arguments) != function.arguments:
+            raise RuntimeError(
+                f"Function {call.identifier} was given {len(call.arguments)} arguments, but expected {function.arguments} arguments."
+            )
+        arguments = [self._compile_expression(arg, scope) for arg in call.arguments]
+
+        # Arguments are stored in the slots following the return value.
+        match arguments:
+            case []:
+
+                def call_function(frame: Frame) -> Any:
+                    callee_frame = [0] * function.size
+                    function.body(callee_frame)  # type: ignore
+                    return callee_frame[_RETURN_SLOT]
+
+            case [first]:
+
+                def call_function(frame: Frame) -> Any:
+                    callee_frame = [0] * function.size
+                    callee_frame[1] = first(frame)
+                    function.body(callee_frame)  # type: ignore
+                    return callee_frame[_RETURN_SLOT]
+
+            case [first, second]:
+
+                def call_function(frame: Frame) -> Any:
+                    callee_frame = [0] * function.size
+                    callee_frame[1] = first(frame)
+                    callee_frame[2] = second(frame)
+                    function.body(callee_frame)  # type: ignore
+                    return callee_frame[_RETURN_SLOT]
+
+            case [first, second, third]:
+
+                def call_function(frame: Frame) -> Any:
+                    callee_frame = [0] * function.size
+                    callee_frame[1] = first(frame)
+                    callee_frame[2] = second(frame)
+                    callee_frame[3] = third(frame)
+                    function.body(callee_frame)  # type: ignore
+                    return callee_frame[_RETURN_SLOT]
+
+            case _:
+
+                def call_function(frame: Frame) -> Any:
+                    callee_frame = [0] * function.size
+                    for slot, argument in enumerate(arguments, 1):
+                        callee_frame[slot] = argument(frame)
+                    function.body(callee_frame)  # type: ignore
+                    return callee_frame[_RETURN_SLOT]
+
+        return call_function
+
+    # Statements
+
+    def _compile_block(self, statements: list[Statement], scope: _Scope) -> Executor:
+        executors = [
+            executor
+            for statement in statements
+            if (executor := self._compile_statement(statement, scope)) is not None
+        ]
+        match executors:
+            case []:
+                return lambda frame: None
+            case [executor]:
+                return executor
+
+        if not any(_may_signal(statement) for statement in statements):
+
+            def run_plain_block(frame: Frame) -> None:
+                for executor in executors:
+                    executor(frame)
+
+            return run_plain_block
+
+        def run_block(frame: Frame) -> object | None:
+            for executor in executors:
+                signal = executor(frame)
+                if signal is not None:
+                    return signal
+            return None
+
+        return run_block
+
+    def _compile_statement(
+        self, statement: Statement, scope: _Scope
+    ) -> Executor | None:
+        match statement:
+            case Declaration(_, identifier, _, value) | Assignment(
+                _, identifier, value
+            ):
+                evaluate = self._compile_expression(value, scope)
+                if identifier in scope.slots:
+                    slot = scope.slots[identifier]
+
+                    def assign_local(frame: Frame) -> None:
+                        frame[slot] = evaluate(frame)
+
+                    return assign_local
+
+                global_slot = self._global_slot(identifier, scope)
+                global_frame = self._globals
+
+                def assign_global(frame: Frame) -> None:
+                    global_frame[global_slot] = evaluate(frame)
+
+                return assign_global
+
+            case Expression() as expression:
+                evaluate = self._compile_expression(expression, scope)
+
+                def discard(frame: Frame) -> None:
+                    evaluate(frame)
+
+                return discard
+
+            case While(_, expression, statements):
+                condition = self._compile_expression(expression, scope)
+                body = self._compile_block(statements, scope)
+
+                def run_while(frame: Frame) -> object | None:
+                    while condition(frame):
+                        signal = body(frame)
+                        if signal is not None:
+                            if signal is _BREAK:
+                                break
+                            return signal
+                    return None
+
+                return run_while
+
+            case If(_, expression, statements, else_statements):
+                condition = self._compile_expression(expression, scope)
+                body = self._compile_block(statements, scope)
+                if not else_statements:
+                    return lambda frame: body(frame) if condition(frame) else None
+                else_body = self._compile_block(else_statements, scope)
+                return lambda frame: body(frame) if condition(frame) else else_body(frame)
+
+            case Break():
+                return lambda frame: _BREAK
+
+            case Return(_, None):
+                return lambda frame: _RETURN
+
+            case Return(_, expression):
+                assert expression is not None
+                evaluate = self._compile_expression(expression, scope)
+
+                def run_return(frame: Frame) -> object:
+                    frame[_RETURN_SLOT] = evaluate(frame)
+                    return _RETURN
+
+                return run_return
+
+            case FunctionDeclaration() as declaration:
+                self._compile_function(declaration, scope)
+                return None
+
+            case ASMInstruction() as instruction:
+                return self._compile_asm(instruction, scope)
+
+            case unhandled:
+                raise NotImplementedError(
+                    f"Interpretation of {type(unhandled)} {unhandled} is not yet implemented"
+                )
+
+    def _compile_function(self, declaration: FunctionDeclaration, scope: _Scope) -> None:
+        function = _Function(len(declaration.arguments))
+        if scope.global_slots is None and declaration.identifier in scope.functions:
+            # Declared beforehand, see `__init__`.
+            function = scope.functions[declaration.identifier]
+        scope.functions = {**scope.functions, declaration.identifier: function}
+
+        slots = {"": _RETURN_SLOT}
+        for argument in declaration.arguments:
+            slots[argument.identifier] = len(slots)
+        for statement in declaration.statements:
+            for identifier in statement.list_variable_declarations():
+                slots.setdefault(identifier, len(slots))
+        del slots[""]
+        global_slots = scope.global_slots if scope.global_slots is not None else scope.slots
+        function_scope = _Scope(slots, global_slots, scope.functions)
+
+        function.size = len(slots) + 1
+        function.body = self._compile_block(declaration.statements, function_scope)
+
+    def _compile_asm(self, instruction: ASMInstruction, scope: _Scope) -> Executor:
+        def operand(argument: VariableReference | NumericValue) -> Evaluator:
+            return self._compile_expression(argument, scope)
+
+        def target(argument: VariableReference | NumericValue) -> Callable[[Frame, Any], None]:
+            if not isinstance(argument, VariableReference):
+                raise RuntimeError(f"ASM {instruction.op} can't write to {argument}")
+            return self._setter(argument.identifier, scope)
+
+        op, arg1, arg2, arg3 = instruction.op, instruction.arg1, instruction.arg2, instruction.arg3
+        operations: dict[int, Callable[[int, int], int]] = {
+            ASMOps.Add.opcode: lambda a, b: (a + b) & 0xFFFF,
+            ASMOps.Sub.opcode: lambda a, b: (a - b) & 0xFFFF,
+            ASMOps.Mul.opcode: lambda a, b: (a * b) & 0xFFFF,
+            ASMOps.Div.opcode: lambda a, b: a // b,
+            ASMOps.Cmp.opcode: lambda a, b: int(a < b),
+            ASMOps.Band.opcode: lambda a, b: a & b,
+            ASMOps.Xor.opcode: lambda a, b: a ^ b,
+        }
+
+        if op.opcode in operations:
+            operation = operations[op.opcode]
+            left, right, write = operand(arg1), operand(arg2), target(arg3)
+            return lambda frame: write(frame, operation(left(frame), right(frame)))
+
+        match op:
+            case ASMOps.Set:
+                write, value = target(arg1), arg2.value & 0xFFFF  # type: ignore
+                return lambda frame: write(frame, value)
+
+            case ASMOps.Print | ASMOps.Read:
+                assert isinstance(arg3, NumericValue)
+                if arg3.value > 1:
+                    raise RuntimeError(f"Invalid buffer {arg3.value}")
+                buffer = self.screen if arg3.value == 0 else self.utility
+                if op == ASMOps.Print:
+                    value, index = operand(arg1), operand(arg2)
+
+                    def print_value(frame: Frame) -> None:
+                        buffer[index(frame)] = value(frame)
+
+                    return print_value
+                index, write = operand(arg1), target(arg2)
+                return lambda frame: write(frame, buffer[index(frame)])
+
+            case ASMOps.Sync:
+                write_position, write_keys = target(arg1), target(arg2)
+
+                def sync(frame: Frame) -> None:
+                    position, keys = self.input_source()
+                    write_position(frame, position)
+                    write_keys(frame, keys)
+                    self.frames += 1
+                    if self._max_frames is not None and self.frames >= self._max_frames:
+                        raise _Stop()
+
+                return sync
+
+        raise NotImplementedError(
+            f"ASM {op} depends on the memory layout of compiled programs, and can't be interpreted"
+        )
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+    import hashlib
+    import struct
+    import time
+
+    from .grammar import parse
+    from .prelude import with_prelude
+
+    parser = ArgumentParser(
+        description="Run SVLang programs directly.",
+        formatter_class=ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("source")
+    parser.add_argument(
+        "--frames",
+        type=int,
+        help="The number of frames to run (until the program ends by default)",
+    )
+    parser.add_argument(
+        "--input",
+        help="An input script, with one 'x y keys' line per frame (no input by default)",
+    )
+    args = parser.parse_args()
+
+    with open(args.source, "r") as source_file:
+        statements = with_prelude(parse(source_file.read()))
+    input_source = None
+    if args.input is not None:
+        with open(args.input, "r") as input_file:
+            input_source = ScriptedInput.parse(input_file.read())
+
+    interpreter = Interpreter(statements, input_source)
+    start = time.perf_counter()
+    interpreter.run(args.frames)
+    elapsed = time.perf_counter() - start
+
+    print(f"frames: {interpreter.frames}")
+    print(f"time:   {elapsed:.3f} s")
+    screen = struct.pack(f"<{MEMORY_SIZE}H", *interpreter.screen)
+    print(f"screen: {hashlib.sha256(screen).hexdigest()}")
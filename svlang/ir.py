@@ -0,0 +1,859 @@
+"""
+A flat, typed intermediate representation between the AST and SVC16 code.
+
+The main scope and each function are lowered into basic blocks of
+three-address instructions: an instruction computes at most one value, from
+constants, variables and numbered temporaries. A block ends with a terminator
+naming its successors. Every operand carries its type, resolved while lowering,
+so the passes working on the IR and the code generation never compute the type
+of expressions again.
+
+Functions aren't reentrant, their variables live at fixed addresses: each
+variable is named by the symbol of its address, see `CompiledUnit`.
+"""
+
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Iterator
+
+from .ast import *
+
+MAIN_UNIT = "<main>"
+
+
+class Operation(Enum):
+    """The operations of the SVC16 arithmetic instructions."""
+
+    ADD = "+"
+    SUB = "-"
+    MUL = "*"
+    DIV = "/"
+    AND = "&"
+    XOR = "^"
+    LT = "<"
+
+    def __str__(self):
+        return self.value
+
+
+@dataclass(frozen=True, slots=True)
+class Constant:
+    value: int
+    type: ValueType
+
+    def __str__(self):
+        match self.type:
+            case ValueType.BOOL:
+                return str(bool(self.value))
+            case ValueType.COLOR:
+                return f"#{self.value:04x}"
+        return str(self.value)
+
+
+@dataclass(frozen=True, slots=True)
+class Variable:
+    """A variable or an argument, stored at the address of a symbol."""
+
+    symbol: str
+    type: ValueType
+    identifier: str = field(compare=False)
+
+    def __str__(self):
+        return f"${self.identifier}"
+
+
+@dataclass(frozen=True, slots=True)
+class Temporary:
+    number: int
+    type: ValueType
+
+    def __str__(self):
+        return f"t{self.number}"
+
+
+Operand = Constant | Variable | Temporary
+Destination = Variable | Temporary
+
+
+def _define(destination: Destination) -> str:
+    if isinstance(destination, Temporary):
+        return f"{destination}: {destination.type}"
+    return str(destination)
+
+
+@dataclass(slots=True)
+class Copy:
+    destination: Destination
+    source: Operand
+
+    def __str__(self):
+        return f"{_define(self.destination)} = {self.source}"
+
+    def uses(self) -> list[Operand]:
+        return [self.source]
+
+
+@dataclass(slots=True)
+class BinaryOperation:
+    destination: Destination
+    operation: Operation
+    left: Operand
+    right: Operand
+
+    def __str__(self):
+        return f"{_define(self.destination)} = {self.left} {self.operation} {self.right}"
+
+    def uses(self) -> list[Operand]:
+        return [self.left, self.right]
+
+
+@dataclass(slots=True)
+class Call:
+    destination: Destination | None
+    function: str
+    """The name of the unit of the function."""
+    arguments: list[Operand]
+
+    def __str__(self):
+        call = f"call {self.function}({', '.join(map(str, self.arguments))})"
+        if self.destination is None:
+            return call
+        return f"{_define(self.destination)} = {call}"
+
+    def uses(self) -> list[Operand]:
+        return list(self.arguments)
+
+
+@dataclass(slots=True)
+class Asm:
+    """An ASM instruction, whose arguments are variables or raw words."""
+
+    op: ASMOp
+    arguments: list[Variable | int]
+
+    def __str__(self):
+        return f"ASM {self.op} {' '.join(map(str, self.arguments))}"
+
+    def uses(self) -> list[Operand]:
+        return [argument for argument in self.arguments if isinstance(argument, Variable)]
+
+
+Instruction = Copy | BinaryOperation | Call | Asm
+
+
+@dataclass(slots=True)
+class Jump:
+    target: int
+
+    def __str__(self):
+        return f"jump L{self.target}"
+
+    def uses(self) -> list[Operand]:
+        return []
+
+    def successors(self) -> tuple[int, ...]:
+        return (self.target,)
+
+
+@dataclass(slots=True)
+class Branch:
+    """Go to `if_true` if the condition isn't zero, to `if_false` otherwise."""
+
+    condition: Operand
+    if_true: int
+    if_false: int
+
+    def __str__(self):
+        return f"branch {self.condition} L{self.if_true} L{self.if_false}"
+
+    def uses(self) -> list[Operand]:
+        return [self.condition]
+
+    def successors(self) -> tuple[int, ...]:
+        return (self.if_true, self.if_false)
+
+
+@dataclass(slots=True)
+class Exit:
+    """Return from the function, or end the program in the main scope."""
+
+    value: Operand | None = None
+
+    def __str__(self):
+        return "exit" if self.value is None else f"exit {self.value}"
+
+    def uses(self) -> list[Operand]:
+        return [] if self.value is None else [self.value]
+
+    def successors(self) -> tuple[int, ...]:
+        return ()
+
+
+Terminator = Jump | Branch | Exit
+
+
+@dataclass(slots=True)
+class BasicBlock:
+    label: int
+    instructions: list[Instruction] = field(default_factory=list)
+    terminator: Terminator = field(default_factory=Exit)
+
+    def __str__(self):
+        lines = [f"L{self.label}:"]
+        lines += [f"    {instruction}" for instruction in self.instructions]
+        lines.append(f"    {self.terminator}")
+        return "\n".join(lines)
+
+
+@dataclass(slots=True)
+class Function:
+    """
+    The IR of a function, or of the main scope.
+
+    The blocks are listed in the order their code is laid out in, starting
+    with the entry block.
+    """
+
+    name: str
+    arguments: list[Variable]
+    variables: list[Variable]
+    """The variables stored in the unit of the function, arguments included."""
+    return_type: ValueType | None
+    blocks: list[BasicBlock] = field(default_factory=list)
+    temporaries: int = 0
+    """The number of temporaries, numbered from 0."""
+
+    def __str__(self):
+        arguments = ", ".join(f"{argument}: {argument.type}" for argument in self.arguments)
+        header = f"def {self.name}({arguments})"
+        if self.return_type is not None:
+            header += f" -> {self.return_type}"
+        return "\n".join([header, *map(str, self.blocks)])
+
+    def temporary(self, value_type: ValueType) -> Temporary:
+        temporary = Temporary(self.temporaries, value_type)
+        self.temporaries += 1
+        return temporary
+
+    def instructions(self) -> Iterator[Instruction]:
+        for block in self.blocks:
+            yield from block.instructions
+
+
+def dump(functions: list[Function]) -> str:
+    """The textual form of the IR of a program."""
+    return "\n\n".join(map(str, functions)) + "\n"
+
+
+def thread_jumps(function: Function) -> None:
+    """
+    Make the jumps and branches to empty blocks ending with a jump, like those
+    left by `break` statements, go straight to their final target.
+    """
+    blocks = {block.label: block for block in function.blocks}
+
+    def target(label: int) -> int:
+        seen = set()
+        while label not in seen:
+            seen.add(label)
+            block = blocks[label]
+            if block.instructions or not isinstance(block.terminator, Jump):
+                break
+            label = block.terminator.target
+        return label
+
+    for block in function.blocks:
+        match block.terminator:
+            case Jump(label):
+                block.terminator = Jump(target(label))
+            case Branch(condition, if_true, if_false):
+                if_true, if_false = target(if_true), target(if_false)
+                if if_true == if_false:
+                    block.terminator = Jump(if_true)
+                else:
+                    block.terminator = Branch(condition, if_true, if_false)
+
+
+def remove_unreachable_blocks(function: Function) -> None:
+    """Remove the blocks that can't be reached from the entry block."""
+    blocks = {block.label: block for block in function.blocks}
+    reachable = set()
+    pending = [function.blocks[0].label]
+    while pending:
+        label = pending.pop()
+        if label not in reachable:
+            reachable.add(label)
+            pending.extend(blocks[label].terminator.successors())
+    function.blocks = [block for block in function.blocks if block.label in reachable]
+
+
+@dataclass
+class Environment:
+    """The global variables and the functions of the main scope, seen by every function."""
+
+    variables: dict[str, ValueType]
+    functions: dict[str, ValueType | None]
+
+    @classmethod
+    def of_program(cls, statements: list[Statement]) -> "Environment":
+        return cls(
+            {
+                declaration.identifier: declaration.type
+                for declaration in _declarations(statements)
+            },
+            {
+                statement.identifier: statement.return_type
+                for statement in statements
+                if isinstance(statement, FunctionDeclaration)
+            },
+        )
+
+
+def _declarations(statements: list[Statement]) -> Iterator[Declaration]:
+    """The variables declared in a scope, outside of the functions declared in it."""
+    for statement in statements:
+        match statement:
+            case Declaration():
+                yield statement
+            case While(_, _, body):
+                yield from _declarations(body)
+            case If(_, _, body, else_body):
+                yield from _declarations(body)
+                yield from _declarations(else_body or [])
+
+
+def _contains_call(expression: Expression) -> bool:
+    return any(isinstance(node, FunctionCall) for node in walk(expression))
+
+
+def _jumps_on_zero(expression: Expression, value: bool) -> bool:
+    """
+    Whether the condition of a branch can be lowered so that it jumps, only on
+    zero, when it's `value`, and falls through otherwise. The SVC16 only jumps
+    on zero, other conditions cost an extra jump.
+    """
+    match expression:
+        case BooleanValue():
+            return True
+        case BooleanNegation(_, operand):
+            return _jumps_on_zero(operand, not value)
+        case BooleanExpression(_, left, operator, right) if not _contains_call(right):
+            # The left operand jumps past the right one, on zero.
+            return _jumps_on_zero(
+                left, operator == BooleanOperator.OR
+            ) and _jumps_on_zero(right, value)
+        case NumericComparison(_, left, comparator, right):
+            if comparator in (NumericComparator.EQ, NumericComparator.NEQ):
+                return (comparator == NumericComparator.EQ) == value
+            if (comparator in (NumericComparator.GEQ, NumericComparator.LEQ)) == value:
+                return True
+            # See `_Lowering._branch_comparison`.
+            lower, upper = left, right
+            if comparator in (NumericComparator.GT, NumericComparator.LEQ):
+                lower, upper = right, left
+            return (isinstance(upper, NumericValue) and upper.value & 0xFFFF > 0) or (
+                isinstance(lower, NumericValue) and lower.value & 0xFFFF < 0xFFFF
+            )
+    return not value
+
+
+@dataclass
+class _Scope:
+    """The variables and functions visible from a function, besides the globals."""
+
+    variables: dict[str, Variable] = field(default_factory=dict)
+    functions: dict[str, tuple[str, ValueType | None]] = field(default_factory=dict)
+
+    def clone(self) -> "_Scope":
+        return _Scope(self.variables.copy(), self.functions.copy())
+
+
+_NUMERIC_OPERATIONS = {
+    NumericOperator.ADD: Operation.ADD,
+    NumericOperator.SUB: Operation.SUB,
+    NumericOperator.MUL: Operation.MUL,
+    NumericOperator.DIV: Operation.DIV,
+}
+
+_BINARY_OPERATIONS = {
+    BinaryOP.AND: Operation.AND,
+    BinaryOP.XOR: Operation.XOR,
+}
+
+
+class _Lowering:
+    """The state of the lowering of a function."""
+
+    def __init__(
+        self,
+        function: Function,
+        scope: _Scope,
+        environment: Environment,
+        rotate_loops: bool,
+    ):
+        self.function = function
+        self.scope = scope
+        self.environment = environment
+        self.rotate_loops = rotate_loops
+        """Test the conditions of loops at the bottom, see `statement`."""
+        self.nested: list[Function] = []
+        """The functions declared inside this one."""
+        self.loop_exits: list[int] = []
+        """The label of the block following each enclosing loop."""
+        self._labels = 0
+        self.block = self._new_block()
+        function.blocks.append(self.block)
+
+    # Blocks
+
+    def _new_block(self) -> BasicBlock:
+        block = BasicBlock(self._labels)
+        self._labels += 1
+        return block
+
+    def _close(self, terminator: Terminator) -> None:
+        self.block.terminator = terminator
+
+    def _enter(self, block: BasicBlock) -> None:
+        """Lay out a block after the current one, and continue lowering in it."""
+        self.function.blocks.append(block)
+        self.block = block
+
+    def _emit(self, instruction: Instruction) -> None:
+        self.block.instructions.append(instruction)
+
+    # Names
+
+    def _variable(self, identifier: str) -> Variable:
+        variable = self.scope.variables.get(identifier)
+        if variable is None:
+            variable_type = self.environment.variables[identifier]
+            variable = Variable(f"${identifier}", variable_type, identifier)
+        return variable
+
+    def _callee(self, identifier: str) -> tuple[str, ValueType | None]:
+        callee = self.scope.functions.get(identifier)
+        if callee is None:
+            callee = (identifier, self.environment.functions[identifier])
+        return callee
+
+    # Expressions
+
+    def _move(self, source: Operand, destination: Destination | None) -> Operand:
+        if destination is None or destination == source:
+            return source
+        self._emit(Copy(destination, source))
+        return destination
+
+    def _operation(
+        self,
+        operation: Operation,
+        left: Operand,
+        right: Operand,
+        destination: Destination | None,
+        value_type: ValueType,
+    ) -> Destination:
+        if destination is None:
+            destination = self.function.temporary(value_type)
+        self._emit(BinaryOperation(destination, operation, left, right))
+        return destination
+
+    def _operands(self, left: Expression, right: Expression) -> tuple[Operand, Operand]:
+        """
+        Lower the operands of a binary operation, in order.
+
+        If the right operand calls a function, which may modify the variable the
+        left operand reads, the variable is copied to a temporary first.
+        """
+        left_operand = self.expression(left)
+        if isinstance(left_operand, Variable) and _contains_call(right):
+            left_operand = self._move(
+                left_operand, self.function.temporary(left_operand.type)
+            )
+        return left_operand, self.expression(right)
+
+    def call(
+        self,
+        call: FunctionCall,
+        destination: Destination | None,
+        *,
+        discard: bool = False,
+    ) -> Operand | None:
+        """Lower a function call, return the operand holding its return value."""
+        name, return_type = self._callee(call.identifier)
+        arguments: list[Operand] = []
+        for index, argument in enumerate(call.arguments):
+            operand = self.expression(argument)
+            # A later argument may call a function modifying the variable.
+            if isinstance(operand, Variable) and any(
+                _contains_call(later) for later in call.arguments[index + 1 :]
+            ):
+                operand = self._move(operand, self.function.temporary(operand.type))
+            arguments.append(operand)
+        if discard:
+            self._emit(Call(None, name, arguments))
+            return None
+        if destination is None:
+            destination = self.function.temporary(return_type or ValueType.UINT)
+        self._emit(Call(destination, name, arguments))
+        return destination
+
+    def expression(
+        self, expression: Expression, destination: Destination | None = None
+    ) -> Operand:
+        """
+        Lower an expression, return the operand holding its value.
+
+        The value is written to `destination` if set.
+        """
+        match expression:
+            case VariableReference(_, identifier):
+                return self._move(self._variable(identifier), destination)
+
+            case NumericValue(_, value):
+                return self._move(Constant(value & 0xFFFF, ValueType.UINT), destination)
+
+            case Color(_, value):
+                return self._move(Constant(value & 0xFFFF, ValueType.COLOR), destination)
+
+            case BooleanValue(_, value):
+                return self._move(Constant(int(value), ValueType.BOOL), destination)
+
+            case NumericExpression(_, left, operator, right):
+                left_operand, right_operand = self._operands(left, right)
+                return self._operation(
+                    _NUMERIC_OPERATIONS[operator],
+                    left_operand,
+                    right_operand,
+                    destination,
+                    ValueType.UINT,
+                )
+
+            case BinaryExpression(_, left, operator, right):
+                left_operand, right_operand = self._operands(left, right)
+                return self._operation(
+                    _BINARY_OPERATIONS[operator],
+                    left_operand,
+                    right_operand,
+                    destination,
+                    left_operand.type,
+                )
+
+            case BinaryNegation(_, operand):
+                value = self.expression(operand)
+                mask = Constant(0xFFFF, value.type)
+                return self._operation(Operation.XOR, value, mask, destination, value.type)
+
+            case NumericComparison(_, left, comparator, right):
+                left_operand, right_operand = self._operands(left, right)
+                return self._comparison(
+                    left_operand, comparator, right_operand, destination
+                )
+
+            case BooleanExpression(_, left, operator, right):
+                left_operand, right_operand = self._operands(left, right)
+                BOOL, UINT = ValueType.BOOL, ValueType.UINT
+                match operator:
+                    case BooleanOperator.AND:
+                        return self._operation(
+                            Operation.AND, left_operand, right_operand, destination, BOOL
+                        )
+                    case BooleanOperator.OR:
+                        total = self._operation(
+                            Operation.ADD, left_operand, right_operand, None, UINT
+                        )
+                        return self._operation(
+                            Operation.LT, Constant(0, UINT), total, destination, BOOL
+                        )
+
+            case BooleanNegation(_, operand):
+                value = self.expression(operand)
+                true = Constant(1, ValueType.BOOL)
+                return self._operation(
+                    Operation.XOR, value, true, destination, ValueType.BOOL
+                )
+
+            case FunctionCall() as call:
+                result = self.call(call, destination)
+                assert result is not None
+                return result
+
+        raise NotImplementedError(
+            f"Lowering of {type(expression)} {expression} is not yet implemented"
+        )
+
+    def _comparison(
+        self,
+        left: Operand,
+        comparator: NumericComparator,
+        right: Operand,
+        destination: Destination | None,
+    ) -> Destination:
+        """Lower a comparison into `<` comparisons, as the SVC16 only has this one."""
+        BOOL, UINT = ValueType.BOOL, ValueType.UINT
+        match comparator:
+            case NumericComparator.LT:
+                return self._operation(Operation.LT, left, right, destination, BOOL)
+            case NumericComparator.GT:
+                return self._operation(Operation.LT, right, left, destination, BOOL)
+            case NumericComparator.LEQ:
+                greater = self._operation(Operation.LT, right, left, None, BOOL)
+                true = Constant(1, BOOL)
+                return self._operation(Operation.XOR, greater, true, destination, BOOL)
+            case NumericComparator.GEQ:
+                lower = self._operation(Operation.LT, left, right, None, BOOL)
+                true = Constant(1, BOOL)
+                return self._operation(Operation.XOR, lower, true, destination, BOOL)
+            case NumericComparator.EQ:
+                difference = self._operation(Operation.SUB, left, right, None, UINT)
+                one = Constant(1, UINT)
+                return self._operation(Operation.LT, difference, one, destination, BOOL)
+            case NumericComparator.NEQ:
+                difference = self._operation(Operation.SUB, left, right, None, UINT)
+                zero = Constant(0, UINT)
+                return self._operation(Operation.LT, zero, difference, destination, BOOL)
+
+    # Conditions
+
+    def condition(
+        self,
+        expression: Expression,
+        if_true: BasicBlock,
+        if_false: BasicBlock,
+        following: BasicBlock,
+    ) -> None:
+        """
+        Lower the condition of a branch straight into jumps, closing the block.
+        `following` is the block laid out right after it.
+
+        Comparisons branch on the result of a single instruction, negations swap
+        the targets, and the right operand of `and` and `or` is only evaluated
+        when needed, unless it calls a function.
+        """
+        match expression:
+            case BooleanValue(_, value):
+                self._close(Jump(if_true.label if value else if_false.label))
+
+            case BooleanNegation(_, operand):
+                self.condition(operand, if_false, if_true, following)
+
+            case BooleanExpression(_, left, operator, right) if not _contains_call(right):
+                rest = self._new_block()
+                if operator == BooleanOperator.AND:
+                    self.condition(left, rest, if_false, rest)
+                else:
+                    self.condition(left, if_true, rest, rest)
+                self._enter(rest)
+                self.condition(right, if_true, if_false, following)
+
+            case NumericComparison(_, left, comparator, right):
+                left_operand, right_operand = self._operands(left, right)
+                value, negated = self._branch_comparison(
+                    left_operand, comparator, right_operand, following is if_false
+                )
+                if negated:
+                    if_true, if_false = if_false, if_true
+                self._close(Branch(value, if_true.label, if_false.label))
+
+            case _:
+                value = self.expression(expression)
+                self._close(Branch(value, if_true.label, if_false.label))
+
+    def _branch_comparison(
+        self,
+        left: Operand,
+        comparator: NumericComparator,
+        right: Operand,
+        negate: bool,
+    ) -> tuple[Destination, bool]:
+        """
+        Lower a comparison into a single instruction, return its result and
+        whether it's zero when the comparison holds.
+
+        The SVC16 only jumps on zero, so a branch falling through to its false
+        target costs an extra jump unless its condition is `negate`d. A `<`
+        against a constant can be negated for free, as `$x < 256` is the same
+        as `not 255 < $x`.
+        """
+        BOOL, UINT = ValueType.BOOL, ValueType.UINT
+        match comparator:
+            case NumericComparator.EQ | NumericComparator.NEQ:
+                # The operands differ if their difference isn't zero.
+                value = self._operation(Operation.SUB, left, right, None, UINT)
+                return value, comparator == NumericComparator.EQ
+            case NumericComparator.LT | NumericComparator.GEQ:
+                lower, upper = left, right
+            case NumericComparator.GT | NumericComparator.LEQ:
+                lower, upper = right, left
+        negated = comparator in (NumericComparator.GEQ, NumericComparator.LEQ)
+        # `lower < upper` is the same as `not upper - 1 < lower`, or `not upper < lower + 1`.
+        if negated != negate:
+            if isinstance(upper, Constant) and upper.value > 0:
+                lower, upper = Constant(upper.value - 1, upper.type), lower
+                negated = not negated
+            elif isinstance(lower, Constant) and lower.value < 0xFFFF:
+                lower, upper = upper, Constant(lower.value + 1, lower.type)
+                negated = not negated
+        return self._operation(Operation.LT, lower, upper, None, BOOL), negated
+
+    # Statements
+
+    def statement(self, statement: Statement) -> None:
+        match statement:
+            case ASMInstruction(_, op, arg1, arg2, arg3):
+                arguments: list[Variable | int] = []
+                for argument in (arg1, arg2, arg3):
+                    match argument:
+                        case VariableReference(_, identifier):
+                            arguments.append(self._variable(identifier))
+                        case NumericValue(_, value):
+                            arguments.append(value)
+                self._emit(Asm(op, arguments))
+
+            case Declaration(_, identifier, _, value) | Assignment(_, identifier, value):
+                self.expression(value, self._variable(identifier))
+
+            case FunctionCall() as call:
+                self.call(call, None, discard=True)
+
+            case Expression() as expression:
+                self.expression(expression)
+
+            case While(_, expression, statements):
+                header = self._new_block()
+                body = self._new_block()
+                end = self._new_block()
+                self._close(Jump(header.label))
+                self._enter(header)
+                endless = isinstance(expression, BooleanValue) and expression.value
+                if endless:
+                    self._close(Jump(body.label))
+                else:
+                    self.condition(expression, body, end, body)
+                self._enter(body)
+                self.loop_exits.append(end.label)
+                for st in statements:
+                    self.statement(st)
+                self.loop_exits.pop()
+                if (
+                    self.rotate_loops
+                    and not endless
+                    and _jumps_on_zero(expression, True)
+                ):
+                    # Test the condition again at the bottom, rather than
+                    # jumping back to the test at the top on every iteration.
+                    self.condition(expression, body, end, end)
+                else:
+                    self._close(Jump(header.label))
+                self._enter(end)
+
+            case If(_, expression, statements, else_statements):
+                then = self._new_block()
+                end = self._new_block()
+                otherwise = self._new_block() if else_statements else end
+                self.condition(expression, then, otherwise, then)
+                self._enter(then)
+                for st in statements:
+                    self.statement(st)
+                self._close(Jump(end.label))
+                if else_statements:
+                    self._enter(otherwise)
+                    for st in else_statements:
+                        self.statement(st)
+                    self._close(Jump(end.label))
+                self._enter(end)
+
+            case Break(lineno):
+                if not self.loop_exits:
+                    raise SyntaxError(f"Break outside of a loop at line {lineno}")
+                self._close(Jump(self.loop_exits[-1]))
+                # Anything following is unreachable, until the next label.
+                self._enter(self._new_block())
+
+            case Return(_, expression):
+                value = None if expression is None else self.expression(expression)
+                self._close(Exit(value))
+                self._enter(self._new_block())
+
+            case FunctionDeclaration() as declaration:
+                name = declaration.identifier
+                if self.function.name != MAIN_UNIT:
+                    name = f"{self.function.name}.{declaration.identifier}"
+                self.scope.functions[declaration.identifier] = (
+                    name,
+                    declaration.return_type,
+                )
+                self.nested.extend(
+                    _lower_function(
+                        declaration,
+                        name,
+                        self.scope.clone(),
+                        self.environment,
+                        self.rotate_loops,
+                    )
+                )
+
+            case unhandled:
+                raise NotImplementedError(
+                    f"Lowering of {type(unhandled)} {unhandled} is not yet implemented"
+                )
+
+    def finish(self) -> list[Function]:
+        self._close(Exit())
+        thread_jumps(self.function)
+        remove_unreachable_blocks(self.function)
+        return [self.function, *self.nested]
+
+
+def _lower_function(
+    declaration: FunctionDeclaration,
+    name: str,
+    scope: _Scope,
+    environment: Environment,
+    rotate_loops: bool,
+) -> list[Function]:
+    arguments = [
+        Variable(f"{name}%{index}", argument.type, argument.identifier)
+        for index, argument in enumerate(declaration.arguments)
+    ]
+    variables = {argument.symbol: argument for argument in arguments}
+    for argument in arguments:
+        scope.variables[argument.identifier] = argument
+    for local in _declarations(declaration.statements):
+        variable = Variable(f"{name}${local.identifier}", local.type, local.identifier)
+        variables.setdefault(variable.symbol, variable)
+        scope.variables[local.identifier] = variable
+    scope.functions[declaration.identifier] = (name, declaration.return_type)
+
+    function = Function(name, arguments, list(variables.values()), declaration.return_type)
+    lowering = _Lowering(function, scope, environment, rotate_loops)
+    for statement in declaration.statements:
+        lowering.statement(statement)
+    return lowering.finish()
+
+
+def lower_function(
+    declaration: FunctionDeclaration, environment: Environment, *, rotate_loops: bool = True
+) -> list[Function]:
+    """Lower a function of the main scope, and the functions declared inside it."""
+    return _lower_function(
+        declaration, declaration.identifier, _Scope(), environment, rotate_loops
+    )
+
+
+def lower_main(
+    statements: list[Statement], environment: Environment, *, rotate_loops: bool = True
+) -> list[Function]:
+    """Lower the main scope, skipping the declarations of its functions."""
+    variables = {
+        declaration.identifier: Variable(
+            f"${declaration.identifier}", declaration.type, declaration.identifier
+        )
+        for declaration in _declarations(statements)
+    }
+    function = Function(MAIN_UNIT, [], list(variables.values()), None)
+    lowering = _Lowering(function, _Scope(), environment, rotate_loops)
+    for statement in statements:
+        if not isinstance(statement, FunctionDeclaration):
+            lowering.statement(statement)
+    return lowering.finish()
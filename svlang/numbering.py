@@ -0,0 +1,179 @@
+"""
+Local value numbering over the IR.
+
+Within a basic block, each value computed gets a number, identical for the
+operations of the same operator over operands with the same numbers. An
+operation computing a value already held by a variable or a temporary is
+removed, and its temporary replaced by that operand, which saves an SVC16
+instruction.
+
+A function call may write to any variable, as may the ASM instructions writing
+through a reference or to a raw address, so the values read from variables
+before them are forgotten. Only the operations computing a temporary used in
+its block are removed, as long as the operand holding the value keeps it until
+the last use of the temporary. The temporaries passed to functions or returned
+aren't removed either: their operation writes straight into the word of the
+argument or of the return value, see `svlang.compiler._homes`.
+"""
+
+from bisect import bisect_right
+from collections import Counter
+
+from .ir import *
+from .optimizer import ASM_WRITES, OPAQUE_OPS
+
+_COMMUTATIVE = (Operation.ADD, Operation.MUL, Operation.AND, Operation.XOR)
+
+
+def _asm_writes(instruction: Asm) -> list[Variable] | None:
+    """The variables an ASM instruction writes to, or None if it may write to any."""
+    if instruction.op.opcode in OPAQUE_OPS:
+        return None
+    written = []
+    for index in ASM_WRITES.get(instruction.op.opcode, ()):
+        argument = instruction.arguments[index]
+        if not isinstance(argument, Variable):
+            return None
+        written.append(argument)
+    return written
+
+
+def _removable_temporaries(function: Function) -> set[Temporary]:
+    """
+    The temporaries computed once, only used in the block computing them, and
+    not passed to a function nor returned.
+    """
+    definitions: Counter[Temporary] = Counter()
+    blocks: dict[Temporary, set[int]] = {}
+    excluded: set[Temporary] = set()
+    for block in function.blocks:
+        for instruction in [*block.instructions, block.terminator]:
+            for operand in instruction.uses():
+                if isinstance(operand, Temporary):
+                    blocks.setdefault(operand, set()).add(block.label)
+                    if isinstance(instruction, (Call, Exit)):
+                        excluded.add(operand)
+            destination = getattr(instruction, "destination", None)
+            if isinstance(destination, Temporary):
+                definitions[destination] += 1
+                blocks.setdefault(destination, set()).add(block.label)
+    return {
+        temporary
+        for temporary, count in definitions.items()
+        if count == 1 and len(blocks[temporary]) == 1 and temporary not in excluded
+    }
+
+
+class _Numbering:
+    def __init__(self, block: BasicBlock, removable: set[Temporary]):
+        self.block = block
+        self.removable = removable
+        self.numbers: dict[Operand, int] = {}
+        self.count = 0
+        self.last_uses: dict[Temporary, int] = {}
+        self.writes: dict[Destination, list[int]] = {}
+        self.clobbers: list[int] = []
+        for index, instruction in enumerate(block.instructions):
+            for operand in instruction.uses():
+                if isinstance(operand, Temporary):
+                    self.last_uses[operand] = index
+            if isinstance(instruction, Asm):
+                written = _asm_writes(instruction)
+            else:
+                written = [] if instruction.destination is None else [instruction.destination]
+            if written is None or isinstance(instruction, Call):
+                self.clobbers.append(index)
+            for destination in written or []:
+                self.writes.setdefault(destination, []).append(index)
+        for operand in block.terminator.uses():
+            if isinstance(operand, Temporary):
+                self.last_uses[operand] = len(block.instructions)
+
+    def number(self, operand: Operand) -> int:
+        number = self.numbers.get(operand)
+        if number is None:
+            number = self.numbers[operand] = self.fresh()
+        return number
+
+    def fresh(self) -> int:
+        self.count += 1
+        return self.count
+
+    def kept(self, holder: Operand, start: int, end: int) -> bool:
+        """Whether nothing writes to an operand after `start` and before `end`."""
+        positions = [self.writes.get(holder, [])]
+        if isinstance(holder, Variable):
+            positions.append(self.clobbers)
+        for writes in positions:
+            after = bisect_right(writes, start)
+            if after < len(writes) and writes[after] < end:
+                return False
+        return True
+
+    def forget_variables(self) -> None:
+        for operand in list(self.numbers):
+            if isinstance(operand, Variable):
+                del self.numbers[operand]
+
+    def run(self) -> int:
+        """Remove the operations of the block computing known values."""
+        computed: dict[tuple[Operation, int, int], tuple[Operand, int]] = {}
+        replacements: dict[Temporary, Operand] = {}
+        instructions: list[Instruction] = []
+        for index, instruction in enumerate(self.block.instructions):
+            match instruction:
+                case Copy(destination, source):
+                    instruction.source = replacements.get(source, source)
+                    self.numbers[destination] = self.number(instruction.source)
+
+                case BinaryOperation(destination, operation, left, right):
+                    instruction.left = left = replacements.get(left, left)
+                    instruction.right = right = replacements.get(right, right)
+                    operands = (self.number(left), self.number(right))
+                    if operation in _COMMUTATIVE:
+                        operands = (min(operands), max(operands))
+                    key = (operation, *operands)
+                    holder, value = computed.get(key, (None, None))
+                    if value is None:
+                        value = self.fresh()
+                    if holder is not None and self.numbers.get(holder) == value:
+                        if destination in self.removable and self.kept(
+                            holder, index, self.last_uses.get(destination, index)
+                        ):
+                            replacements[destination] = holder
+                            self.numbers[destination] = value
+                            continue
+                    # The other temporaries may be computed in the word of an
+                    # argument or of the return value instead.
+                    elif isinstance(destination, Variable) or destination in self.removable:
+                        computed[key] = (destination, value)
+                    self.numbers[destination] = value
+
+                case Call(destination):
+                    self.forget_variables()
+                    if destination is not None:
+                        self.numbers[destination] = self.fresh()
+
+                case Asm():
+                    written = _asm_writes(instruction)
+                    if written is None:
+                        self.forget_variables()
+                    for variable in written or []:
+                        self.numbers[variable] = self.fresh()
+
+            instructions.append(instruction)
+
+        if isinstance(self.block.terminator, Branch):
+            condition = self.block.terminator.condition
+            self.block.terminator.condition = replacements.get(condition, condition)
+        self.block.instructions = instructions
+        return len(replacements)
+
+
+def number_values(function: Function) -> int:
+    """
+    Reuse the values already computed in each block of a function, return the
+    number of instructions removed.
+    """
+    removable = _removable_temporaries(function)
+    return sum(_Numbering(block, removable).run() for block in function.blocks)
@@ -0,0 +1,245 @@
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from .ast import *
+
+
+@dataclass
+class CompilerOptions:
+    """Options of the compiler, mostly to enable or disable optimizations."""
+
+    fold_constants: bool = True
+    eliminate_dead_code: bool = True
+    inline: bool = True
+    inline_budget: int = 40
+    """The size of the largest functions inlined, in statements and expressions."""
+    unroll: bool = True
+    unroll_budget: int = 64
+    """The size of the largest loops unrolled fully, in statements and expressions."""
+    unroll_factor: int = 4
+    """The number of copies of the body of the loops unrolled partially."""
+    hoist_invariants: bool = True
+    reduce_strength: bool = True
+    shake_tree: bool = True
+    keep: tuple[str, ...] = ()
+    """Functions to keep even if they look unused."""
+    report: bool = False
+    """Print what the optimizations did."""
+    intern_expressions: bool = False
+    """Share structurally identical expressions, see `svlang.interning`."""
+    type_check_jobs: int = 1
+    """The number of processes checking the function bodies, without a cache."""
+    allocate_slots: bool = True
+    """Share data words between values whose lifetimes don't overlap, see `svlang.allocation`."""
+    rotate_loops: bool = True
+    """Test the conditions of loops at their bottom, see `svlang.ir`."""
+    eliminate_common_subexpressions: bool = True
+    """Reuse the values already computed in a basic block, see `svlang.numbering`."""
+
+
+@dataclass
+class OptimizationReport:
+    optimization: str
+    message: str
+    line: int | None = None
+
+    def __str__(self):
+        if self.line is None:
+            return f"{self.optimization}: {self.message}"
+        return f"{self.optimization}: line {self.line}: {self.message}"
+
+
+encountered_optimization_reports: ContextVar[list[OptimizationReport]] = ContextVar(
+    "encountered_optimization_reports"
+)
+
+
+def optimization_report(optimization: str, message: str, line: int | None = None) -> None:
+    _optimization_report = OptimizationReport(optimization, message, line)
+    encountered_optimization_reports.get().append(_optimization_report)
+
+
+# The arguments (by index) that the ASM instructions write to.
+ASM_WRITES = {
+    ASMOps.Set.opcode: (0,),
+    ASMOps.Add.opcode: (2,),
+    ASMOps.Sub.opcode: (2,),
+    ASMOps.Mul.opcode: (2,),
+    ASMOps.Div.opcode: (2,),
+    ASMOps.Cmp.opcode: (2,),
+    ASMOps.Deref.opcode: (1,),
+    ASMOps.Inst.opcode: (0,),
+    ASMOps.Read.opcode: (1,),
+    ASMOps.Band.opcode: (2,),
+    ASMOps.Xor.opcode: (2,),
+    ASMOps.Sync.opcode: (0, 1),
+}
+
+# The ASM instructions that may jump anywhere, or write to any word.
+OPAQUE_OPS = (
+    ASMOps.GoTo.opcode,
+    ASMOps.Skip.opcode,
+    ASMOps.Inst.opcode,
+    ASMOps.Ref.opcode,
+)
+
+
+def count_nodes(node: Any) -> int:
+    """Count the statements and expressions in a node, recursively."""
+    return sum(1 for child in walk(node) if isinstance(child, Statement))
+
+
+def is_pure(expression: Expression) -> bool:
+    """
+    Whether evaluating the expression has no side effects: it calls no
+    function, and only divides by non-zero constants, as dividing by zero
+    faults.
+    """
+    for node in walk(expression):
+        match node:
+            case FunctionCall():
+                return False
+            case NumericExpression(_, _, NumericOperator.DIV, right) if not (
+                isinstance(right, NumericValue) and right.value & 0xFFFF != 0
+            ):
+                return False
+    return True
+
+
+def variable_writes(node: Any) -> tuple[set[str], set[str], set[str]] | None:
+    """
+    The variables declared or assigned in a node, those written by its ASM
+    instructions, and the functions it calls. None if an ASM instruction may
+    write to any variable.
+    """
+    assigned: set[str] = set()
+    asm_written: set[str] = set()
+    calls: set[str] = set()
+    for child in walk(node):
+        match child:
+            case Declaration(_, identifier) | Assignment(_, identifier):
+                assigned.add(identifier)
+            case FunctionCall(_, identifier):
+                calls.add(identifier)
+            case ASMInstruction(_, op, arg1, arg2, arg3):
+                if op.opcode in OPAQUE_OPS:
+                    return None
+                arguments = (arg1, arg2, arg3)
+                for index in ASM_WRITES.get(op.opcode, ()):
+                    if isinstance(arguments[index], VariableReference):
+                        asm_written.add(arguments[index].identifier)
+    return assigned, asm_written, calls
+
+
+def function_writes(statements: list[Statement]) -> dict[str, set[str] | None]:
+    """
+    The variables outside of each function that it may write to, directly or
+    through the functions it calls, or None if it may write to any.
+    """
+    writes: dict[str, set[str] | None] = {}
+    calls: dict[str, set[str]] = {}
+    for node in walk(statements):
+        if not isinstance(node, FunctionDeclaration):
+            continue
+        found = variable_writes(node.statements)
+        written = None
+        if found is not None:
+            assigned, asm_written, called = found
+            written = assigned | asm_written
+            written -= {argument.identifier for argument in node.arguments}
+            written -= {
+                child.identifier
+                for child in walk(node.statements)
+                if isinstance(child, Declaration)
+            }
+            calls[node.identifier] = calls.get(node.identifier, set()) | called
+        # Nested functions of different functions may have the same name.
+        if node.identifier in writes:
+            previous = writes[node.identifier]
+            written = None if previous is None or written is None else previous | written
+        writes[node.identifier] = written
+
+    changed = True
+    while changed:
+        changed = False
+        for name, called in calls.items():
+            written = writes[name]
+            if written is None:
+                continue
+            for callee in called:
+                callee_writes = writes.get(callee)
+                if callee_writes is None:
+                    writes[name] = None
+                    changed = True
+                    break
+                if not callee_writes <= written:
+                    written |= callee_writes
+                    changed = True
+    return writes
+
+
+def loop_writes(
+    loop: While, writes: dict[str, set[str] | None]
+) -> tuple[set[str], set[str]] | None:
+    """
+    The variables written while a loop runs: those declared or assigned by its
+    statements, and those written by its ASM instructions or the functions it
+    calls, from `function_writes`. None if any variable may be written, or if
+    the loop declares functions.
+    """
+    if any(isinstance(node, FunctionDeclaration) for node in walk(loop.statements)):
+        return None
+    found = variable_writes(loop)
+    if found is None:
+        return None
+    assigned, indirect, calls = found
+    for callee in calls:
+        callee_writes = writes.get(callee)
+        if callee_writes is None:
+            return None
+        indirect = indirect | callee_writes
+    return assigned, indirect
+
+
+def is_invariant(expression: Expression, written: set[str]) -> bool:
+    """
+    Whether an expression keeps its value in a loop writing to `written`, and
+    can be evaluated before the loop: it calls no function, reads no written
+    variable, and only divides by non-zero constants, as dividing by zero faults.
+    """
+    for node in walk(expression):
+        match node:
+            case FunctionCall():
+                return False
+            case VariableReference(_, identifier) if identifier in written:
+                return False
+            case NumericExpression(_, _, NumericOperator.DIV, right) if not (
+                isinstance(right, NumericValue) and right.value != 0
+            ):
+                return False
+    return True
+
+
+def increment_step(statement: Statement, identifier: str) -> int | None:
+    """The step of an increment of a variable by a constant, modulo 2^16."""
+    match statement:
+        case Assignment(
+            _,
+            target,
+            NumericExpression(
+                _, VariableReference(_, source), NumericOperator.ADD, NumericValue(_, step)
+            )
+            | NumericExpression(
+                _, NumericValue(_, step), NumericOperator.ADD, VariableReference(_, source)
+            ),
+        ) if target == source == identifier:
+            return step & 0xFFFF
+        case Assignment(
+            _,
+            target,
+            NumericExpression(
+                _, VariableReference(_, source), NumericOperator.SUB, NumericValue(_, step)
+            ),
+        ) if target == source == identifier:
+            return -step & 0xFFFF
+    return None
@@ -0,0 +1,87 @@
+
+# parsetab.py
+# This file is automatically generated. Do not edit.
+# pylint: disable=W,C,R
+_tabversion = '3.10'
+
+_lr_method = 'LALR'
+
+_lr_signature = "programARROW ASM ASM_OP BINARY_NEGATION BINARY_OPERATOR BOOLEAN BOOLEAN_NEGATION BOOLEAN_OPERATOR BREAK COLOR COMMENT DEF ELSE FUNCTION_IDENTIFIER IF NUMBER NUMERIC_COMPARATOR NUMERIC_OPERATOR RETURN TYPE VARIABLE_IDENTIFIER WHILE\n    program : statements\n            |\n    \n    type_reference : TYPE\n    \n    declaration : VARIABLE_IDENTIFIER ':' type_reference '=' expression\n    \n    assignment : VARIABLE_IDENTIFIER '=' expression\n    \n    function_arguments : function_argument_list\n                       |\n    \n    function_argument_list : function_argument_list ',' expression\n                           | expression\n    \n    function_call : FUNCTION_IDENTIFIER '(' function_arguments ')'\n    \n    numeric_expression : expression NUMERIC_OPERATOR expression\n                       | NUMBER\n    \n    numeric_comparison : expression NUMERIC_COMPARATOR expression\n    \n    boolean_expression : expression BOOLEAN_OPERATOR expression\n                       | BOOLEAN_NEGATION expression\n                       | BOOLEAN\n    \n    binary_expression : NUMBER BINARY_OPERATOR NUMBER\n                      | NUMBER BINARY_OPERATOR variable_reference\n                      | variable_reference BINARY_OPERATOR NUMBER\n                      | variable_reference BINARY_OPERATOR variable_reference\n    \n    binary_negation : '!' NUMBER\n                    | '!' variable_reference\n    variable_reference : VARIABLE_IDENTIFIERcolor_expression : COLOR\n    expression : variable_reference\n               | function_call\n               | numeric_expression\n               | numeric_comparison\n               | boolean_expression\n               | binary_expression\n               | color_expression\n    while : WHILE expression '{' statements '}'\n    if : IF expression '{' statements '}' ELSE '{' statements '}'\n       | IF expression '{' statements '}'\n    \n    function_declare_arguments : function_declare_argument_list\n                               |\n    \n    function_declare_argument_list : function_declare_argument_list ',' VARIABLE_IDENTIFIER ':' type_reference\n                                   | VARIABLE_IDENTIFIER ':' type_reference\n    \n    function_declaration : DEF FUNCTION_IDENTIFIER '(' function_declare_arguments ')' ARROW type_reference '{' statements '}'\n                         | DEF FUNCTION_IDENTIFIER '(' function_declare_arguments ')' '{' statements '}'\n    \n    return : RETURN expression\n           | RETURN\n    \n    break : BREAK\n    \n    asm_arg : variable_reference\n            | NUMBER\n    \n    asm : ASM ASM_OP asm_arg asm_arg asm_arg\n    \n    statement : declaration\n              | assignment\n              | expression\n              | while\n              | if\n              | function_declaration\n              | return\n              | break\n              | asm\n    \n    statements : statements statement\n               | statement\n    "
+    
+_lr_action_items = {'$end':([0,1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,25,26,28,30,31,32,40,44,47,48,49,50,53,54,55,63,64,65,66,73,76,77,78,83,95,97,99,],[-2,0,-1,-57,-47,-48,-49,-50,-51,-52,-53,-54,-55,-23,-25,-26,-27,-28,-29,-30,-31,-42,-43,-12,-16,-24,-56,-23,-41,-15,-11,-13,-14,-5,-20,-19,-44,-45,-17,-18,-10,-4,-32,-34,-46,-40,-33,-39,]),'VARIABLE_IDENTIFIER':([0,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,21,22,25,26,28,29,30,31,32,33,34,35,37,38,40,43,44,45,46,47,48,49,50,53,54,55,56,57,58,62,63,64,65,66,67,68,69,73,74,75,76,77,78,80,83,86,89,91,93,94,95,97,98,99,],[13,13,-57,-47,-48,-49,-50,-51,-52,-53,-54,-55,-23,-25,-26,-27,-28,-29,-30,-31,40,40,40,-43,-12,40,-16,-24,-56,40,40,40,40,40,-23,40,-41,40,40,-15,-11,-13,-14,-5,-20,-19,13,13,72,40,-44,-45,-17,-18,40,13,13,-10,40,40,-4,-32,-34,87,-46,13,13,13,13,13,-40,-33,13,-39,]),'WHILE':([0,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,25,26,28,30,31,32,40,44,47,48,49,50,53,54,55,56,57,63,64,65,66,68,69,73,76,77,78,83,86,89,91,93,94,95,97,98,99,],[21,21,-57,-47,-48,-49,-50,-51,-52,-53,-54,-55,-23,-25,-26,-27,-28,-29,-30,-31,-42,-43,-12,-16,-24,-56,-23,-41,-15,-11,-13,-14,-5,-20,-19,21,21,-44,-45,-17,-18,21,21,-10,-4,-32,-34,-46,21,21,21,21,21,-40,-33,21,-39,]),'IF':([0,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,25,26,28,30,31,32,40,44,47,48,49,50,53,54,55,56,57,63,64,65,66,68,69,73,76,77,78,83,86,89,91,93,94,95,97,98,99,],[22,22,-57,-47,-48,-49,-50,-51,-52,-53,-54,-55,-23,-25,-26,-27,-28,-29,-30,-31,-42,-43,-12,-16,-24,-56,-23,-41,-15,-11,-13,-14,-5,-20,-19,22,22,-44,-45,-17,-18,22,22,-10,-4,-32,-34,-46,22,22,22,22,22,-40,-33,22,-39,]),'DEF':([0,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,25,26,28,30,31,32,40,44,47,48,49,50,53,54,55,56,57,63,64,65,66,68,69,73,76,77,78,83,86,89,91,93,94,95,97,98,99,],[23,23,-57,-47,-48,-49,-50,-51,-52,-53,-54,-55,-23,-25,-26,-27,-28,-29,-30,-31,-42,-43,-12,-16,-24,-56,-23,-41,-15,-11,-13,-14,-5,-20,-19,23,23,-44,-45,-17,-18,23,23,-10,-4,-32,-34,-46,23,23,23,23,23,-40,-33,23,-39,]),'RETURN':([0,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,25,26,28,30,31,32,40,44,47,48,49,50,53,54,55,56,57,63,64,65,66,68,69,73,76,77,78,83,86,89,91,93,94,95,97,98,99,],[25,25,-57,-47,-48,-49,-50,-51,-52,-53,-54,-55,-23,-25,-26,-27,-28,-29,-30,-31,-42,-43,-12,-16,-24,-56,-23,-41,-15,-11,-13,-14,-5,-20,-19,25,25,-44,-45,-17,-18,25,25,-10,-4,-32,-34,-46,25,25,25,25,25,-40,-33,25,-39,]),'BREAK':([0,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,25,26,28,30,31,32,40,44,47,48,49,50,53,54,55,56,57,63,64,65,66,68,69,73,76,77,78,83,86,89,91,93,94,95,97,98,99,],[26,26,-57,-47,-48,-49,-50,-51,-52,-53,-54,-55,-23,-25,-26,-27,-28,-29,-30,-31,-42,-43,-12,-16,-24,-56,-23,-41,-15,-11,-13,-14,-5,-20,-19,26,26,-44,-45,-17,-18,26,26,-10,-4,-32,-34,-46,26,26,26,26,26,-40,-33,26,-39,]),'ASM':([0,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,25,26,28,30,31,32,40,44,47,48,49,50,53,54,55,56,57,63,64,65,66,68,69,73,76,77,78,83,86,89,91,93,94,95,97,98,99,],[27,27,-57,-47,-48,-49,-50,-51,-52,-53,-54,-55,-23,-25,-26,-27,-28,-29,-30,-31,-42,-43,-12,-16,-24,-56,-23,-41,-15,-11,-13,-14,-5,-20,-19,27,27,-44,-45,-17,-18,27,27,-10,-4,-32,-34,-46,27,27,27,27,27,-40,-33,27,-39,]),'FUNCTION_IDENTIFIER':([0,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,21,22,23,25,26,28,29,30,31,32,33,34,35,37,40,43,44,47,48,49,50,53,54,55,56,57,63,64,65,66,67,68,69,73,74,76,77,78,83,86,89,91,93,94,95,97,98,99,],[24,24,-57,-47,-48,-49,-50,-51,-52,-53,-54,-55,-23,-25,-26,-27,-28,-29,-30,-31,24,24,42,24,-43,-12,24,-16,-24,-56,24,24,24,24,-23,24,-41,-15,-11,-13,-14,-5,-20,-19,24,24,-44,-45,-17,-18,24,24,24,-10,24,-4,-32,-34,-46,24,24,24,24,24,-40,-33,24,-39,]),'NUMBER':([0,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,21,22,25,26,28,29,30,31,32,33,34,35,37,38,40,43,44,45,46,47,48,49,50,53,54,55,56,57,62,63,64,65,66,67,68,69,73,74,75,76,77,78,83,86,89,91,93,94,95,97,98,99,],[28,28,-57,-47,-48,-49,-50,-51,-52,-53,-54,-55,-23,-25,-26,-27,-28,-29,-30,-31,28,28,28,-43,-12,28,-16,-24,-56,28,28,28,28,55,-23,28,-41,64,65,-15,-11,-13,-14,-5,-20,-19,28,28,64,-44,-45,-17,-18,28,28,28,-10,28,64,-4,-32,-34,-46,28,28,28,28,28,-40,-33,28,-39,]),'BOOLEAN_NEGATION':([0,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,21,22,25,26,28,29,30,31,32,33,34,35,37,40,43,44,47,48,49,50,53,54,55,56,57,63,64,65,66,67,68,69,73,74,76,77,78,83,86,89,91,93,94,95,97,98,99,],[29,29,-57,-47,-48,-49,-50,-51,-52,-53,-54,-55,-23,-25,-26,-27,-28,-29,-30,-31,29,29,29,-43,-12,29,-16,-24,-56,29,29,29,29,-23,29,-41,-15,-11,-13,-14,-5,-20,-19,29,29,-44,-45,-17,-18,29,29,29,-10,29,-4,-32,-34,-46,29,29,29,29,29,-40,-33,29,-39,]),'BOOLEAN':([0,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,21,22,25,26,28,29,30,31,32,33,34,35,37,40,43,44,47,48,49,50,53,54,55,56,57,63,64,65,66,67,68,69,73,74,76,77,78,83,86,89,91,93,94,95,97,98,99,],[30,30,-57,-47,-48,-49,-50,-51,-52,-53,-54,-55,-23,-25,-26,-27,-28,-29,-30,-31,30,30,30,-43,-12,30,-16,-24,-56,30,30,30,30,-23,30,-41,-15,-11,-13,-14,-5,-20,-19,30,30,-44,-45,-17,-18,30,30,30,-10,30,-4,-32,-34,-46,30,30,30,30,30,-40,-33,30,-39,]),'COLOR':([0,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,21,22,25,26,28,29,30,31,32,33,34,35,37,40,43,44,47,48,49,50,53,54,55,56,57,63,64,65,66,67,68,69,73,74,76,77,78,83,86,89,91,93,94,95,97,98,99,],[31,31,-57,-47,-48,-49,-50,-51,-52,-53,-54,-55,-23,-25,-26,-27,-28,-29,-30,-31,31,31,31,-43,-12,31,-16,-24,-56,31,31,31,31,-23,31,-41,-15,-11,-13,-14,-5,-20,-19,31,31,-44,-45,-17,-18,31,31,31,-10,31,-4,-32,-34,-46,31,31,31,31,31,-40,-33,31,-39,]),'}':([3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,25,26,28,30,31,32,40,44,47,48,49,50,53,54,55,63,64,65,66,68,69,73,76,77,78,83,91,93,95,97,98,99,],[-57,-47,-48,-49,-50,-51,-52,-53,-54,-55,-23,-25,-26,-27,-28,-29,-30,-31,-42,-43,-12,-16,-24,-56,-23,-41,-15,-11,-13,-14,-5,-20,-19,-44,-45,-17,-18,77,78,-10,-4,-32,-34,-46,95,97,-40,-33,99,-39,]),'NUMERIC_OPERATOR':([6,13,14,15,16,17,18,19,20,28,30,31,39,40,41,44,47,48,49,50,53,54,55,61,65,66,73,76,82,],[33,-23,-25,-26,-27,-28,-29,-30,-31,-12,-16,-24,33,-23,33,33,33,33,33,33,33,-20,-19,33,-17,-18,-10,33,33,]),'NUMERIC_COMPARATOR':([6,13,14,15,16,17,18,19,20,28,30,31,39,40,41,44,47,48,49,50,53,54,55,61,65,66,73,76,82,],[34,-23,-25,-26,-27,-28,-29,-30,-31,-12,-16,-24,34,-23,34,34,34,34,34,34,34,-20,-19,34,-17,-18,-10,34,34,]),'BOOLEAN_OPERATOR':([6,13,14,15,16,17,18,19,20,28,30,31,39,40,41,44,47,48,49,50,53,54,55,61,65,66,73,76,82,],[35,-23,-25,-26,-27,-28,-29,-30,-31,-12,-16,-24,35,-23,35,35,35,35,35,35,35,-20,-19,35,-17,-18,-10,35,35,]),':':([13,72,87,],[36,81,92,]),'=':([13,51,52,],[37,67,-3,]),'BINARY_OPERATOR':([13,14,28,40,],[-23,38,46,-23,]),'{':([14,15,16,17,18,19,20,28,30,31,39,40,41,47,48,49,50,52,54,55,65,66,73,79,84,90,],[-25,-26,-27,-28,-29,-30,-31,-12,-16,-24,56,-23,57,-15,-11,-13,-14,-3,-20,-19,-17,-18,-10,86,89,94,]),',':([14,15,16,17,18,19,20,28,30,31,40,47,48,49,50,52,54,55,60,61,65,66,71,73,82,88,96,],[-25,-26,-27,-28,-29,-30,-31,-12,-16,-24,-23,-15,-11,-13,-14,-3,-20,-19,74,-9,-17,-18,80,-10,-8,-38,-37,]),')':([14,15,16,17,18,19,20,28,30,31,40,43,47,48,49,50,52,54,55,58,59,60,61,65,66,70,71,73,82,88,96,],[-25,-26,-27,-28,-29,-30,-31,-12,-16,-24,-23,-7,-15,-11,-13,-14,-3,-20,-19,-36,73,-6,-9,-17,-18,79,-35,-10,-8,-38,-37,]),'(':([24,42,],[43,58,]),'ASM_OP':([27,],[45,]),'TYPE':([36,81,85,92,],[52,52,52,52,]),'ELSE':([78,],[84,]),'ARROW':([79,],[85,]),}
+
+_lr_action = {}
+for _k, _v in _lr_action_items.items():
+   for _x,_y in zip(_v[0],_v[1]):
+      if not _x in _lr_action:  _lr_action[_x] = {}
+      _lr_action[_x][_k] = _y
+del _lr_action_items
+
+_lr_goto_items = {'program':([0,],[1,]),'statements':([0,56,57,86,89,94,],[2,68,69,91,93,98,]),'statement':([0,2,56,57,68,69,86,89,91,93,94,98,],[3,32,3,3,32,32,3,3,32,32,3,32,]),'declaration':([0,2,56,57,68,69,86,89,91,93,94,98,],[4,4,4,4,4,4,4,4,4,4,4,4,]),'assignment':([0,2,56,57,68,69,86,89,91,93,94,98,],[5,5,5,5,5,5,5,5,5,5,5,5,]),'expression':([0,2,21,22,25,29,33,34,35,37,43,56,57,67,68,69,74,86,89,91,93,94,98,],[6,6,39,41,44,47,48,49,50,53,61,6,6,76,6,6,82,6,6,6,6,6,6,]),'while':([0,2,56,57,68,69,86,89,91,93,94,98,],[7,7,7,7,7,7,7,7,7,7,7,7,]),'if':([0,2,56,57,68,69,86,89,91,93,94,98,],[8,8,8,8,8,8,8,8,8,8,8,8,]),'function_declaration':([0,2,56,57,68,69,86,89,91,93,94,98,],[9,9,9,9,9,9,9,9,9,9,9,9,]),'return':([0,2,56,57,68,69,86,89,91,93,94,98,],[10,10,10,10,10,10,10,10,10,10,10,10,]),'break':([0,2,56,57,68,69,86,89,91,93,94,98,],[11,11,11,11,11,11,11,11,11,11,11,11,]),'asm':([0,2,56,57,68,69,86,89,91,93,94,98,],[12,12,12,12,12,12,12,12,12,12,12,12,]),'variable_reference':([0,2,21,22,25,29,33,34,35,37,38,43,45,46,56,57,62,67,68,69,74,75,86,89,91,93,94,98,],[14,14,14,14,14,14,14,14,14,14,54,14,63,66,14,14,63,14,14,14,14,63,14,14,14,14,14,14,]),'function_call':([0,2,21,22,25,29,33,34,35,37,43,56,57,67,68,69,74,86,89,91,93,94,98,],[15,15,15,15,15,15,15,15,15,15,15,15,15,15,15,15,15,15,15,15,15,15,15,]),'numeric_expression':([0,2,21,22,25,29,33,34,35,37,43,56,57,67,68,69,74,86,89,91,93,94,98,],[16,16,16,16,16,16,16,16,16,16,16,16,16,16,16,16,16,16,16,16,16,16,16,]),'numeric_comparison':([0,2,21,22,25,29,33,34,35,37,43,56,57,67,68,69,74,86,89,91,93,94,98,],[17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,17,]),'boolean_expression':([0,2,21,22,25,29,33,34,35,37,43,56,57,67,68,69,74,86,89,91,93,94,98,],[18,18,18,18,18,18,18,18,18,18,18,18,18,18,18,18,18,18,18,18,18,18,18,]),'binary_expression':([0,2,21,22,25,29,33,34,35,37,43,56,57,67,68,69,74,86,89,91,93,94,98,],[19,19,19,19,19,19,19,19,19,19,19,19,19,19,19,19,19,19,19,19,19,19,19,]),'color_expression':([0,2,21,22,25,29,33,34,35,37,43,56,57,67,68,69,74,86,89,91,93,94,98,],[20,20,20,20,20,20,20,20,20,20,20,20,20,20,20,20,20,20,20,20,20,20,20,]),'type_reference':([36,81,85,92,],[51,88,90,96,]),'function_arguments':([43,],[59,]),'function_argument_list':([43,],[60,]),'asm_arg':([45,62,75,],[62,75,83,]),'function_declare_arguments':([58,],[70,]),'function_declare_argument_list':([58,],[71,]),}
+
+_lr_goto = {}
+for _k, _v in _lr_goto_items.items():
+   for _x, _y in zip(_v[0], _v[1]):
+       if not _x in _lr_goto: _lr_goto[_x] = {}
+       _lr_goto[_x][_k] = _y
+del _lr_goto_items
+_lr_productions = [
+  ("S' -> program","S'",1,None,None,None),
+  ('program -> statements','program',1,'p_program','grammar.py',14),
+  ('program -> <empty>','program',0,'p_program','grammar.py',15),
+  ('type_reference -> TYPE','type_reference',1,'p_type_reference','grammar.py',22),
+  ('declaration -> VARIABLE_IDENTIFIER : type_reference = expression','declaration',5,'p_declaration','grammar.py',37),
+  ('assignment -> VARIABLE_IDENTIFIER = expression','assignment',3,'p_assignment','grammar.py',47),
+  ('function_arguments -> function_argument_list','function_arguments',1,'p_function_arguments','grammar.py',56),
+  ('function_arguments -> <empty>','function_arguments',0,'p_function_arguments','grammar.py',57),
+  ('function_argument_list -> function_argument_list , expression','function_argument_list',3,'p_function_argument_list','grammar.py',64),
+  ('function_argument_list -> expression','function_argument_list',1,'p_function_argument_list','grammar.py',65),
+  ('function_call -> FUNCTION_IDENTIFIER ( function_arguments )','function_call',4,'p_function_call','grammar.py',80),
+  ('numeric_expression -> expression NUMERIC_OPERATOR expression','numeric_expression',3,'p_numeric_expression','grammar.py',89),
+  ('numeric_expression -> NUMBER','numeric_expression',1,'p_numeric_expression','grammar.py',90),
+  ('numeric_comparison -> expression NUMERIC_COMPARATOR expression','numeric_comparison',3,'p_numeric_comparison','grammar.py',117),
+  ('boolean_expression -> expression BOOLEAN_OPERATOR expression','boolean_expression',3,'p_boolean_expression','grammar.py',142),
+  ('boolean_expression -> BOOLEAN_NEGATION expression','boolean_expression',2,'p_boolean_expression','grammar.py',143),
+  ('boolean_expression -> BOOLEAN','boolean_expression',1,'p_boolean_expression','grammar.py',144),
+  ('binary_expression -> NUMBER BINARY_OPERATOR NUMBER','binary_expression',3,'p_binary_expression','grammar.py',170),
+  ('binary_expression -> NUMBER BINARY_OPERATOR variable_reference','binary_expression',3,'p_binary_expression','grammar.py',171),
+  ('binary_expression -> variable_reference BINARY_OPERATOR NUMBER','binary_expression',3,'p_binary_expression','grammar.py',172),
+  ('binary_expression -> variable_reference BINARY_OPERATOR variable_reference','binary_expression',3,'p_binary_expression','grammar.py',173),
+  ('binary_negation -> ! NUMBER','binary_negation',2,'p_binary_negation','grammar.py',209),
+  ('binary_negation -> ! variable_reference','binary_negation',2,'p_binary_negation','grammar.py',210),
+  ('variable_reference -> VARIABLE_IDENTIFIER','variable_reference',1,'p_variable_reference','grammar.py',221),
+  ('color_expression -> COLOR','color_expression',1,'p_color_expression','grammar.py',226),
+  ('expression -> variable_reference','expression',1,'p_expression','grammar.py',232),
+  ('expression -> function_call','expression',1,'p_expression','grammar.py',233),
+  ('expression -> numeric_expression','expression',1,'p_expression','grammar.py',234),
+  ('expression -> numeric_comparison','expression',1,'p_expression','grammar.py',235),
+  ('expression -> boolean_expression','expression',1,'p_expression','grammar.py',236),
+  ('expression -> binary_expression','expression',1,'p_expression','grammar.py',237),
+  ('expression -> color_expression','expression',1,'p_expression','grammar.py',238),
+  ('while -> WHILE expression { statements }','while',5,'p_while','grammar.py',244),
+  ('if -> IF expression { statements } ELSE { statements }','if',9,'p_if','grammar.py',252),
+  ('if -> IF expression { statements }','if',5,'p_if','grammar.py',253),
+  ('function_declare_arguments -> function_declare_argument_list','function_declare_arguments',1,'p_function_declare_arguments','grammar.py',268),
+  ('function_declare_arguments -> <empty>','function_declare_arguments',0,'p_function_declare_arguments','grammar.py',269),
+  ('function_declare_argument_list -> function_declare_argument_list , VARIABLE_IDENTIFIER : type_reference','function_declare_argument_list',5,'p_function_declare_argument_list','grammar.py',276),
+  ('function_declare_argument_list -> VARIABLE_IDENTIFIER : type_reference','function_declare_argument_list',3,'p_function_declare_argument_list','grammar.py',277),
+  ('function_declaration -> DEF FUNCTION_IDENTIFIER ( function_declare_arguments ) ARROW type_reference { statements }','function_declaration',10,'p_function_declaration','grammar.py',293),
+  ('function_declaration -> DEF FUNCTION_IDENTIFIER ( function_declare_arguments ) { statements }','function_declaration',8,'p_function_declaration','grammar.py',294),
+  ('return -> RETURN expression','return',2,'p_return','grammar.py',312),
+  ('return -> RETURN','return',1,'p_return','grammar.py',313),
+  ('break -> BREAK','break',1,'p_break','grammar.py',324),
+  ('asm_arg -> variable_reference','asm_arg',1,'p_asm_arg','grammar.py',331),
+  ('asm_arg -> NUMBER','asm_arg',1,'p_asm_arg','grammar.py',332),
+  ('asm -> ASM ASM_OP asm_arg asm_arg asm_arg','asm',5,'p_asm','grammar.py',342),
+  ('statement -> declaration','statement',1,'p_statement','grammar.py',352),
+  ('statement -> assignment','statement',1,'p_statement','grammar.py',353),
+  ('statement -> expression','statement',1,'p_statement','grammar.py',354),
+  ('statement -> while','statement',1,'p_statement','grammar.py',355),
+  ('statement -> if','statement',1,'p_statement','grammar.py',356),
+  ('statement -> function_declaration','statement',1,'p_statement','grammar.py',357),
+  ('statement -> return','statement',1,'p_statement','grammar.py',358),
+  ('statement -> break','statement',1,'p_statement','grammar.py',359),
+  ('statement -> asm','statement',1,'p_statement','grammar.py',360),
+  ('statements -> statements statement','statements',2,'p_statements','grammar.py',367),
+  ('statements -> statement','statements',1,'p_statements','grammar.py',368),
+]
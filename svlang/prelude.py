@@ -0,0 +1,107 @@
+from functools import cache
+
+from .ast import *
+from .grammar import parse
+
+PRELUDE_SOURCE = """\
+$MOUSE_X: UINT = 0
+$MOUSE_Y: UINT = 0
+$MOUSE_LMB: BOOL = False
+$MOUSE_RMB: BOOL = False
+$BUTTON_A: BOOL = False
+$BUTTON_B: BOOL = False
+$BUTTON_UP: BOOL = False
+$BUTTON_DOWN: BOOL = False
+$BUTTON_LEFT: BOOL = False
+$BUTTON_RIGHT: BOOL = False
+$BUTTON_SELECT: BOOL = False
+$BUTTON_START: BOOL = False
+
+def sync() {
+    $position: UINT = 0
+    $keycodes: UINT = 0
+    ASM Sync $position $keycodes 0
+    $MOUSE_X = $position & 255
+    $MOUSE_Y = $position / 256
+    $MOUSE_LMB = $keycodes & 0b00000001 > 0
+    $BUTTON_A = $MOUSE_LMB
+    $MOUSE_RMB = $keycodes & 0b00000010 > 0
+    $BUTTON_B = $MOUSE_RMB
+    $BUTTON_UP = $keycodes & 0b000000100 > 0
+    $BUTTON_DOWN = $keycodes & 0b00001000 > 0
+    $BUTTON_LEFT = $keycodes & 0b00010000 > 0
+    $BUTTON_RIGHT = $keycodes & 0b00100000 > 0
+    $BUTTON_SELECT = $keycodes & 0b01000000 > 0
+    $BUTTON_START = $keycodes & 0b10000000 > 0
+}
+
+def Color($red: UINT, $green: UINT, $blue: UINT) -> COLOR {
+    $color: COLOR = #0000 // we need a default value when we declare variables
+    $r: UINT = $red / 8
+    $g: UINT = $green / 4
+    $b: UINT = $blue / 8
+    $color_value: UINT = $r * 32 + $g * 8 + $b
+    ASM Add $color $color_value $color
+    return $color
+}
+
+def setPixel($x: UINT, $y: UINT, $color: COLOR) {
+    $index: UINT = $y * 256 + $x
+    ASM Print $color $index 0
+}
+"""
+"""The builtin variables and functions, available to every program."""
+
+
+@cache
+def _parse_prelude() -> tuple[Statement, ...]:
+    return tuple(parse(PRELUDE_SOURCE))
+
+
+def _declared_name(statement: Statement) -> str | None:
+    """The variable or function a statement declares, `$` prefixed for variables."""
+    match statement:
+        case Declaration(_, identifier):
+            return f"${identifier}"
+        case FunctionDeclaration(_, identifier):
+            return identifier
+    return None
+
+
+def _referenced_names(statement: Statement) -> set[str]:
+    """The variables and functions a statement refers to, `$` prefixed for variables."""
+    names = set()
+    for node in walk(statement):
+        match node:
+            case Assignment(_, identifier) | VariableReference(_, identifier):
+                names.add(f"${identifier}")
+            case FunctionCall(_, identifier):
+                names.add(identifier)
+    return names
+
+
+def prelude_for(statements: list[Statement]) -> list[Statement]:
+    """
+    The builtin variables and functions for a program.
+
+    Programs written before the prelude existed declare the builtins
+    themselves: their own declarations are used instead, along with their
+    own version of the builtins referring to them.
+    """
+    declared = {_declared_name(statement) for statement in statements}
+    builtins = {_declared_name(statement) for statement in _parse_prelude()}
+    if not declared & builtins:
+        return list(_parse_prelude())
+    prelude = []
+    for statement in _parse_prelude():
+        name = _declared_name(statement)
+        if name in declared or _referenced_names(statement) & builtins & declared:
+            declared.add(name)
+        else:
+            prelude.append(statement)
+    return prelude
+
+
+def with_prelude(statements: list[Statement]) -> list[Statement]:
+    """Prepend the builtin variables and functions to a program."""
+    return [*prelude_for(statements), *statements]
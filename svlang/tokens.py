@@ -1,6 +1,6 @@
 import re
-
-import ply.lex as lex
+import sys
+from typing import Any, Iterator
 
 tokens = (
     "COMMENT",
@@ -29,139 +29,142 @@ tokens = (
 
 literals = ["{", "}", "(", ")", ":", ",", "="]
 
-t_NUMERIC_OPERATOR = r"[+\-*/]"
-t_NUMERIC_COMPARATOR = r"<|>|<=|>=|==|!="
-
-
-def t_ignore_COMMENT(t):
-    r"//.*"
-    pass  # ignore comment tokens
-
-
-def t_ASM(t):
-    r"ASM"
-    return t
-
-
-def t_ASM_OP(t):
-    r"Set|GoTo|Skip|Add|Sub|Mul|Div|Cmp|Deref|Ref|Inst|Print|Read|Band|Xor|Sync"
-    return t
-
-
-def t_DEF(t):
-    r"def"
-    return t
-
-
-def t_ARROW(t):
-    r"->"
-    return t
-
-
-def t_RETURN(t):
-    r"return"
-    return t
-
-
-def t_WHILE(t):
-    r"while"
-    return t
-
-
-def t_BREAK(t):
-    r"break"
-    return t
-
-
-def t_IF(t):
-    r"if"
-    return t
-
-
-def t_ELSE(t):
-    r"else"
-    return t
-
-
-def t_NUMBER(t):
-    r"0b[01_]+|0x[a-fA-F\d_]+|[\d_]+"
-    group_pattern = r"(?:0b(?P<binary>[01_]+))|(?:0x(?P<hexadecimal>[a-fA-F\d_]+))|(?P<decimal>[\d_]+)"
-    match = re.match(group_pattern, t.value)
-    assert match is not None
-    groupdicts = match.groupdict()
-    if groupdicts["binary"]:
-        t.value = int(t.value, 2)
-    elif groupdicts["hexadecimal"]:
-        t.value = int(t.value, 16)
-    elif groupdicts["decimal"]:
-        t.value = int(t.value)
-    else:
-        raise RuntimeError("matched unknown group")
-    return t
-
-
-def t_TYPE(t):
-    r"BOOL|UINT|COLOR"
-    return t
-
-
-def t_BOOLEAN(t):
-    r"True|False"
-    t.value = t.value == "True"
-    return t
-
-
-def t_BOOLEAN_OPERATOR(t):
-    r"and|or"
-    return t
-
-
-def t_BOOLEAN_NEGATION(t):
-    r"not"
-    return t
-
-
-def t_BINARY_OPERATOR(t):
-    r"\^|&"
-    return t
-
-
-def t_BINARY_NEGATION(t):
-    r"!"
-    return t
-
-
-def t_COLOR(t):
-    r"[#][0-9a-fA-F]{4}"
-    t.value = int(t.value[1:], 16)
-    return t
-
-
-def t_FUNCTION_IDENTIFIER(t):
-    r"\w(\w|[0-9_])*"
-    return t
-
-
-def t_VARIABLE_IDENTIFIER(t):
-    r"\$\w(\w|[0-9_])*"
-    t.value = t.value[1:]
-    return t
-
-
-# Define a rule so we can track line numbers
-def t_newline(t):
-    r"\n+"
-    t.lexer.lineno += len(t.value)
-
-
-t_ignore = " \t\r"
-
+_TOKEN_TYPES = {
+    "ASM": "ASM",
+    "def": "DEF",
+    "return": "RETURN",
+    "while": "WHILE",
+    "break": "BREAK",
+    "if": "IF",
+    "else": "ELSE",
+    "BOOL": "TYPE",
+    "UINT": "TYPE",
+    "COLOR": "TYPE",
+    "True": "BOOLEAN",
+    "False": "BOOLEAN",
+    "and": "BOOLEAN_OPERATOR",
+    "or": "BOOLEAN_OPERATOR",
+    "not": "BOOLEAN_NEGATION",
+    **dict.fromkeys(
+        "Set GoTo Skip Add Sub Mul Div Cmp Deref Ref Inst Print Read Band Xor Sync".split(),
+        "ASM_OP",
+    ),
+    "->": "ARROW",
+    **dict.fromkeys(["<", ">", "<=", ">=", "==", "!="], "NUMERIC_COMPARATOR"),
+    **dict.fromkeys("+-*/", "NUMERIC_OPERATOR"),
+    **dict.fromkeys("^&", "BINARY_OPERATOR"),
+    "!": "BINARY_NEGATION",
+    **{literal: literal for literal in literals},
+}
+"""The type of the keywords, operators and literals."""
+
+_TOKEN_TYPES_BY_FIRST_CHARACTER = {
+    "$": "VARIABLE_IDENTIFIER",
+    "#": "COLOR",
+    **dict.fromkeys("0123456789", "NUMBER"),
+}
+"""The type of the other tokens, anything else being a function identifier."""
+
+# Whitespace and comments are skipped as part of the next token, so that every
+# token takes a single match. The skipped text is never given back, so nothing
+# matches at the end of the source, after the last token. The last group
+# catches illegal characters.
+_TOKEN_PATTERN = re.compile(
+    r"""
+    ((?:\s+|//[^\n]*)*+)
+    (?:
+        (
+            [^\W\d]\w* | \$\w+ | 0b[01_]+ | 0x[a-fA-F\d_]+ | \d[\d_]* | \#[0-9a-fA-F]{4}
+            | -> | [<>=!]= | [-+*/^&!<>{}():,=]
+        )
+        | (.)
+    )
+    """,
+    re.VERBOSE,
+)
 
-def t_error(t):
-    raise SyntaxError(f"Illegal character {t.value[0]!r}")
 
+class Token:
+    """A token, with the attributes the PLY parser uses."""
+
+    __slots__ = ("type", "value", "lineno", "lexpos", "lexer")
+
+    def __init__(self, type: str, value: Any, lineno: int, lexpos: int):
+        self.type = type
+        self.value = value
+        self.lineno = lineno
+        self.lexpos = lexpos
+
+    def __repr__(self):
+        return f"LexToken({self.type},{self.value!r},{self.lineno},{self.lexpos})"
+
+
+def tokenize(source: str) -> Iterator[Token]:
+    """Split a source into tokens, lazily."""
+    lineno = 1
+    lexpos = 0
+    match_token = _TOKEN_PATTERN.match
+    while (token_match := match_token(source, lexpos)) is not None:
+        skipped, text, illegal = token_match.groups()
+        if illegal:
+            raise SyntaxError(f"Illegal character {illegal!r}")
+        lexpos += len(skipped)
+        if "\n" in skipped:
+            lineno += skipped.count("\n")
+        token_type = _TOKEN_TYPES.get(text)
+        if token_type is None:
+            token_type = _TOKEN_TYPES_BY_FIRST_CHARACTER.get(text[0], "FUNCTION_IDENTIFIER")
+            match token_type:
+                # Identifiers are interned, so each name is stored once however
+                # many nodes refer to it.
+                case "FUNCTION_IDENTIFIER":
+                    value = sys.intern(text)
+                case "VARIABLE_IDENTIFIER":
+                    value = sys.intern(text[1:])
+                case "NUMBER":
+                    match text[1:2]:
+                        case "b":
+                            value = int(text, 2)
+                        case "x":
+                            value = int(text, 16)
+                        case _:
+                            value = int(text)
+                case "COLOR":
+                    value = int(text[1:], 16)
+        elif token_type == "BOOLEAN":
+            value = text == "True"
+        else:
+            value = text
+        yield Token(token_type, value, lineno, lexpos)
+        lexpos += len(text)
+
+
+class Scanner:
+    """
+    Feed the tokens of a source to the PLY parser.
+
+    `lineno` and `lexpos` follow the last token read, the parser uses them to
+    place empty productions.
+    """
+
+    def __init__(self):
+        self._tokens: Iterator[Token] = iter(())
+        self.lineno = 1
+        self.lexpos = 0
+
+    def input(self, source: str) -> None:
+        self._tokens = tokenize(source)
+        self.lineno = 1
+        self.lexpos = 0
+
+    def token(self) -> Token | None:
+        token = next(self._tokens, None)
+        if token is not None:
+            self.lineno = token.lineno
+            self.lexpos = token.lexpos
+        return token
 
-lexer = lex.lex()
 
 if __name__ == "__main__":
-    lex.runmain()
+    for token in tokenize(sys.stdin.read()):
+        print(token)
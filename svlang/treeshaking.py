@@ -0,0 +1,180 @@
+"""
+Whole-program tree shaking.
+
+The functions and global variables declared in the main scope are only kept if
+they are reachable from the code of the main scope, through function calls and
+variable references. Anything else, like the builtins a program doesn't use,
+is removed before code generation.
+
+A global variable is only used if it is read: the values stored in variables
+that are never read are not computed. This specializes the builtin `sync()` to
+decode only the inputs the program reads. Values that call functions or may
+divide by zero are computed anyway, see `svlang.optimizer.is_pure`, so the
+program faults as it would without tree shaking.
+"""
+
+from dataclasses import dataclass, replace
+
+from .ast import *
+from .optimizer import is_pure, optimization_report
+from .typecheck import TypeCheckLevel, type_check_message
+
+
+@dataclass
+class _References:
+    variables: set[str]
+    """The variables read."""
+    functions: set[str]
+    stores: list[Assignment]
+    """The assignments to global variables, only needed if the variable is read."""
+
+
+def _local_variables(declaration: FunctionDeclaration) -> set[str]:
+    """The variables of a function, which hide the globals of the same name in it."""
+    return {argument.identifier for argument in declaration.arguments} | {
+        identifier
+        for statement in declaration.statements
+        for identifier in statement.list_variable_declarations()
+    }
+
+
+def _collect(node: Any, global_variables: dict[str, Declaration], references: _References) -> None:
+    match node:
+        case Assignment(_, identifier, value) if identifier in global_variables:
+            references.stores.append(node)
+            # Side effects, and faults, happen even if the value isn't needed.
+            if not is_pure(value):
+                _collect(value, global_variables, references)
+            return
+        case VariableReference(_, identifier) if identifier in global_variables:
+            references.variables.add(identifier)
+        case FunctionCall(_, identifier):
+            references.functions.add(identifier)
+        case FunctionDeclaration():
+            local_variables = _local_variables(node)
+            if local_variables & global_variables.keys():
+                global_variables = {
+                    identifier: declaration
+                    for identifier, declaration in global_variables.items()
+                    if identifier not in local_variables
+                }
+    if isinstance(node, list):
+        for item in node:
+            _collect(item, global_variables, references)
+    elif is_dataclass(node) and not isinstance(node, Enum):
+        for node_field in fields(node):
+            _collect(getattr(node, node_field.name), global_variables, references)
+
+
+def _remove_stores(
+    statements: list[Statement], unused_variables: set[str]
+) -> tuple[list[Statement], int]:
+    """
+    Remove the assignments to unused global variables, keeping their side
+    effects. Assignments to the variables of functions named like them stay.
+    """
+    output: list[Statement] = []
+    removed = 0
+    for statement in statements:
+        match statement:
+            case Assignment(_, identifier, value) if identifier in unused_variables:
+                removed += 1
+                if not is_pure(value):
+                    output.append(value)
+                continue
+            case FunctionDeclaration(statements=body):
+                body, body_removed = _remove_stores(
+                    body, unused_variables - _local_variables(statement)
+                )
+                statement = replace(statement, statements=body)
+                removed += body_removed
+            case While(_, _, body):
+                body, body_removed = _remove_stores(body, unused_variables)
+                statement = replace(statement, statements=body)
+                removed += body_removed
+            case If(_, _, body, else_body):
+                body, body_removed = _remove_stores(body, unused_variables)
+                else_body, else_removed = _remove_stores(else_body or [], unused_variables)
+                statement = replace(
+                    statement, statements=body, else_statements=else_body or None
+                )
+                removed += body_removed + else_removed
+        output.append(statement)
+    return output, removed
+
+
+def shake_tree(statements: list[Statement], keep: tuple[str, ...] = ()) -> list[Statement]:
+    """
+    Remove the unused functions and global variables of a program.
+
+    The functions named in `keep` are kept even if they look unused, for
+    functions that are only referenced from hand-written ASM.
+    """
+    functions: dict[str, FunctionDeclaration] = {}
+    variables: dict[str, Declaration] = {}
+    roots: list[Statement] = []
+    for statement in statements:
+        match statement:
+            case FunctionDeclaration(_, identifier):
+                functions[identifier] = statement
+            # Initializing a variable could have side effects or fault, in which
+            # case it has to stay.
+            case Declaration(_, identifier, _, value) if is_pure(value):
+                variables[identifier] = statement
+            case _:
+                roots.append(statement)
+
+    used_variables: set[str] = set()
+    used_functions: set[str] = set()
+    pending_stores: dict[str, list[Assignment]] = {}
+    pending: list[Any] = [roots]
+    for name in keep:
+        if name in functions:
+            pending.append(functions[name])
+        else:
+            # Most likely a typo, which would leave the intended function to be
+            # removed. The option has no line.
+            type_check_message(TypeCheckLevel.WARN, f"--keep {name}: no function named {name}", None)
+    used_functions.update(keep)
+    while pending:
+        references = _References(set(), set(), [])
+        _collect(pending.pop(), variables, references)
+        for store in references.stores:
+            if store.identifier in used_variables:
+                pending.append(store.value)
+            else:
+                pending_stores.setdefault(store.identifier, []).append(store)
+        for name in references.variables - used_variables:
+            used_variables.add(name)
+            if name in variables:
+                pending.append(variables[name])
+            pending.extend(store.value for store in pending_stores.pop(name, []))
+        for name in references.functions - used_functions:
+            used_functions.add(name)
+            if name in functions:
+                pending.append(functions[name])
+
+    output: list[Statement] = []
+    removed_functions: list[str] = []
+    removed_variables: list[str] = []
+    for statement in statements:
+        match statement:
+            case FunctionDeclaration(_, identifier) if identifier not in used_functions:
+                removed_functions.append(identifier)
+            case Declaration(_, identifier) if (
+                identifier in variables and identifier not in used_variables
+            ):
+                removed_variables.append(identifier)
+            case _:
+                output.append(statement)
+    output, removed_stores = _remove_stores(output, set(removed_variables))
+
+    optimization_report(
+        "tree shaking",
+        f"removed {len(removed_functions)} functions, {len(removed_variables)} global variables and {removed_stores} stores to them",
+    )
+    for identifier in removed_functions:
+        optimization_report("tree shaking", f"removed unused function {identifier}")
+    for identifier in removed_variables:
+        optimization_report("tree shaking", f"removed unused variable ${identifier}")
+    return output
@@ -1,18 +1,69 @@
+from bisect import bisect_left
 from contextvars import ContextVar
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
-from typing import Literal, Self
+from operator import itemgetter
+from typing import Generic, Literal, Self, TypeVar
 
 from .ast import *
+from .interning import NOT_CACHED, ExpressionPool, shared_expressions
+
+T = TypeVar("T")
+
+
+class Scope(Generic[T]):
+    """
+    The names bound in a scope, and through it those of the enclosing scopes.
+
+    Entering a scope is O(1): the bindings of the enclosing scopes aren't
+    copied, lookups go up the chain of scopes instead.
+    """
+
+    __slots__ = ("bindings", "parent")
+
+    def __init__(self, parent: "Scope[T] | None" = None):
+        self.bindings: dict[str, T] = {}
+        self.parent = parent
+
+    def __contains__(self, name: str) -> bool:
+        scope: Scope[T] | None = self
+        while scope is not None:
+            if name in scope.bindings:
+                return True
+            scope = scope.parent
+        return False
+
+    def get(self, name: str, default: T | None = None) -> T | None:
+        scope: Scope[T] | None = self
+        while scope is not None:
+            if name in scope.bindings:
+                return scope.bindings[name]
+            scope = scope.parent
+        return default
+
+    def __getitem__(self, name: str) -> T:
+        scope: Scope[T] | None = self
+        while scope is not None:
+            if name in scope.bindings:
+                return scope.bindings[name]
+            scope = scope.parent
+        raise KeyError(name)
+
+    def __setitem__(self, name: str, value: T) -> None:
+        """Bind a name in this scope, leaving the enclosing scopes unchanged."""
+        self.bindings[name] = value
 
 
 @dataclass
 class Symbols:
-    variables: dict[str, ValueType]
-    functions: dict[str, tuple[tuple[ValueType, ...], ValueType | None]]
+    variables: Scope[ValueType] = field(default_factory=Scope)
+    functions: Scope[tuple[tuple[ValueType, ...], ValueType | None]] = field(
+        default_factory=Scope
+    )
 
-    def clone(self) -> Self:
-        return self.__class__(self.variables.copy(), self.functions.copy())
+    def enter(self) -> Self:
+        """Return the symbols of a new scope nested in this one."""
+        return self.__class__(Scope(self.variables), Scope(self.functions))
 
 
 class TypeCheckLevel(Enum):
@@ -25,9 +76,11 @@ class TypeCheckLevel(Enum):
 class TypeCheckMessage:
     level: TypeCheckLevel
     message: str
-    line: int
+    line: int | None
 
     def __str__(self):
+        if self.line is None:
+            return f"{self.level.value}{self.level.name}:\x1b[0m {self.message}"
         return f"{self.level.value}{self.level.name}: line {self.line}:\x1b[0m {self.message}"
 
 
@@ -36,12 +89,56 @@ encountered_type_check_messages: ContextVar[list[TypeCheckMessage]] = ContextVar
 )
 
 
-def type_check_message(level: TypeCheckLevel, message: str, line: int) -> None:
+def type_check_message(level: TypeCheckLevel, message: str, line: int | None) -> None:
     _type_check_message = TypeCheckMessage(level, message, line)
     encountered_type_check_messages.get().append(_type_check_message)
 
 
+def function_signature(
+    declaration: FunctionDeclaration,
+) -> tuple[tuple[ValueType, ...], ValueType | None]:
+    return (
+        tuple(argument.type for argument in declaration.arguments),
+        declaration.return_type,
+    )
+
+
 def _expression_type(expression: Expression, symbols: Symbols) -> ValueType | None:
+    pool = shared_expressions.get()
+    if pool is None:
+        return _check_expression_type(expression, symbols)
+    expression_type = pool.cached_type(expression, symbols)
+    if expression_type is not NOT_CACHED:
+        return expression_type
+    messages = encountered_type_check_messages.get()
+    first_message = len(messages)
+    expression_type = _check_expression_type(expression, symbols)
+    # The messages are reported again if the node is checked again.
+    if len(messages) == first_message:
+        pool.cache_type(expression, symbols, expression_type)
+    return expression_type
+
+
+def _statement_expression_type(
+    expression: Expression, symbols: Symbols, lineno: int
+) -> ValueType | None:
+    """
+    Return the type of the expression of a statement.
+
+    When expressions are shared, their line numbers are those of their first
+    occurrence, so the messages are reported at the line of the statement.
+    """
+    if shared_expressions.get() is None:
+        return _expression_type(expression, symbols)
+    messages = encountered_type_check_messages.get()
+    first_message = len(messages)
+    expression_type = _expression_type(expression, symbols)
+    for message in messages[first_message:]:
+        message.line = lineno
+    return expression_type
+
+
+def _check_expression_type(expression: Expression, symbols: Symbols) -> ValueType | None:
     match expression:
         case VariableReference(lineno, identifier):
             if identifier not in symbols.variables:
@@ -113,6 +210,43 @@ def _expression_type(expression: Expression, symbols: Symbols) -> ValueType | No
                 )
             return ValueType.UINT
 
+        case BinaryNegation(lineno, operand):
+            operand_type = _expression_type(operand, symbols)
+            if operand_type != ValueType.UINT:
+                type_check_message(
+                    TypeCheckLevel.ERROR,
+                    f"Invalid operand type {operand_type} in binary negation.",
+                    lineno,
+                )
+            return ValueType.UINT
+
+        case BooleanExpression(lineno, left, _, right):
+            left_type = _expression_type(left, symbols)
+            if left_type != ValueType.BOOL:
+                type_check_message(
+                    TypeCheckLevel.ERROR,
+                    f"Invalid lefthand operand type {left_type} in boolean expression.",
+                    lineno,
+                )
+            right_type = _expression_type(right, symbols)
+            if right_type != ValueType.BOOL:
+                type_check_message(
+                    TypeCheckLevel.ERROR,
+                    f"Invalid righthand operand type {right_type} in boolean expression.",
+                    lineno,
+                )
+            return ValueType.BOOL
+
+        case BooleanNegation(lineno, negated):
+            negated_type = _expression_type(negated, symbols)
+            if negated_type != ValueType.BOOL:
+                type_check_message(
+                    TypeCheckLevel.ERROR,
+                    f"Invalid operand type {negated_type} in boolean negation.",
+                    lineno,
+                )
+            return ValueType.BOOL
+
         case FunctionCall(lineno, identifier, arguments):
             if identifier not in symbols.functions:
                 type_check_message(
@@ -142,6 +276,32 @@ def _expression_type(expression: Expression, symbols: Symbols) -> ValueType | No
             )
 
 
+def _declare_function(declaration: FunctionDeclaration, symbols: Symbols) -> None:
+    if declaration.identifier in symbols.functions:
+        type_check_message(
+            TypeCheckLevel.ERROR,
+            f"Shadowing existing definition of {declaration.identifier}",
+            declaration.lineno,
+        )
+    symbols.functions[declaration.identifier] = function_signature(declaration)
+
+
+def _check_function_body(declaration: FunctionDeclaration, symbols: Symbols) -> None:
+    internal_scope = symbols.enter()
+    for argument in declaration.arguments:
+        if argument.identifier in symbols.variables:
+            type_check_message(
+                TypeCheckLevel.ERROR,
+                f"Argument {argument} shadows existing definition of variable",
+                declaration.lineno,
+            )
+        internal_scope.variables[argument.identifier] = argument.type
+
+    for st in declaration.statements:
+        st_return_type = _type_check(st, internal_scope, declaration.return_type)
+    # TODO verify that there is a return type matching the function definition
+
+
 class Sentinel(Enum):
     UNDEFINED = auto()
 
@@ -151,34 +311,9 @@ def _type_check(
 ) -> ValueType | None | Literal[Sentinel.UNDEFINED]:
     return_type = Sentinel.UNDEFINED
     match statement:
-        case FunctionDeclaration(
-            lineno, identifier, arguments, function_return_type, statements
-        ):
-            signature = (
-                tuple(argument.type for argument in arguments),
-                function_return_type,
-            )
-            if identifier in symbols.functions:
-                type_check_message(
-                    TypeCheckLevel.ERROR,
-                    f"Shadowing existing definition of {identifier}",
-                    lineno,
-                )
-            symbols.functions[identifier] = signature
-
-            internal_scope = symbols.clone()
-            for argument in arguments:
-                if argument.identifier in symbols.variables:
-                    type_check_message(
-                        TypeCheckLevel.ERROR,
-                        f"Argument {argument} shadows existing definition of variable",
-                        lineno,
-                    )
-                internal_scope.variables[argument.identifier] = argument.type
-
-            for st in statements:
-                st_return_type = _type_check(st, internal_scope, function_return_type)
-            # TODO verify that there is a return type matching the function definition
+        case FunctionDeclaration():
+            _declare_function(statement, symbols)
+            _check_function_body(statement, symbols)
 
         case Declaration(lineno, identifier, variable_type, value):
             if identifier in symbols.variables:
@@ -188,7 +323,7 @@ def _type_check(
                     lineno,
                 )
             symbols.variables[identifier] = variable_type
-            value_type = _expression_type(value, symbols)
+            value_type = _statement_expression_type(value, symbols, lineno)
             if value_type != variable_type:
                 type_check_message(
                     TypeCheckLevel.ERROR,
@@ -205,7 +340,7 @@ def _type_check(
                 )
             else:
                 variable_type = symbols.variables[identifier]
-                value_type = _expression_type(value, symbols)
+                value_type = _statement_expression_type(value, symbols, lineno)
                 if value_type != variable_type:
                     type_check_message(
                         TypeCheckLevel.ERROR,
@@ -215,7 +350,7 @@ def _type_check(
 
         case Return(lineno, expression):
             if expression is not None:
-                expression_type = _expression_type(expression, symbols)
+                expression_type = _statement_expression_type(expression, symbols, lineno)
             else:
                 expression_type = None
             if output_type != expression_type:
@@ -275,7 +410,7 @@ def _type_check(
             _check_arg_type(op.arg3_type, arg3, 3)
 
         case While(lineno, expression, statements):
-            expression_type = _expression_type(expression, symbols)
+            expression_type = _statement_expression_type(expression, symbols, lineno)
             if expression_type != ValueType.BOOL:
                 type_check_message(
                     TypeCheckLevel.ERROR,
@@ -287,7 +422,7 @@ def _type_check(
                 # TODO check for return type
 
         case If(lineno, expression, statements, else_statements):
-            expression_type = _expression_type(expression, symbols)
+            expression_type = _statement_expression_type(expression, symbols, lineno)
             if expression_type != ValueType.BOOL:
                 type_check_message(
                     TypeCheckLevel.ERROR,
@@ -306,7 +441,7 @@ def _type_check(
             pass  # TODO check if contained in while loop
 
         case FunctionCall(lineno) as expression:
-            if _expression_type(expression, symbols) != None:
+            if _statement_expression_type(expression, symbols, lineno) != None:
                 type_check_message(
                     TypeCheckLevel.INFO,
                     f"Unused return value for function call {expression}",
@@ -323,16 +458,175 @@ def _type_check(
     return return_type
 
 
-def type_check(statements: list[Statement]) -> None:
-    symbols = Symbols({}, {})
+class _MainScope(Scope[T]):
+    """
+    The main scope, remembering the position of the statement each name was
+    bound at.
+
+    This lets the bodies of functions be checked apart from the main scope,
+    with the names bound before them.
+    """
+
+    __slots__ = ("history", "position")
+
+    def __init__(self):
+        super().__init__()
+        self.history: dict[str, list[tuple[int, T]]] = {}
+        self.position = -1
+        """The position of the statement being checked, -1 while declaring functions."""
+
+    def __setitem__(self, name: str, value: T) -> None:
+        super().__setitem__(name, value)
+        self.history.setdefault(name, []).append((self.position, value))
+
+
+class _BoundBefore(Generic[T]):
+    """The names of the main scope bound before a position, as scope bindings."""
+
+    __slots__ = ("history", "position")
+
+    def __init__(self, history: dict[str, list[tuple[int, T]]], position: int):
+        self.history = history
+        self.position = position
+
+    def __contains__(self, name: str) -> bool:
+        bindings = self.history.get(name)
+        return bindings is not None and bindings[0][0] < self.position
+
+    def __getitem__(self, name: str) -> T:
+        bindings = self.history[name]
+        index = bisect_left(bindings, self.position, key=itemgetter(0))
+        if index == 0:
+            raise KeyError(name)
+        return bindings[index - 1][1]
+
+
+def _symbols_before(
+    variables: dict[str, list[tuple[int, ValueType]]],
+    functions: dict[str, list[tuple[int, Any]]],
+    position: int,
+) -> Symbols:
+    symbols = Symbols()
+    symbols.variables.bindings = _BoundBefore(variables, position)  # type: ignore
+    symbols.functions.bindings = _BoundBefore(functions, position)  # type: ignore
+    return symbols
+
+
+def declare_functions(statements: list[Statement], symbols: Symbols) -> None:
+    """
+    Declare the functions of the main scope, so that they can be called
+    before their declaration.
+    """
     for statement in statements:
-        return_type = _type_check(statement, symbols, None)
-        if return_type not in (None, Sentinel.UNDEFINED):
-            type_check_message(
-                TypeCheckLevel.WARN,
-                f"Returning a value of type {return_type} from the main scope isn't supported",
-                statement.lineno,
-            )
+        if isinstance(statement, FunctionDeclaration):
+            _declare_function(statement, symbols)
+
+
+def type_check_statement(statement: Statement, symbols: Symbols) -> None:
+    """
+    Type check a statement of the main scope.
+
+    The functions of the main scope must have been declared already.
+    """
+    if isinstance(statement, FunctionDeclaration):
+        _check_function_body(statement, symbols)
+        return
+    return_type = _type_check(statement, symbols, None)
+    if return_type not in (None, Sentinel.UNDEFINED):
+        type_check_message(
+            TypeCheckLevel.WARN,
+            f"Returning a value of type {return_type} from the main scope isn't supported",
+            statement.lineno,
+        )
+
+
+_worker_environment: tuple[list[Statement], dict, dict, bool] | None = None
+"""The program, the main scope history, and whether expressions are shared, in workers."""
+
+
+def _initialize_worker(
+    statements: list[Statement],
+    variables: dict[str, list[tuple[int, ValueType]]],
+    functions: dict[str, list[tuple[int, Any]]],
+    share_expressions: bool,
+) -> None:
+    global _worker_environment
+    _worker_environment = (statements, variables, functions, share_expressions)
+
+
+def _check_function_in_worker(position: int) -> list[TypeCheckMessage]:
+    assert _worker_environment is not None
+    statements, variables, functions, share_expressions = _worker_environment
+    declaration = statements[position]
+    assert isinstance(declaration, FunctionDeclaration)
+    messages: list[TypeCheckMessage] = []
+    encountered_type_check_messages.set(messages)
+    # The nodes shared with the parent process can't be looked up in a new
+    # pool, but its presence keeps the messages at the lines of statements.
+    shared_expressions.set(ExpressionPool() if share_expressions else None)
+    _check_function_body(declaration, _symbols_before(variables, functions, position))
+    return messages
+
+
+def type_check(statements: list[Statement], *, jobs: int = 1) -> None:
+    """
+    Type check a program.
+
+    The functions of the main scope are declared first, then the statements
+    are checked in order. With more than one job, the bodies of the functions
+    of the main scope are checked in a pool of processes instead, and their
+    messages are merged back in source order: they are the same as with a
+    single job.
+    """
+    variables: _MainScope[ValueType] = _MainScope()
+    functions: _MainScope[tuple[tuple[ValueType, ...], ValueType | None]] = _MainScope()
+    symbols = Symbols(variables, functions)
+    declare_functions(statements, symbols)
+
+    if jobs <= 1:
+        for position, statement in enumerate(statements):
+            variables.position = functions.position = position
+            type_check_statement(statement, symbols)
+        return
+
+    # Imported when checking in parallel only, it's slow to import.
+    from concurrent.futures import ProcessPoolExecutor
+
+    messages = encountered_type_check_messages.get()
+    statement_messages: list[list[TypeCheckMessage]] = []
+    positions: list[int] = []
+    for position, statement in enumerate(statements):
+        variables.position = functions.position = position
+        if isinstance(statement, FunctionDeclaration):
+            positions.append(position)
+            statement_messages.append([])
+            continue
+        first_message = len(messages)
+        type_check_statement(statement, symbols)
+        statement_messages.append(messages[first_message:])
+        del messages[first_message:]
+
+    # The program is handed to the workers once, only positions are sent.
+    with ProcessPoolExecutor(
+        jobs,
+        initializer=_initialize_worker,
+        initargs=(
+            statements,
+            variables.history,
+            functions.history,
+            shared_expressions.get() is not None,
+        ),
+    ) as executor:
+        results = executor.map(
+            _check_function_in_worker,
+            positions,
+            chunksize=max(1, len(positions) // (jobs * 4)),
+        )
+        for position, function_messages in zip(positions, results):
+            statement_messages[position] = function_messages
+
+    for position_messages in statement_messages:
+        messages.extend(position_messages)
 
 
 if __name__ == "__main__":
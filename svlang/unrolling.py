@@ -0,0 +1,370 @@
+"""
+Unrolling of loops with a constant trip count.
+
+A `while` loop whose condition only reads a counter, set to a constant before
+the loop and only incremented by a constant once per iteration, runs a number
+of times known at compile time. Each of its iterations still pays for the
+increment, the comparison and the jump.
+
+If the copies of its body fit in the budget, the loop is replaced by one copy
+per iteration, where the counter is replaced by its value, for the constants
+to be folded. Otherwise, the body is repeated a few times in the loop, so the
+condition is tested once per group of iterations. The iterations left over are
+peeled off before the loop.
+
+The variables declared in the body, and only used after their declaration in
+it, are renamed in all the copies but the last, so the other optimizations can
+still tell them apart.
+
+The unrolled copies of all the loops of a program are bounded by another
+budget, to keep programs well within the 64K words of the SVC16 memory.
+"""
+
+from collections import Counter
+from dataclasses import replace
+from functools import cached_property
+
+from .ast import *
+from .folding import fold_expression
+from .optimizer import (
+    count_nodes,
+    function_writes,
+    increment_step,
+    is_pure,
+    loop_writes,
+    optimization_report,
+    variable_writes,
+)
+
+PROGRAM_BUDGET = 4096
+"""
+The statements and expressions the unrolled copies of all the loops of a
+program may add. At about four words an instruction, a quarter of the memory.
+"""
+
+_MAX_TRIP_COUNT = 0x10000
+
+
+def _breaks(statements: list[Statement]) -> bool:
+    """Whether a `break` leaves the loop running the statements."""
+    for statement in statements:
+        match statement:
+            case Break():
+                return True
+            case If(_, _, body, else_body):
+                if _breaks(body) or _breaks(else_body or []):
+                    return True
+    return False
+
+
+def _substitute(node: Any, identifier: str, value: int) -> Any:
+    """Copy a node, replacing the reads of a variable outside of ASM by a value."""
+    match node:
+        case list():
+            return [_substitute(item, identifier, value) for item in node]
+        case VariableReference(lineno, name) if name == identifier:
+            return NumericValue(lineno, value)
+        case ASMInstruction():
+            return node
+        case Statement():
+            return replace(
+                node,
+                **{
+                    node_field.name: _substitute(getattr(node, node_field.name), identifier, value)
+                    for node_field in fields(node)
+                    if node_field.name != "lineno"
+                },
+            )
+    return node
+
+
+def _rename(node: Any, renames: dict[str, str]) -> Any:
+    """Copy a node, renaming variables, in ASM instructions too."""
+    match node:
+        case list():
+            return [_rename(item, renames) for item in node]
+        case VariableReference(_, identifier) if identifier in renames:
+            return replace(node, identifier=renames[identifier])
+        case Statement():
+            node = replace(
+                node,
+                **{
+                    node_field.name: _rename(getattr(node, node_field.name), renames)
+                    for node_field in fields(node)
+                    if node_field.name != "lineno"
+                },
+            )
+            if isinstance(node, (Declaration, Assignment)) and node.identifier in renames:
+                node = replace(node, identifier=renames[node.identifier])
+            return node
+    return node
+
+
+def _references(node: Any) -> Counter[str]:
+    """How many times each variable is named in a node."""
+    references: Counter[str] = Counter()
+    for child in walk(node):
+        match child:
+            case VariableReference(_, identifier) | Declaration(
+                _, identifier
+            ) | Assignment(_, identifier) | ArgumentDeclaration(identifier):
+                references[identifier] += 1
+    return references
+
+
+def _local_names(statements: list[Statement], references: Counter[str]) -> set[str]:
+    """
+    The variables declared in some statements that are only named after their
+    declaration, in the same block: each copy of the statements sets them
+    before using them.
+    """
+    names = set()
+    for block in walk(statements):
+        if not isinstance(block, list):
+            continue
+        suffix: Counter[str] = Counter()
+        for statement in reversed(block):
+            suffix.update(_references(statement))
+            if (
+                isinstance(statement, Declaration)
+                and suffix[statement.identifier] == references[statement.identifier]
+            ):
+                names.add(statement.identifier)
+    return names
+
+
+class _Unroller:
+    def __init__(self, statements: list[Statement], budget: int, factor: int):
+        self.program = statements
+        self.copies = 0
+        self.budget = budget
+        self.factor = factor
+        self.remaining = PROGRAM_BUDGET
+        self.full = 0
+        self.partial = 0
+
+    def statements(self, statements: list[Statement]) -> list[Statement]:
+        output: list[Statement] = []
+        for statement in statements:
+            match statement:
+                case While(statements=body):
+                    # The nested loops are unrolled first, their copies count
+                    # in the size of the loop.
+                    loop = replace(statement, statements=self.statements(body))
+                    unrolled = self.loop(loop, output)
+                    if unrolled != [loop]:
+                        self.references.update(_references(unrolled))
+                        self.references.subtract(_references(loop))
+                    output.extend(unrolled)
+                case If(_, _, body, else_body):
+                    output.append(
+                        replace(
+                            statement,
+                            statements=self.statements(body),
+                            else_statements=(
+                                None if else_body is None else self.statements(else_body)
+                            ),
+                        )
+                    )
+                case FunctionDeclaration(statements=body):
+                    output.append(replace(statement, statements=self.statements(body)))
+                case _:
+                    output.append(statement)
+        return output
+
+    # Only computed for programs with loops that may be unrolled.
+    @cached_property
+    def function_writes(self) -> dict[str, set[str] | None]:
+        return function_writes(self.program)
+
+    @cached_property
+    def references(self) -> Counter[str]:
+        return _references(self.program)
+
+    def fresh_name(self, identifier: str) -> str:
+        name = f"{identifier}_{self.copies}"
+        while name in self.references:
+            name = f"_{name}"
+        self.references[name] = 0
+        return name
+
+    def copies_of(self, statements: list[Statement], count: int) -> list[list[Statement]]:
+        """
+        Copies of some statements, the local variables of all but the last one
+        renamed.
+        """
+        local_names = _local_names(statements, self.references)
+        copies = []
+        for _ in range(count - 1):
+            self.copies += 1
+            renames = {name: self.fresh_name(name) for name in local_names}
+            copies.append(_rename(statements, renames))
+        return [*copies, statements]
+
+    def initial_value(self, identifier: str, previous: list[Statement]) -> int | None:
+        """
+        The constant a variable is set to before a loop, by the last statement
+        writing to it in the preceding statements.
+        """
+        for statement in reversed(previous):
+            match statement:
+                case Declaration(_, name, _, NumericValue(_, value)) | Assignment(
+                    _, name, NumericValue(_, value)
+                ) if name == identifier:
+                    return value & 0xFFFF
+            found = variable_writes(statement)
+            if found is None:
+                return None
+            assigned, asm_written, calls = found
+            if identifier in assigned | asm_written or any(
+                isinstance(node, FunctionDeclaration) for node in walk(statement)
+            ):
+                return None
+            for callee in calls:
+                callee_writes = self.function_writes.get(callee)
+                if callee_writes is None or identifier in callee_writes:
+                    return None
+        return None
+
+    def trip_count(self, loop: While, previous: list[Statement]) -> tuple[str, list[int]] | None:
+        """
+        The counter of a loop and its value at the start of each iteration,
+        if it only runs a constant number of times.
+        """
+        reads = {
+            node.identifier
+            for node in walk(loop.expression)
+            if isinstance(node, VariableReference)
+        }
+        if len(reads) != 1 or not is_pure(loop.expression):
+            return None
+        (identifier,) = reads
+        increments = [
+            statement
+            for statement in loop.statements
+            if increment_step(statement, identifier) is not None
+        ]
+        written = [
+            node
+            for node in walk(loop.statements)
+            if isinstance(node, (Declaration, Assignment)) and node.identifier == identifier
+        ]
+        if len(increments) != 1 or len(written) != 1 or _breaks(loop.statements):
+            return None
+        writes = loop_writes(loop, self.function_writes)
+        if writes is None or identifier in writes[1]:
+            return None
+        step = increment_step(increments[0], identifier)
+        value = self.initial_value(identifier, previous)
+        if step is None or value is None:
+            return None
+        values = []
+        while True:
+            condition = fold_expression(_substitute(loop.expression, identifier, value))
+            if not isinstance(condition, BooleanValue) or len(values) == _MAX_TRIP_COUNT:
+                return None
+            if not condition.value:
+                return identifier, values
+            values.append(value)
+            value = (value + step) & 0xFFFF
+
+    def loop(self, loop: While, previous: list[Statement]) -> list[Statement]:
+        found = self.trip_count(loop, previous)
+        if found is None:
+            return [loop]
+        identifier, values = found
+        size = count_nodes(loop.statements)
+
+        if len(values) * size <= min(self.budget, size + self.remaining):
+            self.remaining -= max(0, (len(values) - 1) * size)
+            self.full += 1
+            optimization_report(
+                "loop unrolling",
+                (
+                    f"unrolled all {len(values)} iterations of the loop over ${identifier}"
+                    if values
+                    else f"removed the loop over ${identifier}, which never runs"
+                ),
+                loop.lineno,
+            )
+            return self.full_copies(loop, identifier, values)
+
+        if size > self.budget:
+            return [loop]
+        # The unrolled loop should still run a few times.
+        for factor in range(min(self.factor, len(values) // 2), 1, -1):
+            peeled = len(values) % factor
+            growth = (factor + peeled - 1) * size
+            if growth <= self.remaining:
+                self.remaining -= growth
+                self.partial += 1
+                optimization_report(
+                    "loop unrolling",
+                    f"unrolled the loop over ${identifier} {factor} times"
+                    + (f", peeling off {peeled} of its iterations" if peeled else ""),
+                    loop.lineno,
+                )
+                copies = self.copies_of(loop.statements, peeled + factor)
+                return [
+                    *(statement for copy in copies[:peeled] for statement in copy),
+                    replace(
+                        loop,
+                        statements=[
+                            statement for copy in copies[peeled:] for statement in copy
+                        ],
+                    ),
+                ]
+        return [loop]
+
+    def full_copies(self, loop: While, identifier: str, values: list[int]) -> list[Statement]:
+        """
+        A copy of the body of a loop per iteration, where the counter is
+        replaced by its value.
+
+        The increments are kept if the counter can be read otherwise, by the
+        functions or ASM instructions of the loop, or after a `return`.
+        """
+        if not values:
+            return []
+        observed = any(
+            isinstance(node, (FunctionCall, Return))
+            or (
+                isinstance(node, ASMInstruction)
+                and any(
+                    isinstance(argument, VariableReference) and argument.identifier == identifier
+                    for argument in (node.arg1, node.arg2, node.arg3)
+                )
+            )
+            for node in walk(loop.statements)
+        )
+        output: list[Statement] = []
+        counter = values[0]
+        for body in self.copies_of(loop.statements, len(values)):
+            for statement in body:
+                step = increment_step(statement, identifier)
+                if step is None or observed:
+                    output.append(_substitute(statement, identifier, counter))
+                if step is not None:
+                    counter = (counter + step) & 0xFFFF
+        if not observed:
+            # The value of the counter once the loop ends.
+            output.append(Assignment(loop.lineno, identifier, NumericValue(loop.lineno, counter)))
+        return output
+
+
+def unroll_loops(statements: list[Statement], budget: int, factor: int) -> list[Statement]:
+    """
+    Unroll the loops with a constant trip count, fully if their copies have at
+    most `budget` nodes, or else `factor` times at most if their body does.
+
+    The statements are returned as they are if no loop was unrolled.
+    """
+    unroller = _Unroller(statements, budget, factor)
+    unrolled = unroller.statements(statements)
+    optimization_report(
+        "loop unrolling",
+        f"unrolled {unroller.full} loops fully, {unroller.partial} partially",
+    )
+    if not unroller.full and not unroller.partial:
+        return statements
+    return unrolled
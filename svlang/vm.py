@@ -0,0 +1,438 @@
+from dataclasses import dataclass
+from typing import Callable, Sequence
+
+import numpy as np
+
+from .ast import ASMOps
+
+MEMORY_SIZE = 0x10000
+MAX_INSTRUCTIONS_PER_FRAME = 3_000_000
+MAX_TRACE_LENGTH = 1024
+
+SYNCED = 0x10000
+"""Flag set on the instruction pointer returned by a trace ending with a Sync."""
+
+InputSource = Callable[[], tuple[int, int]]
+"""Called on each Sync, returns the cursor position and the pressed keys."""
+
+
+@dataclass
+class ScriptedInput:
+    """
+    A deterministic input source, replaying one state per frame.
+
+    Each state is a `(position, keys)` pair, the position being `y * 256 + x`.
+    Once all the states have been replayed, the last one is repeated.
+    """
+
+    states: Sequence[tuple[int, int]] = ()
+    frame: int = 0
+
+    def __call__(self) -> tuple[int, int]:
+        if not self.states:
+            return (0, 0)
+        state = self.states[min(self.frame, len(self.states) - 1)]
+        self.frame += 1
+        return state
+
+    @classmethod
+    def parse(cls, script: str) -> "ScriptedInput":
+        """
+        Parse an input script, with one `x y keys` line per frame.
+
+        Numbers may be written in any base Python understands (`0b101`, `0xff`),
+        and `#` starts a comment.
+        """
+        states = []
+        for line in script.splitlines():
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            x, y, keys = (int(value, 0) for value in line.split())
+            states.append(((y * 256 + x) & 0xFFFF, keys & 0xFFFF))
+        return cls(states)
+
+
+@dataclass
+class _Step:
+    """An instruction executed while recording a trace."""
+
+    ip: int
+    instruction: tuple[int, int, int, int]
+    taken: bool
+    """For GoTo and Skip instructions, whether the jump was taken."""
+    next_ip: int
+
+
+@dataclass
+class _Trace:
+    run: Callable[[int], tuple[int, int]]
+    covered: set[int]
+    """The memory words holding the instructions of the trace."""
+    written: set[int]
+    """The memory words the trace writes to at fixed addresses."""
+
+
+class Machine:
+    """
+    An SVC16 emulator.
+
+    The memory, screen and utility buffers are 65536-word `uint16` NumPy arrays,
+    up to date at the end of each frame. Instructions run on list mirrors of
+    these buffers, since indexing NumPy arrays from Python is several times
+    slower than indexing lists.
+
+    Paths through the program are recorded while running them instruction by
+    instruction, then compiled into Python functions, guarded so that they exit
+    as soon as the execution leaves the recorded path. Loops closed by a path
+    run as Python loops.
+    """
+
+    def __init__(self, program: bytes, input_source: InputSource | None = None):
+        if len(program) > MEMORY_SIZE * 2:
+            raise ValueError(
+                f"The program is {len(program) // 2} words long, but the memory only holds {MEMORY_SIZE} words"
+            )
+        self.memory = np.zeros(MEMORY_SIZE, dtype=np.uint16)
+        self.memory[: len(program) // 2] = np.frombuffer(
+            program[: len(program) // 2 * 2], dtype="<u2"
+        )
+        self.screen = np.zeros(MEMORY_SIZE, dtype=np.uint16)
+        self.utility = np.zeros(MEMORY_SIZE, dtype=np.uint16)
+        self.input_source: InputSource = input_source or ScriptedInput()
+        self.instruction_pointer = 0
+        self.instructions = 0
+        """The number of instructions executed so far."""
+        self.frames = 0
+
+        self._memory: list[int] = self.memory.tolist()
+        self._buffers: list[list[int]] = [self.screen.tolist(), self.utility.tolist()]
+        self._traces: dict[int, _Trace] = {}
+        self._owners: dict[int, set[int]] = {}
+        """The traces covering each memory word."""
+        self._writers: dict[int, set[int]] = {}
+        """The traces writing to each memory word at a fixed address."""
+
+    def _buffer(self, index: int) -> list[int]:
+        if index > 1:
+            raise RuntimeError(f"Invalid buffer {index}")
+        return self._buffers[index]
+
+    def step(self) -> bool:
+        """Execute a single instruction, return whether it was a Sync."""
+        m = self._memory
+        ip = self.instruction_pointer
+        opcode, a, b, c = (m[(ip + i) & 0xFFFF] for i in range(4))
+        self.instructions += 1
+        next_ip = (ip + 4) & 0xFFFF
+        writes: list[int] = []
+        synced = False
+        match opcode:
+            case ASMOps.Set.opcode:
+                m[a] = b
+                writes.append(a)
+            case ASMOps.GoTo.opcode:
+                if not m[c]:
+                    next_ip = (m[a] + b) & 0xFFFF
+            case ASMOps.Skip.opcode:
+                if not m[c]:
+                    next_ip = (ip + 4 * a - 4 * b) & 0xFFFF
+            case ASMOps.Add.opcode:
+                m[c] = (m[a] + m[b]) & 0xFFFF
+                writes.append(c)
+            case ASMOps.Sub.opcode:
+                m[c] = (m[a] - m[b]) & 0xFFFF
+                writes.append(c)
+            case ASMOps.Mul.opcode:
+                m[c] = (m[a] * m[b]) & 0xFFFF
+                writes.append(c)
+            case ASMOps.Div.opcode:
+                if not m[b]:
+                    raise RuntimeError(f"Division by zero at {ip}")
+                m[c] = m[a] // m[b]
+                writes.append(c)
+            case ASMOps.Cmp.opcode:
+                m[c] = int(m[a] < m[b])
+                writes.append(c)
+            case ASMOps.Deref.opcode:
+                m[b] = m[(m[a] + c) & 0xFFFF]
+                writes.append(b)
+            case ASMOps.Ref.opcode:
+                address = (m[a] + c) & 0xFFFF
+                m[address] = m[b]
+                writes.append(address)
+            case ASMOps.Inst.opcode:
+                m[a] = ip
+                writes.append(a)
+            case ASMOps.Print.opcode:
+                self._buffer(c)[m[b]] = m[a]
+            case ASMOps.Read.opcode:
+                m[b] = self._buffer(c)[m[a]]
+                writes.append(b)
+            case ASMOps.Band.opcode:
+                m[c] = m[a] & m[b]
+                writes.append(c)
+            case ASMOps.Xor.opcode:
+                m[c] = m[a] ^ m[b]
+                writes.append(c)
+            case ASMOps.Sync.opcode:
+                m[a], m[b] = self.input_source()
+                writes.extend((a, b))
+                synced = True
+            case _:
+                raise RuntimeError(f"Invalid opcode {opcode} at {ip}")
+        for address in writes:
+            if address in self._owners:
+                self._invalidate(address)
+        self.instruction_pointer = next_ip
+        return synced
+
+    def run_frame(self, max_instructions: int = MAX_INSTRUCTIONS_PER_FRAME) -> None:
+        """Run until the next Sync, or until `max_instructions` were executed."""
+        traces = self._traces
+        executed = 0
+        ip = self.instruction_pointer
+        try:
+            while executed < max_instructions:
+                trace = traces.get(ip)
+                if trace is None:
+                    self.instruction_pointer = ip
+                    ip, count = self._record(max_instructions - executed)
+                else:
+                    ip, count = trace.run(max_instructions - executed)
+                executed += count
+                if ip & SYNCED:
+                    ip &= 0xFFFF
+                    break
+        except ZeroDivisionError:
+            raise RuntimeError("Division by zero") from None
+        finally:
+            self.instruction_pointer = ip
+            self.instructions += executed
+        self.frames += 1
+        self.memory[:] = self._memory
+        self.screen[:] = self._buffers[0]
+        self.utility[:] = self._buffers[1]
+
+    def run(self, frames: int) -> None:
+        for _ in range(frames):
+            self.run_frame()
+
+    def _record(self, budget: int) -> tuple[int, int]:
+        """
+        Run instructions one by one from the current position, then compile the
+        path they took into a trace.
+
+        The recording stops when the path loops back to its start, reaches an
+        instruction it already went through or the start of another trace, or
+        executes a Sync. Returns the position it stopped at (flagged if synced)
+        and the number of instructions executed.
+        """
+        start = self.instruction_pointer
+        m = self._memory
+        path: list[_Step] = []
+        visited: set[int] = set()
+        synced = False
+        instructions = self.instructions
+        while len(path) < min(budget, MAX_TRACE_LENGTH):
+            ip = self.instruction_pointer
+            if path and (ip == start or ip in visited or ip in self._traces):
+                break
+            visited.add(ip)
+            instruction = tuple(m[(ip + i) & 0xFFFF] for i in range(4))
+            taken = m[instruction[3]] == 0
+            synced = self.step()
+            path.append(_Step(ip, instruction, taken, self.instruction_pointer))  # type: ignore
+            if synced:
+                break
+        executed = self.instructions - instructions
+        self.instructions = instructions
+
+        # The trace could have been invalidated by its own writes.
+        if all(
+            tuple(m[(step.ip + i) & 0xFFFF] for i in range(4)) == step.instruction
+            for step in path
+        ):
+            self._compile(start, path, synced)
+        return self.instruction_pointer | (SYNCED if synced else 0), executed
+
+    def _compile(self, start: int, path: list[_Step], synced: bool) -> None:
+        covered = {(step.ip + i) & 0xFFFF for step in path for i in range(4)}
+        written: set[int] = set()
+        loops = path[-1].next_ip == start and not synced
+        indent = "        " if loops else "    "
+        lines: list[str] = []
+
+        def exit(ip: str | int, count: int) -> str:
+            return f"return {ip}, k + {count}"
+
+        for count, step in enumerate(path, 1):
+            ip, (opcode, a, b, c), next_ip = step.ip, step.instruction, step.next_ip
+            fallthrough = (ip + 4) & 0xFFFF
+            write: int | None = None
+            match opcode:
+                case ASMOps.Set.opcode:
+                    lines.append(f"m[{a}] = {b}")
+                    write = a
+                case ASMOps.GoTo.opcode:
+                    target = f"(m[{a}] + {b}) & 65535"
+                    if step.taken:
+                        lines.append(f"if m[{c}]: {exit(fallthrough, count)}")
+                        lines.append(
+                            f"if m[{a}] != {(next_ip - b) & 0xFFFF}: {exit(target, count)}"
+                        )
+                    else:
+                        lines.append(f"if not m[{c}]: {exit(target, count)}")
+                case ASMOps.Skip.opcode:
+                    if step.taken:
+                        lines.append(f"if m[{c}]: {exit(fallthrough, count)}")
+                    else:
+                        target = (ip + 4 * a - 4 * b) & 0xFFFF
+                        lines.append(f"if not m[{c}]: {exit(target, count)}")
+                case ASMOps.Add.opcode:
+                    lines.append(f"m[{c}] = (m[{a}] + m[{b}]) & 65535")
+                    write = c
+                case ASMOps.Sub.opcode:
+                    lines.append(f"m[{c}] = (m[{a}] - m[{b}]) & 65535")
+                    write = c
+                case ASMOps.Mul.opcode:
+                    lines.append(f"m[{c}] = (m[{a}] * m[{b}]) & 65535")
+                    write = c
+                case ASMOps.Div.opcode:
+                    lines.append(f"m[{c}] = m[{a}] // m[{b}]")
+                    write = c
+                case ASMOps.Cmp.opcode:
+                    lines.append(f"m[{c}] = 1 if m[{a}] < m[{b}] else 0")
+                    write = c
+                case ASMOps.Deref.opcode:
+                    lines.append(f"m[{b}] = m[(m[{a}] + {c}) & 65535]")
+                    write = b
+                case ASMOps.Ref.opcode:
+                    lines.append(f"x = (m[{a}] + {c}) & 65535")
+                    lines.append(f"m[x] = m[{b}]")
+                    lines.append(
+                        f"if x in owners: invalidate(x); {exit(next_ip, count)}"
+                    )
+                case ASMOps.Inst.opcode:
+                    lines.append(f"m[{a}] = {ip}")
+                    write = a
+                case ASMOps.Print.opcode:
+                    lines.append(f"b{c}[m[{b}]] = m[{a}]")
+                case ASMOps.Read.opcode:
+                    lines.append(f"m[{b}] = b{c}[m[{a}]]")
+                    write = b
+                case ASMOps.Band.opcode:
+                    lines.append(f"m[{c}] = m[{a}] & m[{b}]")
+                    write = c
+                case ASMOps.Xor.opcode:
+                    lines.append(f"m[{c}] = m[{a}] ^ m[{b}]")
+                    write = c
+                case ASMOps.Sync.opcode:
+                    lines.append(f"m[{a}], m[{b}] = sync()")
+                    lines.append(f"if {a} in owners: invalidate({a})")
+                    lines.append(f"if {b} in owners: invalidate({b})")
+                    lines.append(exit(next_ip | SYNCED, count))
+            if write is not None:
+                written.add(write)
+                if write in covered or write in self._owners:
+                    lines.append(f"invalidate({write}); {exit(next_ip, count)}")
+
+        if synced:
+            pass
+        elif loops:
+            lines.append(f"k += {len(path)}")
+            lines.append(f"if k >= budget: return {start}, k")
+        else:
+            lines.append(exit(path[-1].next_ip, len(path)))
+
+        source = ["def trace(budget):", "    k = 0"]
+        if loops:
+            source.append("    while True:")
+        source.extend(f"{indent}{line}" for line in lines)
+        # The trace is built by a factory function, so that it accesses the
+        # buffers as closure variables rather than globals.
+        namespace: dict = {}
+        exec(
+            "def factory(m, b0, b1, sync, owners, invalidate):\n"
+            + "".join(f"    {line}\n" for line in source)
+            + "    return trace\n",
+            namespace,
+        )
+        run = namespace["factory"](
+            self._memory,
+            self._buffers[0],
+            self._buffers[1],
+            self.input_source,
+            self._owners,
+            self._invalidate,
+        )
+
+        # Traces writing to the instructions of this one must check their writes.
+        for word in covered:
+            for writer in list(self._writers.get(word, ())):
+                self._remove_trace(writer)
+        self._traces[start] = _Trace(run, covered, written)
+        for word in covered:
+            self._owners.setdefault(word, set()).add(start)
+        for word in written:
+            self._writers.setdefault(word, set()).add(start)
+
+    def _remove_trace(self, start: int) -> None:
+        trace = self._traces.pop(start, None)
+        if trace is None:
+            return
+        for word in trace.covered:
+            owners = self._owners[word]
+            owners.discard(start)
+            if not owners:
+                del self._owners[word]
+        for word in trace.written:
+            writers = self._writers[word]
+            writers.discard(start)
+            if not writers:
+                del self._writers[word]
+
+    def _invalidate(self, address: int) -> None:
+        """Drop the traces covering a memory word that was written to."""
+        for start in list(self._owners.get(address, ())):
+            self._remove_trace(start)
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+    import hashlib
+    import sys
+    import time
+
+    parser = ArgumentParser(
+        description="Run SVC16 binaries.",
+        formatter_class=ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("program", help="The binary to run ('-' for stdin)")
+    parser.add_argument("--frames", type=int, default=1, help="The number of frames to run")
+    parser.add_argument(
+        "--input",
+        help="An input script, with one 'x y keys' line per frame (no input by default)",
+    )
+    args = parser.parse_args()
+
+    if args.program == "-":
+        program = sys.stdin.buffer.read()
+    else:
+        with open(args.program, "rb") as program_file:
+            program = program_file.read()
+    input_source = None
+    if args.input is not None:
+        with open(args.input, "r") as input_file:
+            input_source = ScriptedInput.parse(input_file.read())
+
+    machine = Machine(program, input_source)
+    start = time.perf_counter()
+    machine.run(args.frames)
+    elapsed = time.perf_counter() - start
+
+    print(f"frames:       {machine.frames}")
+    print(f"instructions: {machine.instructions}")
+    print(f"time:         {elapsed:.3f} s")
+    print(f"speed:        {machine.instructions / elapsed:,.0f} instructions/s")
+    print(f"screen:       {hashlib.sha256(machine.screen.tobytes()).hexdigest()}")